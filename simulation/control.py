@@ -0,0 +1,236 @@
+import numpy as np
+from simulation.core import SPEED_RESPONSE
+from simulation.scheduler import FIXED_DT, ticks_for
+from simulation.sensors import CULL_MARGIN
+
+CONTROL_INTERVAL = 0.05  # Seconds of simulated time between ego car decisions
+TRAFFIC_MAX_BRAKING = 0.025  # Traffic car deceleration at full brake (px/tick^2, ~9 m/s^2)
+LOOKAHEAD = 2000  # How far ahead of the ego car to look for a leader (px)
+GAP_HORIZON = 2000.0  # Learned policies see longer gaps and stop distances as this
+
+# Observation fields every policy can rely on, one value per vehicle; distances in
+# px, speeds in px per reference tick, accelerations in px per reference tick^2
+FEATURES = ('speed', 'desired_speed', 'gap', 'lead_speed', 'stop_distance')
+
+
+def ego_observation(sim, cruise=None):
+    """Observation of the ego car as a batch of one.
+
+    The leader is the nearest traffic car ahead in any lane, since the
+    ego car blocks them all. ``desired_speed`` is ``cruise`` (km/h), no
+    faster than the car's top speed. With sensors enabled, ``lidar``
+    holds the last scan's ranges as a (1, beams) array.
+    """
+    traffic = sim.traffic
+    front = sim.car_x - sim.origin + sim.car_width
+    x = traffic.car_arrays()[0]
+    ids = traffic.cars_between(front - CULL_MARGIN, front + LOOKAHEAD)
+    ids = ids[x[ids] >= front]
+    gap, lead_speed = np.inf, 0.0
+    if ids.size:
+        leader = ids[np.argmin(x[ids])]
+        gap, lead_speed = x[leader] - front, traffic.car_speeds()[leader]
+    top = sim.top_speed if cruise is None else min(cruise, sim.top_speed)
+    observation = {
+        'speed': np.array([sim.current_speed / 10]),  # The ego car moves speed / 10 px per tick
+        'desired_speed': np.array([top / 10]),
+        'gap': np.array([gap]),
+        'lead_speed': np.array([lead_speed]),
+        'stop_distance': traffic.signals.stop_distance(np.array([front])),
+        'max_acceleration': np.array([SPEED_RESPONSE / 10]),
+        'max_braking': np.array([SPEED_RESPONSE / 10]),
+    }
+    if sim.sensors is not None:
+        observation['lidar'] = sim.sensors.ranges[None, :]
+    return observation
+
+
+def traffic_observation(sim):
+    """Observation of every traffic car, in engine order.
+
+    Leaders and gaps are the ones the IDM uses; the ego car counts as the
+    leader of any car it is ahead of and closer than its own leader.
+    """
+    traffic = sim.traffic
+    x, _, width = traffic.car_arrays()
+    speed = traffic.car_speeds()
+    gap, leader = traffic.following()
+    front = x + width
+    lead_speed = np.where(leader >= 0, speed[leader], 0.0)
+    ego_gap = np.where(front <= sim.car_x - sim.origin, sim.car_x - sim.origin - front, np.inf)
+    behind_ego = ego_gap < gap
+    return {
+        'speed': speed,
+        'desired_speed': traffic.drivers['v0'],
+        'gap': np.where(behind_ego, ego_gap, gap),
+        'lead_speed': np.where(behind_ego, sim.current_speed / 10, lead_speed),
+        'stop_distance': traffic.signals.stop_distance(front),
+        'max_acceleration': traffic.drivers['a'],
+        'max_braking': np.full(speed.size, TRAFFIC_MAX_BRAKING),
+    }
+
+
+def pedal_acceleration(throttle, brake, observation):
+    return throttle * observation['max_acceleration'] - brake * observation['max_braking']
+
+
+def batch(observations):
+    # Join observations along the vehicle axis; also returns where each one starts after the first
+    names = [name for name in observations[0] if all(name in other for other in observations)]
+    merged = {name: np.concatenate([observation[name] for observation in observations]) for name in names}
+    return merged, np.cumsum([len(observation['speed']) for observation in observations])[:-1]
+
+
+def evaluate(policy, observations):
+    """Run ``policy`` once on many observations (vehicles, simulations) joined together.
+
+    Returns a ``(throttle, brake)`` pair of arrays per observation.
+    """
+    merged, starts = batch(observations)
+    throttle, brake = policy(merged)
+    return list(zip(np.split(throttle, starts), np.split(brake, starts)))
+
+
+def drive_all(sims, policy, interval=CONTROL_INTERVAL, cruise=None):
+    # Work the ego pedals of many simulations with one policy call; call once per ``interval``
+    results = evaluate(policy, [ego_observation(sim, cruise) for sim in sims])
+    for sim, (throttle, brake) in zip(sims, results):
+        sim.drive(float(throttle[0]), float(brake[0]), ticks_for(interval))
+
+
+class RuleBasedPolicy:
+    """Drive up to the desired speed, hold a time headway, brake harder the closer it gets.
+
+    ``headway`` is in reference ticks and ``margin`` in px. Distances to
+    the leader and to a red stop line are treated alike; a stop line is
+    a leader that doesn't move.
+    """
+
+    def __init__(self, headway=60.0, margin=20.0):
+        self.headway = headway
+        self.margin = margin
+
+    def __call__(self, observation):
+        speed = observation['speed']
+        line_first = observation['stop_distance'] < observation['gap']
+        gap = np.where(line_first, observation['stop_distance'], observation['gap'])
+        lead = np.where(line_first, 0.0, observation['lead_speed'])
+        closing = np.maximum(speed - lead, 0)
+        stopping = closing ** 2 / (2 * observation['max_braking'])
+        safe = self.margin + self.headway * speed
+        below = speed < observation['desired_speed']
+        rules = [
+            gap <= self.margin + stopping,  # Only full braking stops in time
+            (gap < safe) & (closing > 0),  # Inside the headway and closing in
+            below & (gap > 2 * safe),  # Open road
+            below & (gap > safe),
+        ]
+        throttle = np.select(rules, [0.0, 0.0, 1.0, 0.5], 0.0)
+        brake = np.select(rules, [1.0, 0.5, 0.0, 0.0], 0.0)
+        return throttle, brake
+
+
+class AdaptiveCruisePolicy:
+    """Constant time gap adaptive cruise control.
+
+    Cruises towards ``desired_speed`` and, with a leader in range, follows
+    it at ``standstill`` px plus ``time_gap`` ticks of travel. It takes
+    whichever of the two accelerations is lower. Gap and speed errors are
+    fed back with ``k_gap`` and ``k_speed`` (per tick^2 and per tick,
+    close to critically damped). A red stop line is a stopped leader with
+    no standstill distance. The acceleration becomes throttle or brake
+    from each vehicle's limits.
+    """
+
+    def __init__(self, time_gap=60.0, standstill=30.0, k_gap=6.4e-5, k_speed=0.0117, k_cruise=0.01):
+        self.time_gap = time_gap
+        self.standstill = standstill
+        self.k_gap = k_gap
+        self.k_speed = k_speed
+        self.k_cruise = k_cruise
+
+    def __call__(self, observation):
+        speed = observation['speed']
+        line_first = observation['stop_distance'] < observation['gap']
+        gap = np.where(line_first, observation['stop_distance'], observation['gap'])
+        lead = np.where(line_first, 0.0, observation['lead_speed'])
+        target_gap = np.where(line_first, 0.0, self.standstill) + self.time_gap * speed
+        cruise = self.k_cruise * (observation['desired_speed'] - speed)
+        with np.errstate(invalid='ignore'):
+            follow = self.k_gap * (gap - target_gap) + self.k_speed * (lead - speed)
+        acceleration = np.where(np.isfinite(gap), np.minimum(cruise, follow), cruise)
+        return (np.clip(acceleration / observation['max_acceleration'], 0, 1),
+                np.clip(-acceleration / observation['max_braking'], 0, 1))
+
+
+def features(observation, horizon=GAP_HORIZON):
+    # FEATURES as an (N, len(FEATURES)) float32 matrix, distances capped at ``horizon``
+    return np.column_stack([np.minimum(observation[name], horizon) for name in FEATURES]).astype(np.float32)
+
+
+class TorchPolicy:
+    """A torch module as a policy, run on the CPU without gradients.
+
+    The module maps an (N, len(FEATURES)) float32 tensor from ``features``
+    to (N, 2) throttle and brake, which are clipped to [0, 1]. A whole
+    fleet, or many simulations joined by ``batch``, is one forward pass.
+    torch is only imported when a TorchPolicy is made.
+    """
+
+    def __init__(self, module, horizon=GAP_HORIZON):
+        import torch
+
+        self.torch = torch
+        self.module = module.to('cpu').eval()
+        self.horizon = horizon
+
+    def __call__(self, observation):
+        with self.torch.no_grad():
+            output = self.module(self.torch.from_numpy(features(observation, self.horizon))).numpy()
+        output = np.clip(output.astype(np.float64), 0, 1)
+        return output[:, 0], output[:, 1]
+
+
+POLICIES = {'rules': RuleBasedPolicy, 'acc': AdaptiveCruisePolicy}
+
+
+class Controller:
+    """Drives the ego car, and optionally every traffic car, from policies.
+
+    A policy is any callable that takes an observation and returns
+    ``(throttle, brake)`` arrays in [0, 1], one value per vehicle. An
+    observation is a dict of arrays with one row per vehicle: FEATURES,
+    plus each vehicle's ``max_acceleration`` and ``max_braking``. Policies
+    see every vehicle at once, so a rule set, a controller or a learned
+    model runs as a few array operations over a whole fleet.
+
+    ``policy`` works the ego car's pedals every ``interval`` seconds of
+    simulated time while the simulation runs (see Simulation.drive), and
+    aims for ``cruise`` km/h. ``traffic_policy``, when set, replaces every
+    traffic car's IDM acceleration each step. The engine still keeps cars
+    from running into their leaders, red lights or the ego car.
+    """
+
+    def __init__(self, policy=None, traffic_policy=None, interval=CONTROL_INTERVAL, cruise=None):
+        self.policy = policy
+        self.traffic_policy = traffic_policy
+        self.interval = interval
+        self.cruise = cruise
+        self.clock = 0.0
+
+    def update(self, sim, dt=FIXED_DT):
+        # Decide at a fixed simulated interval, holding the pedals in between
+        self.clock += dt
+        while self.clock >= self.interval:
+            self.clock -= self.interval
+            if self.policy is not None and sim.is_running:
+                throttle, brake = self.policy(ego_observation(sim, self.cruise))
+                sim.drive(float(throttle[0]), float(brake[0]), ticks_for(self.interval))
+
+    def traffic_acceleration(self, sim):
+        # Accelerations for the traffic engine, or None to leave every car to the IDM
+        if self.traffic_policy is None:
+            return None
+        observation = traffic_observation(sim)
+        throttle, brake = self.traffic_policy(observation)
+        return pedal_acceleration(throttle, brake, observation)
@@ -0,0 +1,315 @@
+import numpy as np
+from simulation.energy import (HOURS_PER_TICK, EnergyModel, game_motion, headlights_for, surface_for,
+                               traffic_motion)
+from simulation.idm import DRIVER_PARAMETERS
+from simulation.particles import ParticleSystem
+from simulation.profiler import NULL_SCOPE, FrameProfiler
+from simulation.rng import spawn_streams
+from simulation.scheduler import FIXED_DT, ticks_for
+from simulation.sensors import NONE, SensorSuite
+from simulation.traffic import TrafficSystem
+from simulation.weather import WeatherEffect
+from simulation.world import Camera, World
+
+STATS_INTERVAL = 1.0  # Seconds of simulated time between stats updates
+BOOST_PARTICLE_CAPACITY = 64  # One per tick with a 10-tick life never needs more
+SPEED_RESPONSE = 1.0  # km/h per reference tick the ego car's speed moves towards its target
+COMFORTABLE_BRAKING = DRIVER_PARAMETERS['b'][0]  # px/tick^2; the ego brakes for red lights from here on
+
+
+class Simulation:
+    """Headless simulation state: ego car, traffic, weather and vehicle stats.
+
+    Nothing here touches Qt, so the same object drives the GUI and batch
+    runs. ``step(dt)`` advances by ``dt`` simulated seconds; every rate is
+    scaled by it, so results depend on simulated time rather than on how
+    often the caller steps. Drive it from a FixedStepScheduler for
+    reproducible runs.
+
+    Each subsystem draws from its own generator in ``rngs``, all spawned
+    from ``seed``. Subsystems passed in keep whatever generator they have.
+    Stages of ``step`` are timed into ``profiler`` while it is enabled.
+
+    By default the road is a loop the width of the view. ``enable_world``
+    turns it into an unbounded road (see World). The ego car's ``car_x``
+    is then a world coordinate that ``camera`` follows, while the traffic
+    engine keeps coordinates relative to ``origin``. ``enable_sensors``
+    adds lidar and radar scans of the ego car's surroundings (see
+    SensorSuite). A ``controller`` drives the ego car, and optionally the
+    traffic, from policies (see Controller).
+    """
+
+    def __init__(self, traffic=None, weather=None, width=800, height=600, seed=None,
+                 traffic_engine=TrafficSystem):
+        self.seed = seed
+        self.rngs = spawn_streams(seed)
+        self.effects_rng = self.rngs['effects']
+
+        # Subsystems
+        self.traffic = traffic if traffic is not None else traffic_engine(rng=self.rngs['traffic'])
+        self.weather = weather if weather is not None else WeatherEffect(rng=self.rngs['weather'])
+        self.energy = EnergyModel()
+        self.profiler = FrameProfiler()
+
+        # World geometry (the viewer keeps this in sync with its size)
+        self.width = width
+        self.height = height
+        self.weather.resize(width, height)
+        self.camera = Camera(width)
+        self.world = None
+        self.origin = 0.0  # World x of the traffic engine's x = 0
+        self.sensors = None
+        self.controller = None  # Works the pedals while stepping (see Controller)
+
+        # Ego car properties
+        self.car_x = 50
+        self.prev_car_x = 50  # Position before the last step, for interpolated drawing
+        self.target_speed = 0
+        self.current_speed = 0
+        self.car_width = 60
+        self.car_height = 30
+        self.car_angle = 0
+        self.boost_mode = False
+        self.boost_particles = ParticleSystem(BOOST_PARTICLE_CAPACITY, decay=0.1)
+
+        # Vehicle statistics
+        self.speed = 0
+        self.battery = 100
+        self.distance = 0
+        self.safety_score = 100
+        self.cars_passed = 0
+        self.red_light_stops = 0  # Ticks the ego car braked for or waited at a red light
+        self.time_elapsed = 0
+        self.is_running = False
+
+        # Simulation clock
+        self.ticks = 0
+        self.clock = 0.0
+        self._stats_clock = 0.0
+
+    @property
+    def road_y(self):
+        return self.height - 180
+
+    @property
+    def car_y(self):
+        return int(self.road_y + 35)
+
+    def resize(self, width, height):
+        self.width = width
+        self.height = height
+        self.weather.resize(width, height)
+        self.camera.width = width
+
+    def enable_world(self, **kwargs):
+        # Stream an unbounded road around the camera instead of looping the screen
+        self.world = World(self.traffic, seed=int(self.rngs['world'].integers(2**63)), **kwargs)
+        self.origin = self.world.origin
+
+    def enable_sensors(self, **kwargs):
+        # Scan lidar and radar from the ego car while stepping (see SensorSuite)
+        self.sensors = SensorSuite(rng=self.rngs['sensors'], **kwargs)
+
+    def toggle_boost(self):
+        self.boost_mode = not self.boost_mode
+
+    def bounce_effect(self):
+        self.car_angle = self.effects_rng.uniform(-5, 5)
+
+    def set_speed(self, speed):
+        self.speed = speed
+        old_speed = self.target_speed
+        self.target_speed = speed
+        if speed > old_speed:
+            self.bounce_effect()
+
+    @property
+    def top_speed(self):
+        return 150 if self.boost_mode else 100
+
+    def accelerate(self):
+        speed_increase = 4 if self.boost_mode else 2
+        self.set_speed(min(self.top_speed, self.speed + speed_increase))
+
+    def brake(self):
+        self.set_speed(max(0, self.speed - 2))
+
+    def emergency_stop(self):
+        self.set_speed(0)
+
+    def drive(self, throttle=0.0, brake=0.0, ticks=1.0):
+        # Pedals held for ``ticks``: the target speed leads the current one by what they
+        # would add or shed at SPEED_RESPONSE; with neither pressed the target stays put
+        if throttle == 0 and brake == 0:
+            return
+        change = (throttle - brake) * SPEED_RESPONSE * ticks
+        self.set_speed(min(self.top_speed, max(0, self.current_speed + change)))
+
+    def change_weather(self, weather):
+        self.weather.is_raining = weather == "Rain"
+        self.weather.is_snowing = weather == "Snow"
+        self.weather.is_foggy = weather == "Fog"
+
+    def change_time(self, time):
+        self.weather.time_of_day = time.lower()
+
+    def add_boost_particle(self):
+        if self.boost_mode and self.current_speed > 0:
+            # Offset and size come from a single draw
+            y, size = self.effects_rng.integers([int(self.car_y - 10), 5],
+                                                [int(self.car_y + 10) + 1, 16]).tolist()
+            self.boost_particles.emit(self.car_x, y, vx=-5, size=size, life=1.0)
+
+    def update_boost_particles(self, ticks=1.0):
+        # Drift left and fade; dead particles free their slots
+        self.boost_particles.update(ticks)
+
+    def update_stats(self):
+        self.time_elapsed += 1
+
+        # Update safety score based on speed and proximity to other cars
+        if self.speed > 80:
+            self.safety_score = max(0, self.safety_score - 1)
+        elif self.speed < 60:
+            self.safety_score = min(100, self.safety_score + 0.5)
+
+    @property
+    def range_km(self):
+        # Distance left at the current speed in the current conditions
+        return float(self.energy.range_km(self.battery, self.current_speed / 3.6, surface_for(self.weather),
+                                          self.boost_mode, headlights_for(self.weather)))
+
+    def interpolated_car_x(self, alpha):
+        # Blend the last two physics states; don't smear across a wrap
+        if self.car_x < self.prev_car_x:
+            return self.car_x
+        return self.prev_car_x + (self.car_x - self.prev_car_x) * alpha
+
+    def step(self, dt=FIXED_DT):
+        # Rates below are per reference tick, scaled to dt
+        ticks = ticks_for(dt)
+
+        # The controller decides before anything moves
+        if self.controller is not None:
+            with self.profiler.scope('control'):
+                self.controller.update(self, dt)
+
+        # Smoothly adjust current speed towards target speed
+        start_speed = self.current_speed
+        if self.current_speed < self.target_speed:
+            self.current_speed = min(self.target_speed, self.current_speed + SPEED_RESPONSE * ticks)
+        elif self.current_speed > self.target_speed:
+            self.current_speed = max(self.target_speed, self.current_speed - SPEED_RESPONSE * ticks)
+
+        # Brake for red lights the way the IDM does: once stopping at the line takes
+        # the comfortable deceleration or more, brake at exactly the rate that stops there
+        front = self.car_x - self.origin + self.car_width
+        room = float(self.traffic.signals.stop_distance(np.array([front]))[0])
+        held = False
+        if start_speed > 0 and room < np.inf:
+            v = start_speed / 10  # px per reference tick
+            needed = v * v / (2 * room) if room > 0 else np.inf
+            if needed >= COMFORTABLE_BRAKING:
+                self.current_speed = min(self.current_speed, max(0.0, start_speed - needed * 10 * ticks))
+                held = True
+
+        # Update car position based on current speed, never past a red stop line
+        old_x = self.prev_car_x = self.car_x
+        if self.current_speed > 0:
+            advance = self.current_speed / 10 * ticks
+            if advance > room:
+                advance = max(room, 0)
+                self.current_speed = advance * 10 / ticks
+                held = True
+            self.car_x += advance
+            if self.world is None and self.car_x > self.width:
+                self.car_x = 0
+        self.red_light_stops += held
+
+        # Update distance from the speed the car actually drove, not its target
+        self.distance += self.current_speed * 0.001 * ticks
+
+        # Drain the battery for this tick's speed and acceleration, on the game clock
+        surface, headlights = surface_for(self.weather), headlights_for(self.weather)
+        hours = HOURS_PER_TICK * ticks
+        speed, acceleration = game_motion(self.current_speed, start_speed, ticks)
+        self.battery = float(self.energy.drain(self.battery, speed, acceleration, hours,
+                                               surface, self.boost_mode, headlights))
+
+        # Accelerations for the traffic cars, if the controller drives them too
+        command = None
+        if self.controller is not None:
+            with self.profiler.scope('control'):
+                command = self.controller.traffic_acceleration(self)
+
+        # Update traffic with main car position (in the engine's coordinates)
+        tier = self.world.tiers.scope('micro') if self.world is not None else NULL_SCOPE
+        with self.profiler.scope('traffic'), tier:
+            previous_speed = self.traffic.car_speeds()
+            self.traffic.update(self.car_x - self.origin, self.car_width, dt, command)
+
+            # Count the traffic cars the ego car moved past this tick
+            if self.car_x > old_x:
+                self.cars_passed += self.traffic.count_cars_between(old_x - self.origin, self.car_x - self.origin)
+
+        # Every traffic car's battery in one call
+        with self.profiler.scope('energy'):
+            speed, acceleration = traffic_motion(self.traffic.car_speeds(), previous_speed, ticks)
+            self.traffic.charge = self.energy.drain(self.traffic.charge, speed, acceleration, hours,
+                                                    surface, False, headlights)
+
+        # Follow the ego car and stream road segments in and out
+        if self.world is not None:
+            with self.profiler.scope('world'):
+                self.camera.follow(self.car_x)
+                self.world.update(self.camera.x, dt)
+                self.origin = self.world.origin
+
+        # Scan the surroundings when the sensors are due
+        if self.sensors is not None:
+            with self.profiler.scope('sensors'):
+                self.sensors.update(self, dt)
+
+        # Update weather
+        with self.profiler.scope('weather'):
+            self.weather.update(dt)
+
+        # Add and update boost particles
+        with self.profiler.scope('effects'):
+            self.add_boost_particle()
+            self.update_boost_particles(ticks)
+
+        # Advance the clock; stats tick once per simulated second while running
+        self.ticks += 1
+        self.clock += dt
+        if self.is_running:
+            self._stats_clock += dt
+            while self._stats_clock >= STATS_INTERVAL:
+                self._stats_clock -= STATS_INTERVAL
+                self.update_stats()
+
+    def stats(self):
+        stats = {
+            'ticks': self.ticks,
+            'time_elapsed': self.time_elapsed,
+            'speed': self.speed,
+            'battery': self.battery,
+            'range_km': self.range_km,
+            'distance': self.distance,
+            'safety_score': self.safety_score,
+            'cars_passed': self.cars_passed,
+            'collisions_avoided': self.traffic.collisions_avoided,
+            'lane_changes': self.traffic.lane_changes,
+            'traffic_cars': len(self.traffic.cars),
+            'pedestrians': len(self.traffic.pedestrians),
+            'red_light_stops': self.red_light_stops,
+            'signal_queue': int(self.traffic.signals.queue.sum()),
+            'signal_throughput': int(self.traffic.signals.throughput.sum()),
+        }
+        if self.world is not None:
+            stats.update(self.world.stats())
+        if self.sensors is not None:
+            stats['sensor_scans'] = self.sensors.scans
+            stats['lidar_returns'] = int(np.count_nonzero(self.sensors.kinds != NONE))
+            stats['radar_objects'] = len(self.sensors.objects)
+        return stats
@@ -0,0 +1,98 @@
+import numpy as np
+from simulation.idm import DRIVER_PARAMETERS
+from simulation.network import VEHICLE_LENGTH
+
+CELL_LENGTH = 100  # Pixels of road per cell
+
+
+def fundamental_diagram(parameters=DRIVER_PARAMETERS, length=VEHICLE_LENGTH):
+    """Triangular flow-density relation matching the mean IDM driver, per lane.
+
+    Returns ``(free_speed, wave_speed, jam_density, capacity)``, with speeds
+    in px/tick, densities in cars/px and capacity in cars/tick.
+    Free-flowing cars travel at ``v0``. Jammed cars stand ``s0`` apart. At
+    capacity, cars at ``v0`` follow ``T`` ticks behind the car ahead.
+    """
+    v0, headway, s0 = parameters['v0'][0], parameters['T'][0], parameters['s0'][0]
+    jam_density = 1 / (length + s0)
+    capacity = 1 / (headway + (length + s0) / v0)
+    critical = capacity / v0
+    return v0, capacity / (jam_density - critical), jam_density, capacity
+
+
+class CellTransmissionModel:
+    """Macroscopic traffic on a one-way road split into equal cells.
+
+    ``count`` holds the (fractional) number of cars in each cell. Each tick,
+    a cell sends what its cars cover at the free speed, up to capacity.
+    The next cell receives only what fits before jam density, so queues
+    spill back at the wave speed. This is Daganzo's cell transmission
+    model, a discretisation of the LWR equations. A tick is a handful of
+    array operations over every cell, however many cars they hold.
+    Cars only enter through ``update``'s ``inflow`` and leave at the
+    downstream end, so the total is conserved exactly.
+    """
+
+    def __init__(self, cells, lanes=2, cell_length=CELL_LENGTH, parameters=DRIVER_PARAMETERS):
+        self.cell_length = float(cell_length)
+        self.lanes = lanes
+        free_speed, wave_speed, jam_density, capacity = fundamental_diagram(parameters)
+        self.free_speed = free_speed
+        self.wave_speed = wave_speed
+        self.jam_count = jam_density * lanes * self.cell_length  # Cars a full cell holds
+        self.capacity = capacity * lanes  # Cars per tick across a cell boundary
+        self.count = np.zeros(cells, dtype=np.float64)
+        self.outflow = 0.0  # Cars that left the downstream end so far
+        self.send = np.empty(cells)  # Scratch buffers, reused every tick
+        self.receive = np.empty(cells)
+
+    def __len__(self):
+        return self.count.size
+
+    def total(self):
+        return float(self.count.sum())
+
+    def speed(self, count=None):
+        # Equilibrium speed at each cell's density: free below critical, then limited by the wave
+        count = self.count if count is None else count
+        congested = self.wave_speed * (self.jam_count / np.maximum(count, 1e-9) - 1)
+        return np.clip(congested, 0, self.free_speed)
+
+    def flow(self, count):
+        # Equilibrium flow (cars/tick) of cells holding ``count`` cars
+        free = self.free_speed * count / self.cell_length
+        congested = self.wave_speed * (self.jam_count - count) / self.cell_length
+        return np.clip(np.minimum(free, congested), 0, self.capacity)
+
+    def receiving(self, ticks=1.0):
+        # Cars the first cell can take this tick
+        room = self.wave_speed * ticks / self.cell_length * (self.jam_count - self.count[0])
+        return max(0.0, min(self.capacity * ticks, room))
+
+    def update(self, ticks=1.0, inflow=0.0):
+        # The free speed may not cross more than a cell per tick (CFL)
+        count, send, receive = self.count, self.send, self.receive
+        capacity = self.capacity * ticks
+        np.multiply(count, min(1.0, self.free_speed * ticks / self.cell_length), out=send)
+        np.minimum(send, capacity, out=send)
+        np.subtract(self.jam_count, count, out=receive)
+        receive *= self.wave_speed * ticks / self.cell_length
+        np.clip(receive, 0, capacity, out=receive)
+        flow = np.minimum(send[:-1], receive[1:], out=receive[1:])
+        outflow = send[-1]
+        count[:-1] -= flow
+        count[1:] += flow
+        count[-1] -= outflow
+        count[0] += inflow
+        self.outflow += outflow
+
+    def take(self, cells):
+        # Remove and return the upstream ``cells`` cells, shifting the rest up
+        taken = self.count[:cells].copy()
+        self.count[:-cells] = self.count[cells:]
+        self.count[-cells:] = 0
+        return taken
+
+    def fill(self, counts):
+        # Set the downstream ``len(counts)`` cells
+        self.count[-len(counts):] = counts
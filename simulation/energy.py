@@ -0,0 +1,119 @@
+import numpy as np
+
+# Vehicle (a compact EV) for the power tables
+MASS = 1600.0  # kg
+DRAG_AREA = 0.6  # Drag coefficient times frontal area, m^2
+AIR_DENSITY = 1.2  # kg/m^3
+GRAVITY = 9.81
+DRIVE_EFFICIENCY = 0.9  # Battery to wheels
+REGEN_EFFICIENCY = 0.6  # Wheels back to battery when braking
+MAX_DRIVE_KW = 150.0
+MAX_REGEN_KW = 60.0
+AUX_KW = 0.3  # Always-on electronics
+HEADLIGHT_KW = 0.15
+BOOST_FACTOR = 1.3  # Boost mode draws this much more for the same traction
+BATTERY_KWH = 20.0
+
+# Road surfaces and their rolling resistance coefficients
+SURFACES = ('dry', 'wet', 'snow')
+ROLLING_RESISTANCE = (0.010, 0.013, 0.020)
+
+# Table grid: speed in m/s, acceleration in m/s^2
+TABLE_SPEEDS = np.linspace(0.0, 60.0, 61)
+TABLE_ACCELERATIONS = np.linspace(-4.0, 4.0, 33)
+
+# Batteries run on the game clock, for the ego car and traffic alike: one reference
+# tick is this much driving, the same scale Simulation.distance uses (speed * 0.001
+# km per tick), and accelerations are speed changes over that time. On screen, a
+# vehicle moving s px per tick is doing KMH_PER_PX_TICK * s km/h, as the ego car does
+HOURS_PER_TICK = 0.001
+SECONDS_PER_TICK = HOURS_PER_TICK * 3600
+KMH_PER_PX_TICK = 10.0
+RANGE_MIN_SPEED = 30 / 3.6  # Range is projected at no less than 30 km/h
+
+
+def surface_for(weather):
+    if weather.is_snowing:
+        return 2
+    if weather.is_raining:
+        return 1
+    return 0
+
+
+def headlights_for(weather):
+    return weather.time_of_day == "night" or weather.is_foggy
+
+
+def power_table(speeds=TABLE_SPEEDS, accelerations=TABLE_ACCELERATIONS, rolling=ROLLING_RESISTANCE):
+    """Battery power (kW, negative when regenerating) on a (surface, speed, acceleration) grid.
+
+    Traction is inertia plus aerodynamic drag plus rolling resistance,
+    times speed. It is then divided by the drive efficiency, or scaled
+    by the regeneration efficiency when negative, and clipped to the
+    motor's limits. Auxiliary loads are not included.
+    """
+    v = speeds[None, :, None]
+    a = accelerations[None, None, :]
+    crr = np.asarray(rolling)[:, None, None]
+    force = MASS * a + 0.5 * AIR_DENSITY * DRAG_AREA * v * v + MASS * GRAVITY * crr * (v > 0)
+    wheel_kw = force * v / 1000
+    battery_kw = np.where(wheel_kw > 0, wheel_kw / DRIVE_EFFICIENCY, wheel_kw * REGEN_EFFICIENCY)
+    return np.clip(battery_kw, -MAX_REGEN_KW, MAX_DRIVE_KW)
+
+
+class EnergyModel:
+    """Battery drain and range for any number of vehicles, one array call per tick.
+
+    Power comes from tables precomputed by ``power_table`` and read with
+    vectorized bilinear interpolation, so cost is a few array operations
+    whatever the fleet size. Inputs can be scalars or arrays of the same
+    length, per vehicle: speed (m/s), acceleration (m/s^2), boost.
+    Surface and headlights follow the weather. Charge is in percent of
+    ``capacity`` kWh.
+    """
+
+    def __init__(self, capacity=BATTERY_KWH, speeds=TABLE_SPEEDS, accelerations=TABLE_ACCELERATIONS):
+        self.capacity = capacity
+        self.speeds = speeds
+        self.accelerations = accelerations
+        self.table = power_table(speeds, accelerations)
+
+    def power(self, speed, acceleration=0.0, surface=0, boost=False, headlights=False):
+        # Battery power in kW: interpolated traction, boost factor, then auxiliary loads
+        table = self.table[surface]
+        i, fi = self.cell(self.speeds, speed)
+        j, fj = self.cell(self.accelerations, acceleration)
+        low = table[i, j] + (table[i, j + 1] - table[i, j]) * fj
+        high = table[i + 1, j] + (table[i + 1, j + 1] - table[i + 1, j]) * fj
+        kw = low + (high - low) * fi
+        kw = np.where(boost & (kw > 0), kw * BOOST_FACTOR, kw)
+        return kw + (AUX_KW + HEADLIGHT_KW * headlights)
+
+    @staticmethod
+    def cell(grid, value):
+        # Lower grid index and fraction towards the next, clamped to the grid
+        position = np.clip((np.asarray(value, dtype=np.float64) - grid[0]) / (grid[1] - grid[0]),
+                           0, grid.size - 1)
+        index = np.minimum(position.astype(np.int64), grid.size - 2)
+        return index, position - index
+
+    def drain(self, charge, speed, acceleration, hours, surface=0, boost=False, headlights=False):
+        # New charge after ``hours`` of driving; regeneration never charges past full
+        used = self.power(speed, acceleration, surface, boost, headlights) * hours
+        return np.clip(charge - used / self.capacity * 100, 0, 100)
+
+    def range_km(self, charge, speed, surface=0, boost=False, headlights=False):
+        # Distance left cruising at ``speed`` (no slower than RANGE_MIN_SPEED)
+        speed = np.maximum(speed, RANGE_MIN_SPEED)
+        kwh_per_km = self.power(speed, 0.0, surface, boost, headlights) / (speed * 3.6)
+        return charge / 100 * self.capacity / kwh_per_km
+
+
+def game_motion(speed, previous, ticks):
+    # Speeds (km/h) after and before a step of ``ticks`` reference ticks, as m/s and m/s^2 on the game clock
+    return speed / 3.6, (speed - previous) / 3.6 / (ticks * SECONDS_PER_TICK)
+
+
+def traffic_motion(speed, previous, ticks):
+    # The same for traffic car speeds in px/tick
+    return game_motion(speed * KMH_PER_PX_TICK, previous * KMH_PER_PX_TICK, ticks)
@@ -0,0 +1,120 @@
+import copy
+import time
+import numpy as np
+from simulation.core import Simulation
+from simulation.signals import SignalController
+
+# Simulation scalars a frame carries for drawing and the stats panel
+FRAME_FIELDS = (
+    'width', 'height', 'car_x', 'prev_car_x', 'car_width', 'car_height', 'car_angle', 'boost_mode',
+    'current_speed', 'speed', 'battery', 'range_km', 'distance', 'safety_score', 'cars_passed', 'red_light_stops',
+    'time_elapsed', 'is_running', 'ticks', 'clock', 'origin',
+)
+
+
+class ParticleFrame:
+    # Live particles only, packed; live() keeps the ParticleSystem drawing interface
+    def __init__(self, particles):
+        live = particles.live()
+        self.x = particles.x[live]
+        self.y = particles.y[live]
+        self.vy = particles.vy[live]
+        self.size = particles.size[live]
+        self.life = particles.life[live]
+
+    def __len__(self):
+        return self.x.size
+
+    def live(self):
+        return np.arange(self.x.size)
+
+
+class WeatherFrame:
+    def __init__(self, weather):
+        self.is_raining = weather.is_raining
+        self.is_snowing = weather.is_snowing
+        self.is_foggy = weather.is_foggy
+        self.time_of_day = weather.time_of_day
+        self.particles = ParticleFrame(weather.particles)
+
+    @property
+    def raindrops(self):
+        return np.column_stack((self.particles.x, self.particles.y, self.particles.vy))
+
+
+class TrafficFrame:
+    """Read-only traffic state in the layout the view draws from.
+
+    Holds car, pedestrian and light arrays plus the dict views
+    (``cars``, ``pedestrians``, ``traffic_lights``) built from them, so
+    anything that draws a traffic engine can draw a frame too.
+    """
+
+    def __init__(self, car_x=(), car_lane=(), car_width=(), ped_x=(), light_x=(), light_green=(),
+                 car_speed=None, ped_speed=None, collisions_avoided=0, lane_changes=0):
+        self.car_x = np.asarray(car_x, dtype=np.float64)
+        self.car_lane = np.asarray(car_lane, dtype=np.int64)
+        self.car_width = np.asarray(car_width, dtype=np.float64)
+        self.car_speed = np.zeros(self.car_x.size) if car_speed is None else np.asarray(car_speed)
+        self.ped_x = np.asarray(ped_x, dtype=np.float64)
+        self.ped_speed = np.zeros(self.ped_x.size) if ped_speed is None else np.asarray(ped_speed)
+        self.signals = SignalController()
+        self.signals.x = np.asarray(light_x, dtype=np.float64)
+        self.signals.green = np.asarray(light_green, dtype=bool)
+        self.signals.timer = np.zeros(self.signals.x.size)
+        self.collisions_avoided = collisions_avoided
+        self.lane_changes = lane_changes
+
+    @classmethod
+    def capture(cls, traffic):
+        # Copies, so the engine can keep stepping while the frame is drawn
+        x, lane, width = traffic.car_arrays()
+        return cls(x.copy(), lane.copy(), width.copy(), traffic.pedestrian_arrays().copy(),
+                   traffic.signals.x.copy(), traffic.signals.green.copy(),
+                   collisions_avoided=traffic.collisions_avoided, lane_changes=traffic.lane_changes)
+
+    @property
+    def cars(self):
+        return [{'x': x, 'speed': speed, 'width': width, 'lane': lane}
+                for x, speed, width, lane in zip(self.car_x.tolist(), self.car_speed.tolist(),
+                                                 self.car_width.tolist(), self.car_lane.tolist())]
+
+    @property
+    def pedestrians(self):
+        return [{'x': x, 'speed': speed} for x, speed in zip(self.ped_x.tolist(), self.ped_speed.tolist())]
+
+    @property
+    def traffic_lights(self):
+        return self.signals.lights
+
+    def car_arrays(self):
+        return self.car_x, self.car_lane, self.car_width
+
+    def pedestrian_arrays(self):
+        return self.ped_x
+
+
+class SimulationFrame:
+    """Immutable copy of everything SimulationView and the stats panel read.
+
+    Frames are built by whoever steps the simulation and handed to the GUI
+    whole, so drawing never sees a half-updated state. ``alpha`` is the
+    scheduler's leftover step fraction when the frame was taken and
+    ``published_at`` the ``time.perf_counter`` time it was taken.
+    ``stage_totals`` carries the simulation profiler's running totals.
+    """
+
+    def __init__(self, sim, alpha=1.0):
+        for name in FRAME_FIELDS:
+            setattr(self, name, getattr(sim, name))
+        self.traffic = TrafficFrame.capture(sim.traffic)
+        self.weather = WeatherFrame(sim.weather)
+        self.boost_particles = ParticleFrame(sim.boost_particles)
+        self.camera = copy.copy(sim.camera)
+        self.stage_totals = sim.profiler.totals()
+        self.alpha = alpha
+        self.published_at = time.perf_counter()
+
+    road_y = Simulation.road_y
+    car_y = Simulation.car_y
+    interpolated_car_x = Simulation.interpolated_car_x
@@ -1,11 +1,25 @@
+import argparse
 import sys
-import random
+import time
 import numpy as np
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
                            QPushButton, QLabel, QProgressBar, QGroupBox, QSlider, QComboBox)
 from PyQt6.QtGui import QPainter, QColor, QPen, QKeyEvent, QFont, QLinearGradient, QRadialGradient
-from PyQt6.QtCore import Qt, QTimer, QPointF
+from PyQt6.QtCore import Qt, QTimer, QPointF, QElapsedTimer, QLineF, QRectF
 from assets.app_icon import create_app_icon
+from simulation.control import POLICIES, Controller
+from simulation.core import Simulation
+from simulation.presenter import STATS_REFRESH_RATE, StatsPresenter
+from simulation.profiler import FrameProfiler
+from simulation.recording import Recording, ReplaySimulation, TrajectoryRecorder
+from simulation.render import (ALPHA_LEVELS, MARKING_HEIGHT, MARKING_PERIOD, LayerCache, PrimitiveArray, StarField,
+                               alpha_buckets, draw_text_panel)
+from simulation.scheduler import FIXED_DT, MAX_STEPS_PER_FRAME, FixedStepScheduler
+from simulation.worker import SimulationWorker
+
+KEY_INTERVAL = 0.05  # Seconds of simulated time between held-key samples
+PROFILE_PATH = "frame_profile.json"  # Where F4 writes the profiler trace
+SEEK_SECONDS = 10  # Left/Right jump this far in a replay
 
 # Set application style
 APP_STYLE = """
@@ -82,233 +96,227 @@ QComboBox QAbstractItemView {
 }
 """
 
-class WeatherEffect:
-    def __init__(self):
-        self.raindrops = []
-        self.is_raining = False
-        self.is_snowing = False
-        self.is_foggy = False
-        self.time_of_day = "day"  # day, night, sunset
-        
-    def update(self):
-        if self.is_raining or self.is_snowing:
-            # Add new particles
-            for _ in range(5):
-                x = random.randint(0, 800)
-                y = random.randint(0, 600)
-                speed = random.uniform(5, 10)
-                self.raindrops.append([x, y, speed])
-                
-        # Update existing particles
-        for drop in self.raindrops[:]:
-            drop[1] += drop[2]  # Move down
-            if drop[1] > 600:
-                self.raindrops.remove(drop)
+# Widget stylesheets with their named states, parsed once per widget;
+# StatsPresenter.set_state switches between them
+SPEED_LABEL_STYLE = """
+QLabel {
+    font-size: 24px;
+    color: blue;
+    font-weight: bold;
+    padding: 5px;
+    background-color: #f0f0f0;
+    border-radius: 5px;
+}
 
-class TrafficSystem:
-    def __init__(self):
-        self.cars = []
-        self.pedestrians = []
-        self.traffic_lights = []
-        
-        # Initialize some traffic
-        self.add_traffic_cars(3)
-        self.add_pedestrians(2)
-        self.add_traffic_lights(2)
-        
-    def check_collision(self, x1, w1, x2, w2):
-        # Check if two objects overlap horizontally
-        return (x1 < x2 + w2) and (x1 + w1 > x2)
-        
-    def add_traffic_cars(self, count):
-        for _ in range(count):
-            x = random.randint(100, 700)
-            speed = random.uniform(1, 2)
-            self.cars.append({
-                'x': x,
-                'speed': speed,
-                'width': 40,  # Car width
-                'lane': random.choice([0, 1])  # 0 for top lane, 1 for bottom lane
-            })
-            
-    def add_pedestrians(self, count):
-        for _ in range(count):
-            x = random.randint(100, 700)
-            speed = random.uniform(0.5, 1)
-            self.pedestrians.append({'x': x, 'speed': speed})
-            
-    def add_traffic_lights(self, count):
-        spacing = 800 / (count + 1)
-        for i in range(count):
-            x = int(spacing * (i + 1))
-            self.traffic_lights.append({
-                'x': x,
-                'state': 'green',
-                'timer': random.randint(50, 150)
-            })
-            
-    def update(self, main_car_x=0, main_car_width=60):
-        # Update traffic cars
-        for car in self.cars:
-            # Store old position for collision check
-            old_x = car['x']
-            
-            # Update position
-            car['x'] += car['speed']
-            
-            # Check collision with main car
-            if self.check_collision(car['x'], car['width'], main_car_x, main_car_width):
-                # If collision would occur, revert to old position and adjust speed
-                car['x'] = old_x
-                car['speed'] = max(0, car['speed'] - 0.1)  # Slow down
-            else:
-                car['speed'] = min(2, car['speed'] + 0.1)  # Speed up if no collision
-            
-            # Reset position if off screen
-            if car['x'] > 800:
-                car['x'] = -car['width']
-                car['lane'] = random.choice([0, 1])  # Choose new lane
-                
-        # Update pedestrians
-        for ped in self.pedestrians:
-            ped['x'] += ped['speed']
-            if ped['x'] > 800:
-                ped['x'] = 0
-                
-        # Update traffic lights
-        for light in self.traffic_lights:
-            light['timer'] -= 1
-            if light['timer'] <= 0:
-                light['state'] = 'red' if light['state'] == 'green' else 'green'
-                light['timer'] = random.randint(50, 150)
+QLabel[state="boost"] {
+    color: orange;
+}
+"""
+
+SAFETY_LABEL_STYLE = """
+QLabel {
+    font-size: 18px;
+    color: green;
+    font-weight: bold;
+}
+
+QLabel[state="warning"] {
+    color: orange;
+}
+
+QLabel[state="danger"] {
+    color: red;
+}
+"""
+
+START_BUTTON_STYLE = """
+QPushButton {
+    background-color: #4CAF50;
+    color: white;
+    font-size: 20px;
+    padding: 15px;
+    border-radius: 10px;
+    font-weight: bold;
+}
+
+QPushButton[state="running"] {
+    background-color: #f44336;
+}
+"""
 
 class SimulationView(QWidget):
-    def __init__(self):
+    def __init__(self, simulation=None):
         super().__init__()
         self.setMinimumSize(800, 600)
         
-        # Initialize subsystems
-        self.weather = WeatherEffect()
-        self.traffic = TrafficSystem()
-        
-        # Car properties
-        self.car_x = 50
-        self.target_speed = 0
-        self.current_speed = 0
-        self.car_width = 60
+        # The view only draws; all state lives in the headless Simulation
+        self.sim = simulation if simulation is not None else Simulation()
         self.car_color = QColor(0, 100, 255)  # Nice blue color
-        self.boost_mode = False
-        self.boost_particles = []
-        self.car_height = 30
-        self.car_angle = 0
-        
-    def toggle_boost(self):
-        self.boost_mode = not self.boost_mode
-        if self.boost_mode:
-            self.car_color = QColor(255, 165, 0)  # Orange for boost mode
+        self.boost_color = QColor(255, 165, 0)  # Orange for boost mode
+        self.alpha = 1.0  # Interpolation factor between the last two physics steps
+        
+        # With a worker thread, frames come from its FrameBuffer; each paint
+        # draws one frame (or the live simulation) from start to finish
+        self.frames = None
+        self.frame = self.sim
+        self.profiler = self.sim.profiler  # A separate one when another thread steps the simulation
+        self.worker = None  # Changes to the simulation are submitted to it when set
+        
+        # Batched drawing groups primitives by style and submits them as
+        # arrays; the immediate path issues one call per primitive
+        self.batched = True
+        self.line_batch = PrimitiveArray(QLineF)
+        self.rect_batch = PrimitiveArray(QRectF)
+        self.point_batch = PrimitiveArray(QPointF)
+        self.boost_colors = [QColor(255, 165, 0, int(255 * (bucket + 1) / ALPHA_LEVELS))
+                             for bucket in range(ALPHA_LEVELS)]
+        self.layers = [
+            ('background', self.draw_background),
+            ('boost', self.draw_boost_particles),
+            ('ego', self.draw_ego_car),
+            ('lights', self.draw_traffic_lights),
+            ('traffic', self.draw_traffic_cars),
+            ('pedestrians', self.draw_pedestrians),
+            ('weather', self.draw_weather),
+            ('fog', self.draw_fog),
+        ]
+        self.layer_times = {}  # Milliseconds per layer for the last frame
+        self.show_profiler = False  # Frame time overlay, toggled with F3
+        self.overlay_font = QFont("monospace", 9)
+        
+        # Sky, ground and road only change with size or time of day; lane
+        # markings are one strip, a dash period wider than the view, that
+        # scrolls with the camera
+        self.background_cache = LayerCache(self.paint_static_background)
+        self.marking_cache = LayerCache(self.paint_lane_markings)
+        
+        # Stars are generated once per size from the simulation's star stream;
+        # still stars live in the cached background, twinkling ones are drawn per frame
+        self.stars = StarField(seed=int(self.sim.rngs['stars'].integers(2**63)))
+        
+    @property
+    def weather(self):
+        return self.frame.weather
+        
+    @property
+    def traffic(self):
+        return self.frame.traffic
+        
+    @property
+    def boost_mode(self):
+        return self.frame.boost_mode
+        
+    def toggle_profiler(self):
+        # The overlay and the timing scopes go on and off together
+        self.show_profiler = not self.show_profiler
+        self.profiler.set_enabled(self.show_profiler)
+        self.update()
+        
+    def command(self, fn, *args):
+        # Run a change to the simulation on whichever thread steps it
+        if self.worker is not None:
+            self.worker.submit(fn, *args)
         else:
-            self.car_color = QColor(0, 100, 255)  # Back to blue
-            
-    def add_boost_particle(self):
-        if self.boost_mode and self.current_speed > 0:
-            self.boost_particles.append({
-                'x': self.car_x,
-                'y': random.randint(int(self.car_y - 10), int(self.car_y + 10)),
-                'size': random.randint(5, 15),
-                'life': 1.0
-            })
+            fn(*args)
             
-    def update_boost_particles(self):
-        new_particles = []
-        for p in self.boost_particles:
-            p['x'] -= 5
-            p['life'] -= 0.1
-            if p['life'] > 0:
-                new_particles.append(p)
-        self.boost_particles = new_particles
-        
-    def bounce_effect(self):
-        self.car_angle = random.uniform(-5, 5)
-        
-    def set_speed(self, speed):
-        old_speed = self.target_speed
-        self.target_speed = speed
-        if speed > old_speed:
-            self.bounce_effect()
-            
-    def update_simulation(self):
-        # Smoothly adjust current speed towards target speed
-        if self.current_speed < self.target_speed:
-            self.current_speed = min(self.target_speed, self.current_speed + 1)
-        elif self.current_speed > self.target_speed:
-            self.current_speed = max(self.target_speed, self.current_speed - 1)
-            
-        # Update car position based on current speed
-        if self.current_speed > 0:
-            self.car_x += self.current_speed / 10
-            if self.car_x > self.width():
-                self.car_x = 0
-        
-        # Update traffic with main car position
-        self.traffic.update(self.car_x, self.car_width)
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.command(self.sim.resize, self.width(), self.height())
+        self.invalidate_background()
         
-        # Update weather
-        self.weather.update()
+    def invalidate_background(self):
+        self.background_cache.invalidate()
+        self.marking_cache.invalidate()
         
-        # Add boost particles
-        self.add_boost_particle()
+    def set_star_twinkle(self, enabled):
+        self.stars.twinkle = enabled
+        self.invalidate_background()
         
-        # Update boost particles
-        self.update_boost_particles()
+    def update_simulation(self, dt=FIXED_DT):
+        # Advance the model one step
+        self.sim.step(dt)
         
         # Trigger repaint
         self.update()
         
     def paintEvent(self, event):
+        frame = self.frames.latest() if self.frames is not None else None
+        self.frame = frame if frame is not None else self.sim
         painter = QPainter(self)
         painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        with self.profiler.scope('paint'):
+            self.draw_scene(painter)
+        if self.show_profiler:
+            self.draw_profiler_overlay(painter)
+        painter.end()
+        
+    def draw_scene(self, painter):
+        # Draw each layer in order, recording how long it took (ms)
+        layer_times = {}
+        for name, draw in self.layers:
+            start = time.perf_counter()
+            draw(painter)
+            layer_times[name] = (time.perf_counter() - start) * 1000
+        self.layer_times = layer_times
+        
+    def draw_background(self, painter):
+        # Blit the cached static layers in one call
+        pixmap = self.background_cache.get(self.width(), self.height(), self.weather.time_of_day,
+                                           self.devicePixelRatioF())
+        painter.drawPixmap(0, 0, pixmap)
+        
+        if self.weather.time_of_day == "night" and self.stars.twinkle:
+            self.stars.draw(painter, self.width(), self.height() - 200, self.frame.clock)
+            
+        # Lane markings move with the road
+        strip = self.marking_cache.get(self.width() + MARKING_PERIOD, MARKING_HEIGHT, None,
+                                       self.devicePixelRatioF())
+        left = self.frame.camera.interpolated_x(self.alpha)
+        painter.drawPixmap(QPointF(-(left % MARKING_PERIOD), self.height() - 130 - MARKING_HEIGHT / 2), strip)
+            
+        # Later layers expect the pen the lane markings leave behind
+        painter.setPen(QPen(Qt.GlobalColor.white, 3))
         
+    def paint_static_background(self, painter, width, height, time_of_day):
         # Draw background based on time of day
-        if self.weather.time_of_day == "night":
-            painter.fillRect(0, 0, self.width(), self.height(), QColor(0, 0, 50))
-            # Add stars
-            for _ in range(50):
-                x = random.randint(0, self.width())
-                y = random.randint(0, self.height() - 200)
-                size = random.randint(1, 3)
-                painter.fillRect(x, y, size, size, QColor(255, 255, 255))
-        elif self.weather.time_of_day == "sunset":
-            gradient = QLinearGradient(0, 0, 0, self.height())
+        if time_of_day == "night":
+            painter.fillRect(0, 0, width, height, QColor(0, 0, 50))
+            # Add stars (twinkling ones are drawn per frame instead)
+            if not self.stars.twinkle:
+                self.stars.draw(painter, width, height - 200)
+        elif time_of_day == "sunset":
+            gradient = QLinearGradient(0, 0, 0, height)
             gradient.setColorAt(0, QColor(255, 100, 0))
             gradient.setColorAt(0.5, QColor(255, 150, 50))
             gradient.setColorAt(1, QColor(100, 50, 0))
-            painter.fillRect(0, 0, self.width(), self.height(), gradient)
+            painter.fillRect(0, 0, width, height, gradient)
         else:
-            gradient = QLinearGradient(0, 0, 0, self.height())
+            gradient = QLinearGradient(0, 0, 0, height)
             gradient.setColorAt(0, QColor(135, 206, 235))
             gradient.setColorAt(1, QColor(200, 230, 255))
-            painter.fillRect(0, 0, self.width(), self.height(), gradient)
+            painter.fillRect(0, 0, width, height, gradient)
         
         # Draw ground with gradient
-        ground_y = self.height() - 200
-        ground_gradient = QLinearGradient(0, ground_y, 0, self.height())
+        ground_y = height - 200
+        ground_gradient = QLinearGradient(0, ground_y, 0, height)
         ground_gradient.setColorAt(0, QColor(34, 139, 34))
         ground_gradient.setColorAt(1, QColor(28, 120, 28))
-        painter.fillRect(0, ground_y, self.width(), 200, ground_gradient)
+        painter.fillRect(0, ground_y, width, 200, ground_gradient)
         
         # Draw road with perspective effect
-        road_y = self.height() - 180
+        road_y = height - 180
         road_height = 100
         road_gradient = QLinearGradient(0, road_y, 0, road_y + road_height)
         road_gradient.setColorAt(0, QColor(60, 60, 60))
         road_gradient.setColorAt(1, QColor(40, 40, 40))
-        painter.fillRect(0, road_y, self.width(), road_height, road_gradient)
+        painter.fillRect(0, road_y, width, road_height, road_gradient)
         
+    def paint_lane_markings(self, painter, width, height, time_of_day):
         # Draw lane markings with glow effect
         painter.setPen(QPen(Qt.GlobalColor.white, 3))
-        center_y = road_y + road_height/2
+        center_y = height / 2
         x = 0
-        while x < self.width():
+        while x < width:
             # Draw glow
             glow = QRadialGradient(x + 15, int(center_y), 10)
             glow.setColorAt(0, QColor(255, 255, 255, 100))
@@ -317,46 +325,71 @@ class SimulationView(QWidget):
             
             # Draw line
             painter.drawLine(int(x), int(center_y), int(x + 30), int(center_y))
-            x += 50
+            x += MARKING_PERIOD
             
-        # Draw boost particles
-        if self.boost_mode:
-            for p in self.boost_particles:
-                color = QColor(255, 165, 0, int(p['life'] * 255))
+    def draw_boost_particles(self, painter):
+        if not self.boost_mode:
+            return
+        particles = self.frame.boost_particles
+        live = particles.live()
+        left = self.frame.camera.interpolated_x(self.alpha)
+        if self.batched:
+            # Quantize the fade into a few opacities; each (opacity, size) group is
+            # one drawPoints call with a round pen as wide as the particle
+            buckets = alpha_buckets(particles.life[live])
+            sizes = particles.size[live].astype(np.int64)
+            stride = int(sizes.max()) + 1 if sizes.size else 1
+            groups = buckets * stride + sizes
+            painter.save()
+            for group in np.unique(groups).tolist():
+                bucket, size = divmod(group, stride)
+                members = live[groups == group]
+                painter.setPen(QPen(self.boost_colors[bucket], size, Qt.PenStyle.SolidLine, Qt.PenCapStyle.RoundCap))
+                painter.drawPoints(self.point_batch.fill(particles.x[members] - left + size / 2,
+                                                         particles.y[members] + size / 2))
+            painter.restore()
+        else:
+            for x, y, size, life in zip((particles.x[live] - left).tolist(), particles.y[live].tolist(),
+                                        particles.size[live].tolist(), particles.life[live].tolist()):
+                color = QColor(255, 165, 0, int(life * 255))
                 painter.setBrush(color)
                 painter.setPen(Qt.PenStyle.NoPen)
-                painter.drawEllipse(int(p['x']), int(p['y']), int(p['size']), int(p['size']))
+                painter.drawEllipse(int(x), int(y), int(size), int(size))
                 
+    def draw_ego_car(self, painter):
+        sim = self.frame
+        car_x = sim.interpolated_car_x(self.alpha) - sim.camera.interpolated_x(self.alpha)
+        car_color = self.boost_color if sim.boost_mode else self.car_color
+        
         # Draw main car with tilt effect
-        car_y = int(road_y + 35)
-        self.car_y = car_y  # Store for particle effects
+        car_y = sim.car_y
         
         # Save current transform
         painter.save()
         
         # Translate to car center and rotate
-        painter.translate(int(self.car_x + self.car_width/2), int(car_y + self.car_height/2))
-        painter.rotate(self.car_angle)
+        painter.translate(int(car_x + sim.car_width/2), int(car_y + sim.car_height/2))
+        painter.rotate(sim.car_angle)
         
         # Draw car body with metallic effect
-        gradient = QLinearGradient(-self.car_width/2, -self.car_height/2, 
-                                 self.car_width/2, self.car_height/2)
-        gradient.setColorAt(0, self.car_color.lighter(120))
-        gradient.setColorAt(0.5, self.car_color)
-        gradient.setColorAt(1, self.car_color.darker(120))
-        
-        painter.fillRect(int(-self.car_width/2), int(-self.car_height/2), 
-                        self.car_width, self.car_height, gradient)
+        gradient = QLinearGradient(-sim.car_width/2, -sim.car_height/2, 
+                                 sim.car_width/2, sim.car_height/2)
+        gradient.setColorAt(0, car_color.lighter(120))
+        gradient.setColorAt(0.5, car_color)
+        gradient.setColorAt(1, car_color.darker(120))
+        
+        painter.fillRect(int(-sim.car_width/2), int(-sim.car_height/2), 
+                        sim.car_width, sim.car_height, gradient)
                         
         # Draw car roof
-        painter.fillRect(int(-self.car_width/2 + 10), int(-self.car_height/2 - 20), 
-                        30, 20, self.car_color.darker(150))
+        painter.fillRect(int(-sim.car_width/2 + 10), int(-sim.car_height/2 - 20), 
+                        30, 20, car_color.darker(150))
                         
         # Draw windows with reflection
-        window_gradient = QLinearGradient(0, -self.car_height/2 - 15, 0, -self.car_height/2 - 5)
+        window_gradient = QLinearGradient(0, -sim.car_height/2 - 15, 0, -sim.car_height/2 - 5)
         window_gradient.setColorAt(0, QColor(200, 200, 255))
         window_gradient.setColorAt(1, QColor(150, 150, 200))
-        painter.fillRect(int(-self.car_width/2 + 12), int(-self.car_height/2 - 18), 
+        painter.fillRect(int(-sim.car_width/2 + 12), int(-sim.car_height/2 - 18), 
                         26, 16, window_gradient)
                         
         # Restore transform
@@ -364,49 +397,123 @@ class SimulationView(QWidget):
         
         # Draw headlights with glow
         if self.weather.time_of_day == "night":
-            headlight_glow = QRadialGradient(int(self.car_x + self.car_width - 5), int(car_y + 15), 30)
+            headlight_glow = QRadialGradient(int(car_x + sim.car_width - 5), int(car_y + 15), 30)
             headlight_glow.setColorAt(0, QColor(255, 255, 200, 150))
             headlight_glow.setColorAt(1, QColor(255, 255, 100, 0))
-            painter.fillRect(int(self.car_x + self.car_width - 35), car_y, 70, 30, headlight_glow)
-        
-        # Draw traffic lights
-        for light in self.traffic.traffic_lights:
-            color = QColor("green") if light['state'] == 'green' else QColor("red")
-            painter.setBrush(color)
-            painter.drawEllipse(int(light['x']), int(road_y - 20), 10, 10)
-        
-        # Draw traffic cars
-        for car in self.traffic.cars:
-            car_y = int(road_y + 15) if car['lane'] == 0 else int(road_y + 55)
-            painter.fillRect(int(car['x']), car_y, car['width'], 20, QColor(255, 0, 0))
-        
-        # Draw pedestrians
-        sidewalk_y = road_y + road_height + 10
-        for ped in self.traffic.pedestrians:
-            painter.setBrush(QColor(0, 255, 0))
-            painter.drawEllipse(int(ped['x']), int(sidewalk_y), 5, 5)
-        
-        # Draw weather effects
-        if self.weather.is_raining:
+            painter.fillRect(int(car_x + sim.car_width - 35), car_y, 70, 30, headlight_glow)
+            
+    def project(self, x, width):
+        # Screen x of traffic at engine coordinates, and which of it is in view
+        return self.frame.camera.project(x, width, self.frame.origin, self.alpha)
+        
+    def draw_traffic_lights(self, painter):
+        road_y = self.height() - 180
+        signals = self.traffic.signals
+        x, visible = self.project(signals.x, 10)
+        x, green = x[visible], signals.green[visible]
+        if self.batched:
+            # One round point per light, grouped by signal colour
+            painter.save()
+            for mask, color in ((green, QColor("green")), (~green, QColor("red"))):
+                if mask.any():
+                    painter.setPen(QPen(color, 10, Qt.PenStyle.SolidLine, Qt.PenCapStyle.RoundCap))
+                    painter.drawPoints(self.point_batch.fill(x[mask] + 5, road_y - 15))
+            painter.restore()
+        else:
+            for light_x, light_green in zip(x.tolist(), green.tolist()):
+                color = QColor("green") if light_green else QColor("red")
+                painter.setBrush(color)
+                painter.drawEllipse(int(light_x), int(road_y - 20), 10, 10)
+                
+    def draw_traffic_cars(self, painter):
+        road_y = self.height() - 180
+        x, lane, width = self.traffic.car_arrays()
+        x, visible = self.project(x, width)
+        x, lane, width = x[visible], lane[visible], width[visible]
+        if self.batched:
+            y = np.where(lane == 0, road_y + 15, road_y + 55)
+            painter.save()
+            painter.setPen(Qt.PenStyle.NoPen)
+            painter.setBrush(QColor(255, 0, 0))
+            painter.drawRects(self.rect_batch.fill(x, y, width, 20))
+            painter.restore()
+        else:
+            for car_x, car_lane, car_width in zip(x.tolist(), lane.tolist(), width.tolist()):
+                car_y = int(road_y + 15) if car_lane == 0 else int(road_y + 55)
+                painter.fillRect(int(car_x), car_y, int(car_width), 20, QColor(255, 0, 0))
+                
+    def draw_pedestrians(self, painter):
+        sidewalk_y = self.height() - 180 + 100 + 10
+        x, visible = self.project(self.traffic.pedestrian_arrays(), 5)
+        x = x[visible]
+        if self.batched:
+            painter.save()
+            painter.setPen(QPen(QColor(0, 255, 0), 5, Qt.PenStyle.SolidLine, Qt.PenCapStyle.RoundCap))
+            painter.drawPoints(self.point_batch.fill(x + 2.5, sidewalk_y + 2.5))
+            painter.restore()
+        else:
+            for ped_x in x.tolist():
+                painter.setBrush(QColor(0, 255, 0))
+                painter.drawEllipse(int(ped_x), int(sidewalk_y), 5, 5)
+                
+    def draw_weather(self, painter):
+        if not (self.weather.is_raining or self.weather.is_snowing):
+            return
+        particles = self.weather.particles
+        live = particles.live()
+        if self.batched:
+            x, y = particles.x[live], particles.y[live]
+            painter.save()
+            if self.weather.is_raining:
+                painter.setPen(QPen(Qt.GlobalColor.white, 1))
+                painter.drawLines(self.line_batch.fill(x, y, x, y + 10))
+            else:
+                painter.setPen(Qt.PenStyle.NoPen)
+                painter.setBrush(QColor(255, 255, 255))
+                painter.drawRects(self.rect_batch.fill(x, y, 2, 2))
+            painter.restore()
+        elif self.weather.is_raining:
             painter.setPen(QPen(Qt.GlobalColor.white, 1))
-            for drop in self.weather.raindrops:
-                painter.drawLine(int(drop[0]), int(drop[1]), 
-                               int(drop[0]), int(drop[1] + 10))
-        elif self.weather.is_snowing:
+            for x, y, _ in self.weather.raindrops.tolist():
+                painter.drawLine(int(x), int(y), 
+                               int(x), int(y + 10))
+        else:
             painter.setBrush(QColor(255, 255, 255))
-            for drop in self.weather.raindrops:
-                painter.drawEllipse(int(drop[0]), int(drop[1]), 2, 2)
+            for x, y, _ in self.weather.raindrops.tolist():
+                painter.drawEllipse(int(x), int(y), 2, 2)
                 
+    def draw_fog(self, painter):
         if self.weather.is_foggy:
             fog = QColor(200, 200, 200, 100)
             painter.fillRect(0, 0, self.width(), self.height(), fog)
+            
+    def draw_profiler_overlay(self, painter):
+        draw_text_panel(painter, self.profiler.overlay_lines(), self.overlay_font)
+
+def create_view(renderer='qpainter', simulation=None):
+    # The OpenGL view needs PyOpenGL and a 3.3 context; otherwise fall back to QPainter
+    if renderer == 'opengl':
+        try:
+            from simulation.gl_view import GLSimulationView, opengl_available
+        except ImportError as error:
+            print(f"OpenGL view unavailable ({error}), using QPainter", file=sys.stderr)
+        else:
+            if opengl_available():
+                return GLSimulationView(simulation)
+            print("No OpenGL 3.3 context available, using QPainter", file=sys.stderr)
+    return SimulationView(simulation)
 
 class FullSimulation(QMainWindow):
-    def __init__(self):
+    def __init__(self, max_steps_per_frame=MAX_STEPS_PER_FRAME, stats_refresh_rate=STATS_REFRESH_RATE,
+                 simulation=None, recorder=None, threaded=False, renderer='qpainter'):
         super().__init__()
         self.setWindowTitle("Full Autonomous Vehicle Simulation")
         self.setGeometry(100, 100, 1200, 800)
         
+        # Labels only change when the shown text or style does, at most
+        # stats_refresh_rate times per second
+        self.presenter = StatsPresenter(stats_refresh_rate)
+        
         # Enable keyboard focus
         self.setFocusPolicy(Qt.FocusPolicy.StrongFocus)
         
@@ -420,86 +527,103 @@ class FullSimulation(QMainWindow):
         main_layout.addWidget(control_panel)
         
         # Create simulation view
-        self.sim_view = SimulationView()
+        self.sim_view = create_view(renderer, simulation)
         main_layout.addWidget(self.sim_view, stretch=2)
         
-        # Initialize simulation state
-        self.speed = 0
-        self.battery = 100
-        self.distance = 0
-        self.safety_score = 100
-        self.cars_passed = 0
-        self.time_elapsed = 0
-        self.is_running = False
+        # Simulation state lives in the headless model shared with the view
+        self.sim = self.sim_view.sim
+        self.replay = isinstance(self.sim, ReplaySimulation)
+        self.recorder = recorder  # Streams every physics step to disk when set
+        
+        # Threaded mode steps the simulation on a worker; the GUI only sends
+        # it commands and draws the frames it publishes
+        self.worker = None
+        if threaded:
+            self.worker = SimulationWorker(self.sim, self.physics_step, max_steps_per_frame=max_steps_per_frame)
+            self.sim_view.frames = self.worker.frames
+            self.sim_view.worker = self.worker
+            # Each thread times itself; the worker's stage times arrive with its frames
+            self.sim_view.profiler = FrameProfiler()
+        
+        # Physics runs in fixed steps from real elapsed time; keys and stats
+        # are sampled on the simulated clock inside the same loop
+        self.scheduler = FixedStepScheduler(self.physics_step, max_steps_per_frame=max_steps_per_frame)
+        self.frame_clock = QElapsedTimer()
+        self.frame_clock.start()
+        self.key_clock = 0.0
+        self.shown_time = None
+        self.keys_pressed = set()
         
-        # Set up timer for continuous updates
+        # Single timer for the whole loop
         self.timer = QTimer()
+        self.timer.setTimerType(Qt.TimerType.PreciseTimer)
         self.timer.timeout.connect(self.update_simulation)
-        self.timer.start(16)  # 60 FPS
-        
-        # Timer for stats update
-        self.stats_timer = QTimer()
-        self.stats_timer.timeout.connect(self.update_stats)
-        self.stats_timer.start(1000)  # Update every second
-        
-        # Keyboard event timer
-        self.key_timer = QTimer()
-        self.key_timer.timeout.connect(self.handle_continuous_keys)
-        self.key_timer.start(50)  # Check keys every 50ms
-        self.keys_pressed = set()
+        self.timer.start(16)  # Render at ~60 FPS
+        if self.worker is not None:
+            self.worker.start()
+        
+    @property
+    def state(self):
+        # Latest published frame in threaded mode, otherwise the simulation itself
+        return self.worker.frames.latest() if self.worker is not None else self.sim
+        
+    def command(self, fn, *args):
+        # Run a change to the simulation on whichever thread steps it
+        if self.worker is not None:
+            self.worker.submit(fn, *args)
+        else:
+            fn(*args)
         
     def keyPressEvent(self, event):
-        if not self.is_running:
+        # Profiler overlay and trace export work whether or not the car is running
+        if event.key() == Qt.Key.Key_F3:
+            self.sim_view.toggle_profiler()
+            if self.worker is not None:
+                self.command(self.sim.profiler.set_enabled, self.sim_view.show_profiler)
+            return
+        if event.key() == Qt.Key.Key_F4:
+            self.sim_view.profiler.export(PROFILE_PATH)
+            return
+            
+        # A replay seeks instead of driving
+        if self.replay:
+            self.command(self.handle_replay_key, event.key())
             return
             
-        self.keys_pressed.add(event.key())
+        if not self.state.is_running:
+            return
+            
+        # Held keys are sampled by the physics step, on its own thread
+        self.command(self.keys_pressed.add, event.key())
         
         # Add boost mode with B key
         if event.key() == Qt.Key.Key_B:
-            self.sim_view.toggle_boost()
-            if self.sim_view.boost_mode:
-                self.speed_label.setStyleSheet("""
-                    QLabel {
-                        font-size: 24px;
-                        color: orange;
-                        font-weight: bold;
-                        padding: 5px;
-                        background-color: #f0f0f0;
-                        border-radius: 5px;
-                    }
-                """)
-            else:
-                self.speed_label.setStyleSheet("""
-                    QLabel {
-                        font-size: 24px;
-                        color: blue;
-                        font-weight: bold;
-                        padding: 5px;
-                        background-color: #f0f0f0;
-                        border-radius: 5px;
-                    }
-                """)
+            self.command(self.sim.toggle_boost)
+            
+    def handle_replay_key(self, key):
+        seek_ticks = int(SEEK_SECONDS / FIXED_DT)
+        if key == Qt.Key.Key_Left:
+            self.sim.seek(self.sim.position - seek_ticks)
+        elif key == Qt.Key.Key_Right:
+            self.sim.seek(self.sim.position + seek_ticks)
+        elif key == Qt.Key.Key_Home:
+            self.sim.seek(0)
+        elif key == Qt.Key.Key_End:
+            self.sim.seek(len(self.sim.recording) - 1)
             
     def keyReleaseEvent(self, event):
-        if event.key() in self.keys_pressed:
-            self.keys_pressed.remove(event.key())
+        self.command(self.keys_pressed.discard, event.key())
             
     def handle_continuous_keys(self):
-        if not self.is_running:
+        if not self.sim.is_running:
             return
             
         if Qt.Key.Key_Up in self.keys_pressed:
-            speed_increase = 4 if self.sim_view.boost_mode else 2
-            self.speed = min(150 if self.sim_view.boost_mode else 100, self.speed + speed_increase)
-            self.sim_view.set_speed(self.speed)
+            self.sim.accelerate()
         elif Qt.Key.Key_Down in self.keys_pressed:
-            self.speed = max(0, self.speed - 2)
-            self.sim_view.set_speed(self.speed)
+            self.sim.brake()
         elif Qt.Key.Key_Space in self.keys_pressed:
-            self.speed = 0
-            self.sim_view.set_speed(0)
-            
-        self.speed_label.setText(f"Speed: {self.speed} km/h")
+            self.sim.emergency_stop()
         
     def create_control_panel(self):
         panel = QWidget()
@@ -511,16 +635,7 @@ class FullSimulation(QMainWindow):
         
         # Speed display with big numbers
         self.speed_label = QLabel("Speed: 0 km/h")
-        self.speed_label.setStyleSheet("""
-            QLabel {
-                font-size: 24px;
-                color: blue;
-                font-weight: bold;
-                padding: 5px;
-                background-color: #f0f0f0;
-                border-radius: 5px;
-            }
-        """)
+        self.speed_label.setStyleSheet(SPEED_LABEL_STYLE)
         stats_layout.addWidget(self.speed_label)
         
         # Battery with percentage
@@ -543,6 +658,11 @@ class FullSimulation(QMainWindow):
         battery_layout.addWidget(self.battery_bar)
         stats_layout.addLayout(battery_layout)
         
+        # Range left at the current speed and conditions
+        self.range_label = QLabel("Range: -- km")
+        self.range_label.setStyleSheet("font-size: 14px;")
+        stats_layout.addWidget(self.range_label)
+        
         # Distance with decimal places
         self.distance_label = QLabel("Distance: 0.0 km")
         self.distance_label.setStyleSheet("font-size: 18px; font-weight: bold;")
@@ -550,7 +670,7 @@ class FullSimulation(QMainWindow):
         
         # Safety score
         self.safety_label = QLabel("Safety Score: 100%")
-        self.safety_label.setStyleSheet("font-size: 18px; color: green; font-weight: bold;")
+        self.safety_label.setStyleSheet(SAFETY_LABEL_STYLE)
         stats_layout.addWidget(self.safety_label)
         
         # Cars passed counter
@@ -612,16 +732,7 @@ class FullSimulation(QMainWindow):
         
         self.start_button = QPushButton("START")
         self.start_button.clicked.connect(self.toggle_simulation)
-        self.start_button.setStyleSheet("""
-            QPushButton {
-                background-color: #4CAF50;
-                color: white;
-                font-size: 20px;
-                padding: 15px;
-                border-radius: 10px;
-                font-weight: bold;
-            }
-        """)
+        self.start_button.setStyleSheet(START_BUTTON_STYLE)
         controls_layout.addWidget(self.start_button)
         
         # Instructions
@@ -630,7 +741,9 @@ class FullSimulation(QMainWindow):
             "↑ - Accelerate\n"
             "↓ - Brake\n"
             "Space - Emergency Stop\n"
-            "B - Toggle Boost Mode"
+            "B - Toggle Boost Mode\n"
+            "F3 - Frame Profiler\n"
+            "F4 - Export Profile"
         )
         instructions.setStyleSheet("font-family: monospace; font-size: 14px;")
         controls_layout.addWidget(instructions)
@@ -642,95 +755,149 @@ class FullSimulation(QMainWindow):
         return panel
         
     def add_traffic_car(self):
-        self.sim_view.traffic.add_traffic_cars(1)
-        count = len(self.sim_view.traffic.cars)
-        self.traffic_count_label.setText(f"Traffic Cars: {count}")
+        self.command(self.sim.traffic.add_traffic_cars, 1)
         
     def add_pedestrian(self):
-        self.sim_view.traffic.add_pedestrians(1)
-        count = len(self.sim_view.traffic.pedestrians)
-        self.pedestrian_count_label.setText(f"Pedestrians: {count}")
+        self.command(self.sim.traffic.add_pedestrians, 1)
+        
+    def update_counts(self, state):
+        self.presenter.set_text(self.traffic_count_label, f"Traffic Cars: {state.traffic.car_arrays()[0].size}")
+        self.presenter.set_text(self.pedestrian_count_label,
+                                f"Pedestrians: {state.traffic.pedestrian_arrays().size}")
         
     def update_stats(self):
-        if self.is_running:
-            self.time_elapsed += 1
-            minutes = self.time_elapsed // 60
-            seconds = self.time_elapsed % 60
-            self.time_label.setText(f"Time: {minutes:02d}:{seconds:02d}")
+        state = self.state
+        if state.is_running:
+            # Time and safety score are advanced by the simulation itself
+            minutes = state.time_elapsed // 60
+            seconds = state.time_elapsed % 60
+            self.presenter.set_text(self.time_label, f"Time: {minutes:02d}:{seconds:02d}")
+            self.presenter.set_text(self.cars_passed_label, f"Cars Passed: {state.cars_passed}")
             
-            # Update safety score based on speed and proximity to other cars
-            if self.speed > 80:
-                self.safety_score = max(0, self.safety_score - 1)
-            elif self.speed < 60:
-                self.safety_score = min(100, self.safety_score + 0.5)
-                
-            self.safety_label.setText(f"Safety Score: {int(self.safety_score)}%")
-            if self.safety_score < 50:
-                self.safety_label.setStyleSheet("font-size: 18px; color: red; font-weight: bold;")
-            elif self.safety_score < 80:
-                self.safety_label.setStyleSheet("font-size: 18px; color: orange; font-weight: bold;")
+            self.presenter.set_text(self.safety_label, f"Safety Score: {int(state.safety_score)}%")
+            if state.safety_score < 50:
+                self.presenter.set_state(self.safety_label, "danger")
+            elif state.safety_score < 80:
+                self.presenter.set_state(self.safety_label, "warning")
             else:
-                self.safety_label.setStyleSheet("font-size: 18px; color: green; font-weight: bold;")
+                self.presenter.set_state(self.safety_label, "good")
                 
     def change_weather(self, weather):
-        self.sim_view.weather.is_raining = weather == "Rain"
-        self.sim_view.weather.is_snowing = weather == "Snow"
-        self.sim_view.weather.is_foggy = weather == "Fog"
+        self.command(self.sim.change_weather, weather)
         
     def change_time(self, time):
-        self.sim_view.weather.time_of_day = time.lower()
+        # The background cache is keyed by time of day, so there is nothing to invalidate
+        self.command(self.sim.change_time, time)
         
     def toggle_simulation(self):
-        self.is_running = not self.is_running
-        if self.is_running:
-            self.start_button.setText("STOP")
-            self.start_button.setStyleSheet("""
-                QPushButton {
-                    background-color: #f44336;
-                    color: white;
-                    font-size: 20px;
-                    padding: 15px;
-                    border-radius: 10px;
-                    font-weight: bold;
-                }
-            """)
-            self.setFocus()
+        # Flip the state where the simulation steps, not from a possibly stale
+        # frame; the button follows the state the frames report
+        self.command(self.toggle_running)
+        self.setFocus()
+        
+    def toggle_running(self):
+        self.sim.is_running = not self.sim.is_running
+        if not self.sim.is_running:
+            self.sim.set_speed(0)
+            
+    def update_start_button(self, state):
+        if state.is_running:
+            self.presenter.set_text(self.start_button, "STOP")
+            self.presenter.set_state(self.start_button, "running")
         else:
-            self.speed = 0
-            self.sim_view.set_speed(0)
-            self.start_button.setText("START")
-            self.start_button.setStyleSheet("""
-                QPushButton {
-                    background-color: #4CAF50;
-                    color: white;
-                    font-size: 20px;
-                    padding: 15px;
-                    border-radius: 10px;
-                    font-weight: bold;
-                }
-            """)
+            self.presenter.set_text(self.start_button, "START")
+            self.presenter.set_state(self.start_button, "stopped")
             
-    def update_simulation(self):
-        # Update battery based on speed
-        self.battery = max(0, self.battery - self.speed * 0.001)
-        self.battery_bar.setValue(int(self.battery))
-        
-        # Update distance
-        self.distance += self.speed * 0.001
-        self.distance_label.setText(f"Distance: {self.distance:.1f} km")
+    def physics_step(self, dt):
+        # Sample held keys at a fixed simulated interval
+        self.key_clock += dt
+        while self.key_clock >= KEY_INTERVAL:
+            self.key_clock -= KEY_INTERVAL
+            self.handle_continuous_keys()
+            
+        self.sim.step(dt)
+        if self.recorder is not None:
+            self.recorder.record(self.sim)
         
-        # Update simulation view
-        self.sim_view.update_simulation()
+    def update_simulation(self):
+        # Each timer tick starts a profiler frame; the previous frame's
+        # paint happened in between and is counted with it
+        profiler = self.sim_view.profiler
+        profiler.end_frame()
+        
+        # Catch physics up with real time, then draw once; a worker thread
+        # steps on its own, so only the age of its latest frame matters
+        elapsed = self.frame_clock.restart() / 1000.0
+        if self.worker is not None:
+            frame = self.state
+            profiler.merge(frame.stage_totals)
+            age = (time.perf_counter() - frame.published_at) / self.worker.scheduler.dt
+            self.sim_view.alpha = min(1.0, frame.alpha + age)
+        else:
+            with profiler.scope('physics'):
+                self.scheduler.advance(elapsed)
+            self.sim_view.alpha = self.scheduler.alpha
+        self.sim_view.update()
+        
+        # Live readouts refresh at the presenter's rate, not every frame
+        if self.presenter.due():
+            with profiler.scope('labels'):
+                state = self.state
+                self.presenter.set_text(self.speed_label, f"Speed: {state.speed:.0f} km/h")
+                self.presenter.set_state(self.speed_label, "boost" if state.boost_mode else "normal")
+                self.presenter.set_value(self.battery_bar, int(state.battery))
+                self.presenter.set_text(self.range_label, f"Range: {state.range_km:.0f} km")
+                self.presenter.set_text(self.distance_label, f"Distance: {state.distance:.1f} km")
+                self.update_counts(state)
+                self.update_start_button(state)
+                
+                # Stats change once per simulated second
+                if state.time_elapsed != self.shown_time:
+                    self.shown_time = state.time_elapsed
+                    self.update_stats()
+
+    def closeEvent(self, event):
+        # Stop stepping first, then flush the last chunk and write the recording's meta
+        if self.worker is not None:
+            self.timer.stop()
+            self.worker.stop()
+            self.worker = None
+        if self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None
+        super().closeEvent(event)
 
 def main():
-    app = QApplication(sys.argv)
+    parser = argparse.ArgumentParser(description="Autonomous vehicle simulation")
+    parser.add_argument('--record', default=None, help="stream every physics step to this recording directory")
+    parser.add_argument('--replay', default=None, help="play back a recording directory instead of simulating")
+    parser.add_argument('--threaded', action='store_true', help="step the simulation on a worker thread")
+    parser.add_argument('--renderer', choices=['qpainter', 'opengl'], default='qpainter',
+                        help="drawing backend; opengl falls back to qpainter when unavailable")
+    parser.add_argument('--world', action='store_true', help="drive an endless streamed road instead of a loop")
+    parser.add_argument('--autopilot', choices=sorted(POLICIES), default=None,
+                        help="let a built-in policy drive the car instead of the arrow keys")
+    args, qt_args = parser.parse_known_args()
+    
+    app = QApplication(sys.argv[:1] + qt_args)
     app.setStyle('Fusion')  # Use Fusion style for modern look
     app.setStyleSheet(APP_STYLE)
     
     # Set application icon
     app.setWindowIcon(create_app_icon())
     
-    window = FullSimulation()
+    simulation = None
+    if args.replay:
+        simulation = ReplaySimulation(Recording(args.replay))
+    elif args.world or args.autopilot:
+        simulation = Simulation()
+        if args.world:
+            simulation.enable_world()
+        if args.autopilot:
+            simulation.controller = Controller(POLICIES[args.autopilot]())
+    recorder = TrajectoryRecorder(args.record) if args.record else None
+    window = FullSimulation(simulation=simulation, recorder=recorder, threaded=args.threaded,
+                            renderer=args.renderer)
     window.show()
     sys.exit(app.exec())
 
@@ -0,0 +1,383 @@
+import ctypes
+import time
+import numpy as np
+from OpenGL import GL
+from PyQt6.QtGui import QFont, QOpenGLContext, QPainter, QSurfaceFormat
+from PyQt6.QtOpenGLWidgets import QOpenGLWidget
+from simulation.core import Simulation
+from simulation.render import MARKING_PERIOD, StarField, draw_text_panel
+
+# Instance shapes, picked per instance in the fragment shader
+RECT, ELLIPSE, GLOW = 0, 1, 2
+
+# One instance: rect (x, y, w, h), top colour, bottom colour, rotation (degrees), shape
+INSTANCE_FLOATS = 14
+GL_VERSION = (3, 3)  # Instanced drawing and GLSL 330; llvmpipe provides it
+
+VERTEX_SHADER = """
+#version 330 core
+layout(location = 0) in vec2 corner;
+layout(location = 1) in vec4 rect;
+layout(location = 2) in vec4 color;
+layout(location = 3) in vec4 color2;
+layout(location = 4) in vec2 params;
+uniform vec2 viewport;
+out vec4 v_color;
+out vec2 v_local;
+flat out int v_shape;
+
+void main() {
+    // Rotate the quad about its centre, then map widget pixels to clip space
+    float angle = radians(params.x);
+    vec2 p = (corner - 0.5) * rect.zw;
+    p = vec2(p.x * cos(angle) - p.y * sin(angle), p.x * sin(angle) + p.y * cos(angle));
+    vec2 pos = rect.xy + 0.5 * rect.zw + p;
+    gl_Position = vec4(pos.x / viewport.x * 2.0 - 1.0, 1.0 - pos.y / viewport.y * 2.0, 0.0, 1.0);
+    v_color = mix(color, color2, corner.y);
+    v_local = corner * 2.0 - 1.0;
+    v_shape = int(params.y);
+}
+"""
+
+FRAGMENT_SHADER = """
+#version 330 core
+in vec4 v_color;
+in vec2 v_local;
+flat in int v_shape;
+out vec4 frag;
+
+void main() {
+    float r = length(v_local);
+    vec4 color = v_color;
+    if (v_shape == 1) {
+        if (r > 1.0) discard;
+    } else if (v_shape == 2) {
+        color.a *= clamp(1.0 - r, 0.0, 1.0);
+    }
+    frag = color;
+}
+"""
+
+
+def rgba(r, g, b, a=255):
+    return (r / 255, g / 255, b / 255, a / 255)
+
+
+SKY = {
+    'day': ((rgba(135, 206, 235), rgba(200, 230, 255)),),
+    'sunset': ((rgba(255, 100, 0), rgba(255, 150, 50)), (rgba(255, 150, 50), rgba(100, 50, 0))),
+    'night': ((rgba(0, 0, 50), rgba(0, 0, 50)),),
+}
+GROUND = (rgba(34, 139, 34), rgba(28, 120, 28))
+ROAD = (rgba(60, 60, 60), rgba(40, 40, 40))
+WHITE = rgba(255, 255, 255)
+LANE_GLOW = rgba(255, 255, 255, 100)
+CAR = rgba(0, 100, 255)
+BOOST_CAR = rgba(255, 165, 0)
+WINDOW = (rgba(200, 200, 255), rgba(150, 150, 200))
+HEADLIGHT = rgba(255, 255, 200, 150)
+TRAFFIC_CAR = rgba(255, 0, 0)
+PEDESTRIAN = rgba(0, 255, 0)
+GREEN_LIGHT = rgba(0, 128, 0)
+RED_LIGHT = rgba(255, 0, 0)
+FOG = rgba(200, 200, 200, 100)
+
+
+def shade(color, factor):
+    # QColor.lighter/darker for (r, g, b, a) tuples: factor 1.2 is lighter(120)
+    return tuple(min(c * factor, 1.0) for c in color[:3]) + (color[3],)
+
+
+class SceneBatch:
+    """Instances for one frame, appended in painting order.
+
+    Each ``add`` takes scalars or arrays and broadcasts them into rows of
+    INSTANCE_FLOATS floats, so a whole layer of cars or particles is one
+    array operation. ``array()`` joins everything into the buffer that
+    is uploaded and drawn with a single instanced call.
+    """
+
+    def __init__(self):
+        self.chunks = []
+
+    def clear(self):
+        self.chunks = []
+
+    def __len__(self):
+        return sum(chunk.shape[0] for chunk in self.chunks)
+
+    def add(self, x, y, w, h, color, color2=None, angle=0.0, shape=RECT):
+        sizes = (np.size(x), np.size(y), np.size(w), np.size(h), np.size(color) // 4)
+        if min(sizes) == 0:
+            return  # Nothing to draw, e.g. everything culled
+        count = max(sizes)
+        chunk = np.empty((count, INSTANCE_FLOATS), dtype=np.float32)
+        chunk[:, 0] = x
+        chunk[:, 1] = y
+        chunk[:, 2] = w
+        chunk[:, 3] = h
+        chunk[:, 4:8] = color
+        chunk[:, 8:12] = color if color2 is None else color2
+        chunk[:, 12] = angle
+        chunk[:, 13] = shape
+        self.chunks.append(chunk)
+
+    def array(self):
+        if not self.chunks:
+            return np.empty((0, INSTANCE_FLOATS), dtype=np.float32)
+        return np.concatenate(self.chunks)
+
+
+def rotate_about(cx, cy, dx, dy, angle):
+    # Centre of a part at offset (dx, dy) from (cx, cy) after rotating by ``angle`` degrees
+    a = np.radians(angle)
+    return cx + dx * np.cos(a) - dy * np.sin(a), cy + dx * np.sin(a) + dy * np.cos(a)
+
+
+def build_scene(scene, state, width, height, alpha=1.0, stars=None):
+    """Fill ``scene`` with one frame, layer for layer as SimulationView paints it.
+
+    ``state`` is a Simulation or a SimulationFrame. Gradients become
+    per-vertex colours, and round shapes and glows are computed per pixel
+    in the fragment shader.
+    """
+    scene.clear()
+    weather = state.weather
+    road_y = height - 180
+    ground_y = height - 200
+
+    # Sky, stars, ground, road and lane markings
+    bands = SKY[weather.time_of_day]
+    band_height = height / len(bands)
+    for i, (top, bottom) in enumerate(bands):
+        scene.add(0, i * band_height, width, band_height, top, bottom)
+    if weather.time_of_day == "night" and stars is not None:
+        stars.generate(width, ground_y)
+        brightness = stars.brightness(state.clock) if stars.twinkle else 1.0
+        color = np.empty((len(stars), 4), dtype=np.float32)
+        color[:, :3] = 1.0
+        color[:, 3] = brightness
+        scene.add(stars.x, stars.y, stars.size, stars.size, color)
+    scene.add(0, ground_y, width, 200, *GROUND)
+    scene.add(0, road_y, width, 100, *ROAD)
+    center_y = road_y + 50
+    camera = state.camera
+    left = camera.interpolated_x(alpha)
+    marks = np.arange(0, width + MARKING_PERIOD, MARKING_PERIOD, dtype=np.float64) - left % MARKING_PERIOD
+    scene.add(marks + 5, center_y - 10, 20, 20, LANE_GLOW, shape=GLOW)
+    scene.add(marks, center_y - 1.5, 30, 3, WHITE)
+
+    # Boost trail
+    if state.boost_mode:
+        particles = state.boost_particles
+        live = particles.live()
+        color = np.empty((live.size, 4), dtype=np.float32)
+        color[:] = BOOST_CAR
+        color[:, 3] = np.clip(particles.life[live], 0, 1)
+        size = np.floor(particles.size[live])
+        scene.add(np.floor(particles.x[live] - left), np.floor(particles.y[live]), size, size, color, shape=ELLIPSE)
+
+    # Ego car: body, roof and window rotate together about the body's centre
+    car_x = state.interpolated_car_x(alpha) - left
+    car_y = state.car_y
+    w, h = state.car_width, state.car_height
+    color = BOOST_CAR if state.boost_mode else CAR
+    cx, cy = car_x + w / 2, car_y + h / 2
+    angle = state.car_angle
+    scene.add(car_x, car_y, w, h, shade(color, 1.2), shade(color, 1 / 1.2), angle)
+    for dx, dy, part_w, part_h, top, bottom in (
+            (-w / 2 + 25, -h / 2 - 10, 30, 20, shade(color, 1 / 1.5), shade(color, 1 / 1.5)),
+            (-w / 2 + 25, -h / 2 - 10, 26, 16) + WINDOW):
+        px, py = rotate_about(cx, cy, dx, dy, angle)
+        scene.add(px - part_w / 2, py - part_h / 2, part_w, part_h, top, bottom, angle)
+    if weather.time_of_day == "night":
+        scene.add(car_x + w - 35, car_y, 70, 30, HEADLIGHT, shape=GLOW)
+
+    # Traffic lights, cars and pedestrians inside the view
+    traffic = state.traffic
+    signals = traffic.signals
+    x, visible = camera.project(signals.x, 10, state.origin, alpha)
+    color = np.where(signals.green[visible, None], np.float32(GREEN_LIGHT), np.float32(RED_LIGHT))
+    scene.add(x[visible], road_y - 20, 10, 10, color, shape=ELLIPSE)
+    x, lane, car_w = traffic.car_arrays()
+    x, visible = camera.project(x, car_w, state.origin, alpha)
+    scene.add(x[visible], np.where(lane[visible] == 0, road_y + 15, road_y + 55), car_w[visible], 20, TRAFFIC_CAR)
+    x, visible = camera.project(traffic.pedestrian_arrays(), 5, state.origin, alpha)
+    scene.add(x[visible], road_y + 110, 5, 5, PEDESTRIAN, shape=ELLIPSE)
+
+    # Rain streaks or snow flakes, then fog over everything
+    if weather.is_raining or weather.is_snowing:
+        particles = weather.particles
+        live = particles.live()
+        if weather.is_raining:
+            scene.add(particles.x[live] - 0.5, particles.y[live], 1, 10, WHITE)
+        else:
+            scene.add(particles.x[live], particles.y[live], 2, 2, WHITE)
+    if weather.is_foggy:
+        scene.add(0, 0, width, height, FOG)
+    return scene
+
+
+def compile_program(vertex_source, fragment_source):
+    program = GL.glCreateProgram()
+    shaders = []
+    for kind, source in ((GL.GL_VERTEX_SHADER, vertex_source), (GL.GL_FRAGMENT_SHADER, fragment_source)):
+        shader = GL.glCreateShader(kind)
+        GL.glShaderSource(shader, source)
+        GL.glCompileShader(shader)
+        if not GL.glGetShaderiv(shader, GL.GL_COMPILE_STATUS):
+            raise RuntimeError(GL.glGetShaderInfoLog(shader).decode())
+        GL.glAttachShader(program, shader)
+        shaders.append(shader)
+    GL.glLinkProgram(program)
+    if not GL.glGetProgramiv(program, GL.GL_LINK_STATUS):
+        raise RuntimeError(GL.glGetProgramInfoLog(program).decode())
+    for shader in shaders:
+        GL.glDeleteShader(shader)
+    return program
+
+
+class GLSceneRenderer:
+    """Draws a SceneBatch with one instanced call into the current GL context.
+
+    A static unit quad is drawn once per instance; the instance buffer is
+    re-specified every frame (orphaning the old storage so the driver
+    never stalls on it). Needs an OpenGL 3.3 core context to be current
+    for ``initialize`` and ``draw``.
+    """
+
+    def __init__(self):
+        self.program = None
+        self.instance_capacity = 0
+
+    def initialize(self):
+        self.program = compile_program(VERTEX_SHADER, FRAGMENT_SHADER)
+        self.viewport_location = GL.glGetUniformLocation(self.program, "viewport")
+        self.vao = GL.glGenVertexArrays(1)
+        GL.glBindVertexArray(self.vao)
+
+        self.quad = GL.glGenBuffers(1)
+        GL.glBindBuffer(GL.GL_ARRAY_BUFFER, self.quad)
+        corners = np.array([0, 0, 1, 0, 0, 1, 1, 1], dtype=np.float32)
+        GL.glBufferData(GL.GL_ARRAY_BUFFER, corners.nbytes, corners, GL.GL_STATIC_DRAW)
+        GL.glEnableVertexAttribArray(0)
+        GL.glVertexAttribPointer(0, 2, GL.GL_FLOAT, GL.GL_FALSE, 0, None)
+
+        self.instances = GL.glGenBuffers(1)
+        GL.glBindBuffer(GL.GL_ARRAY_BUFFER, self.instances)
+        stride = INSTANCE_FLOATS * 4
+        for location, offset, size in ((1, 0, 4), (2, 4, 4), (3, 8, 4), (4, 12, 2)):
+            GL.glEnableVertexAttribArray(location)
+            GL.glVertexAttribPointer(location, size, GL.GL_FLOAT, GL.GL_FALSE, stride, ctypes.c_void_p(offset * 4))
+            GL.glVertexAttribDivisor(location, 1)
+        GL.glBindVertexArray(0)
+
+    def draw(self, instances, width, height):
+        GL.glDisable(GL.GL_DEPTH_TEST)
+        GL.glEnable(GL.GL_BLEND)
+        GL.glBlendFunc(GL.GL_SRC_ALPHA, GL.GL_ONE_MINUS_SRC_ALPHA)
+        GL.glUseProgram(self.program)
+        GL.glUniform2f(self.viewport_location, width, height)
+        GL.glBindVertexArray(self.vao)
+        if len(instances):
+            GL.glBindBuffer(GL.GL_ARRAY_BUFFER, self.instances)
+            GL.glBufferData(GL.GL_ARRAY_BUFFER, instances.nbytes, instances, GL.GL_STREAM_DRAW)
+            GL.glDrawArraysInstanced(GL.GL_TRIANGLE_STRIP, 0, 4, len(instances))
+        GL.glBindVertexArray(0)
+        GL.glUseProgram(0)
+
+
+def surface_format():
+    surface = QSurfaceFormat()
+    surface.setVersion(*GL_VERSION)
+    surface.setProfile(QSurfaceFormat.OpenGLContextProfile.CoreProfile)
+    return surface
+
+
+def opengl_available():
+    # True when a 3.3 core context can be created here (Mesa's llvmpipe counts)
+    context = QOpenGLContext()
+    context.setFormat(surface_format())
+    if not context.create():
+        return False
+    version = context.format().version()
+    return (version[0], version[1]) >= GL_VERSION
+
+
+class GLSimulationView(QOpenGLWidget):
+    """SimulationView drawn with OpenGL instead of QPainter.
+
+    Every frame the scene is rebuilt as one instance array (see
+    build_scene) and drawn with a single instanced call. The profiler
+    overlay is still text drawn with QPainter on top. It exposes the
+    same attributes FullSimulation uses on SimulationView.
+    """
+
+    def __init__(self, simulation=None):
+        super().__init__()
+        self.setFormat(surface_format())
+        self.setMinimumSize(800, 600)
+        self.sim = simulation if simulation is not None else Simulation()
+        self.alpha = 1.0
+        self.frames = None
+        self.frame = self.sim
+        self.profiler = self.sim.profiler  # A separate one when another thread steps the simulation
+        self.worker = None  # Changes to the simulation are submitted to it when set
+        self.batched = True  # Always; kept for parity with SimulationView
+        self.layer_times = {}
+        self.show_profiler = False
+        self.overlay_font = QFont("monospace", 9)
+        self.stars = StarField(seed=int(self.sim.rngs['stars'].integers(2**63)))
+        self.scene = SceneBatch()
+        self.renderer = GLSceneRenderer()
+
+    @property
+    def weather(self):
+        return self.frame.weather
+
+    @property
+    def traffic(self):
+        return self.frame.traffic
+
+    @property
+    def boost_mode(self):
+        return self.frame.boost_mode
+
+    def toggle_profiler(self):
+        self.show_profiler = not self.show_profiler
+        self.profiler.set_enabled(self.show_profiler)
+        self.update()
+
+    def invalidate_background(self):
+        pass  # The background is redrawn every frame
+
+    def set_star_twinkle(self, enabled):
+        self.stars.twinkle = enabled
+
+    def command(self, fn, *args):
+        # Run a change to the simulation on whichever thread steps it
+        if self.worker is not None:
+            self.worker.submit(fn, *args)
+        else:
+            fn(*args)
+
+    def resizeGL(self, width, height):
+        self.command(self.sim.resize, self.width(), self.height())
+
+    def initializeGL(self):
+        self.renderer.initialize()
+
+    def paintGL(self):
+        frame = self.frames.latest() if self.frames is not None else None
+        self.frame = frame if frame is not None else self.sim
+        with self.profiler.scope('paint'):
+            start = time.perf_counter()
+            build_scene(self.scene, self.frame, self.width(), self.height(), self.alpha, self.stars)
+            instances = self.scene.array()
+            built = time.perf_counter()
+            self.renderer.draw(instances, self.width(), self.height())
+            self.layer_times = {'scene': (built - start) * 1000, 'gl': (time.perf_counter() - built) * 1000}
+        if self.show_profiler:
+            painter = QPainter(self)
+            draw_text_panel(painter, self.profiler.overlay_lines(), self.overlay_font)
+            painter.end()
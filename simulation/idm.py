@@ -0,0 +1,157 @@
+import numpy as np
+from simulation.spatial import LANE_KEY_STRIDE
+
+# Per-driver Intelligent Driver Model parameters as (mean, standard
+# deviation), in pixels and reference ticks (a car is 40 px, ~4.5 m)
+DRIVER_PARAMETERS = {
+    'v0': (2.0, 0.2),  # Desired speed (px/tick, ~13 m/s)
+    'T': (60.0, 10.0),  # Desired time headway (ticks, ~1 s)
+    'a': (0.004, 0.0005),  # Maximum acceleration (px/tick^2, ~1.5 m/s^2)
+    'b': (0.006, 0.001),  # Comfortable deceleration (px/tick^2, ~2 m/s^2)
+    's0': (20.0, 2.0),  # Jam distance (px, ~2 m)
+}
+DRIVER_FIELDS = ('v0', 'T', 'a', 'b', 's0')
+DELTA = 4  # Free-road acceleration exponent
+POLITENESS = 0.3  # MOBIL weight of the followers' advantage
+CHANGE_THRESHOLD = 0.0005  # Advantage (px/tick^2) needed to change lanes
+SAFE_DECELERATION = 0.02  # Hardest braking a lane change may impose on the new follower
+
+
+def draw_drivers(rng, count, parameters=DRIVER_PARAMETERS):
+    # One normal draw per field, in a fixed order; clipped to a quarter of the mean
+    drivers = {}
+    for name in DRIVER_FIELDS:
+        mean, sd = parameters[name]
+        drivers[name] = np.maximum(rng.normal(mean, sd, size=count), mean / 4)
+    return drivers
+
+
+def append_drivers(drivers, new):
+    return {name: np.concatenate([drivers[name], new[name]]) for name in DRIVER_FIELDS}
+
+
+def empty_drivers():
+    return {name: np.empty(0, dtype=np.float64) for name in DRIVER_FIELDS}
+
+
+def idm_acceleration(v, v_lead, gap, v0, T, a, b, s0):
+    """IDM acceleration for followers at speed ``v`` behind a leader at
+    ``v_lead`` with bumper gap ``gap`` (inf for a free road)."""
+    s_star = s0 + np.maximum(0, v * T + v * (v - v_lead) / (2 * np.sqrt(a * b)))
+    interaction = s_star / np.maximum(gap, 0.01)
+    return a * (1 - (v / v0) ** DELTA - interaction * interaction)
+
+
+def driver_acceleration(drivers, v, v_lead, gap, which=slice(None)):
+    return idm_acceleration(v, v_lead, gap, *(drivers[name][which] for name in DRIVER_FIELDS))
+
+
+def following_acceleration(speed, index, drivers, stop_distance, front, obstacle_x):
+    """IDM acceleration of every car, as ``(total, static)``.
+
+    ``static`` covers the stationary obstacles: the next red stop line and
+    the main car at ``obstacle_x``, which blocks every lane. ``total``
+    also follows the leader from ``index`` (a LaneIndex).
+    """
+    obstacle_gap = np.where(front <= obstacle_x, obstacle_x - front, np.inf)
+    static = np.minimum(driver_acceleration(drivers, speed, 0.0, stop_distance),
+                        driver_acceleration(drivers, speed, 0.0, obstacle_gap))
+    v_lead = np.where(index.leader >= 0, speed[index.leader], 0.0)
+    return np.minimum(driver_acceleration(drivers, speed, v_lead, index.gap), static), static
+
+
+def mobil_lane_changes(x, speed, width, lane, index, drivers, acc, static,
+                       politeness=POLITENESS, threshold=CHANGE_THRESHOLD, safe=SAFE_DECELERATION):
+    """MOBIL lane choice for every car from one snapshot of the road.
+
+    A car moves to an adjacent lane when its own gain plus ``politeness``
+    times the gain of its old and new followers beats ``threshold``, and
+    the new follower would not have to brake harder than ``safe``. Leaders
+    and followers in the target lane come from one searchsorted over the
+    (lane, x)-sorted cars. Returns the new lane of every car; at most one
+    car moves into any gap per call.
+    """
+    n = x.size
+    if n == 0:
+        return lane
+    road_length = index.road_length
+    perm = index.perm
+    sorted_lane = lane[perm]
+    key = sorted_lane * LANE_KEY_STRIDE + index.sorted_x
+
+    # Old follower: the car whose leader is this car
+    follower = np.full(n, -1, dtype=np.int64)
+    has_leader = index.leader >= 0
+    follower[index.leader[has_leader]] = np.flatnonzero(has_leader)
+    old_follower_gain = np.zeros(n)
+    o = follower >= 0
+    if o.any():
+        fo = follower[o]
+        new_gap = index.gap[fo] + width[o] + index.gap[o]
+        v_lead = np.where(index.leader[o] >= 0, speed[index.leader[o]], 0.0)
+        old_follower_gain[o] = np.minimum(driver_acceleration(drivers, speed[fo], v_lead, new_gap, fo),
+                                          static[fo]) - acc[fo]
+
+    best_gain = np.full(n, threshold)
+    best_lane = lane.copy()
+    best_slot = np.full(n, -1, dtype=np.int64)
+    for offset in (-1, 1):
+        target = lane + offset
+        valid = np.flatnonzero((target >= 0) & (target < index.lanes))
+        if valid.size == 0:
+            continue
+        t = target[valid]
+        start = index.lane_start[t]
+        end = index.lane_end[t]
+        occupied = end > start
+
+        # First car ahead in the target lane (wrapping round the ring) and the one behind
+        pos = np.searchsorted(key, t * LANE_KEY_STRIDE + x[valid], side='right')
+        lead_wraps = pos >= end
+        lead_pos = np.where(lead_wraps, start, pos)
+        follow_wraps = pos <= start
+        follow_pos = np.where(follow_wraps, end - 1, pos - 1)
+        lead_pos = np.where(occupied, lead_pos, 0)
+        follow_pos = np.where(occupied, follow_pos, 0)
+        new_leader = np.where(occupied, perm[lead_pos], -1)
+        new_follower = np.where(occupied, perm[follow_pos], -1)
+
+        # Gaps measured as LaneIndex does: across the wrap the ring is road_length
+        # plus the leading car's width long, as cars re-enter at x = -width
+        xv = x[valid]
+        lead_gap = np.where(occupied, x[new_leader] - xv - width[valid]
+                            + lead_wraps * (road_length + width[new_leader]), np.inf)
+        follow_gap = np.where(occupied, xv - x[new_follower] - width[new_follower]
+                              + follow_wraps * (road_length + width[valid]), np.inf)
+
+        v_lead = np.where(occupied, speed[new_leader], 0.0)
+        own_new = np.minimum(driver_acceleration(drivers, speed[valid], v_lead, lead_gap, valid), static[valid])
+        gain = own_new - acc[valid] + politeness * old_follower_gain[valid]
+
+        # The new follower's point of view, and the safety criterion
+        safe_ok = (lead_gap > 0) & (follow_gap > 0)
+        nf = np.flatnonzero(occupied)
+        if nf.size:
+            f = new_follower[nf]
+            follower_new = np.minimum(driver_acceleration(drivers, speed[f], speed[valid[nf]], follow_gap[nf], f),
+                                      static[f])
+            gain[nf] += politeness * (follower_new - acc[f])
+            safe_ok[nf] &= follower_new >= -safe
+
+        better = safe_ok & (gain > best_gain[valid])
+        chosen = valid[better]
+        best_gain[chosen] = gain[better]
+        best_lane[chosen] = t[better]
+        # Gap identity: target lane and the car that would lead
+        best_slot[chosen] = t[better] * (n + 1) + new_leader[better] + 1
+
+    # One car per target gap, the one with the biggest gain
+    movers = np.flatnonzero(best_slot >= 0)
+    if movers.size:
+        movers = movers[np.argsort(-best_gain[movers], kind='stable')]
+        _, first = np.unique(best_slot[movers], return_index=True)
+        keep = movers[first]
+        new_lane = lane.copy()
+        new_lane[keep] = best_lane[keep]
+        return new_lane
+    return lane
@@ -0,0 +1,454 @@
+import argparse
+import heapq
+import json
+import time
+from collections import OrderedDict
+import numpy as np
+from simulation.idm import DRIVER_PARAMETERS, append_drivers, draw_drivers, driver_acceleration, empty_drivers
+from simulation.rng import spawn_streams
+from simulation.scheduler import FIXED_DT, ticks_for
+
+ROUTE_CACHE_ENTRIES = 2**22  # Next-hop table entries kept across all cached destinations
+DEFAULT_GREEN = 100  # Reference ticks per signal phase
+VEHICLE_LENGTH = 40  # Same as a TrafficSystem car
+MAX_SPEED = 2.0  # Pixels per reference tick, the TrafficSystem cap
+MIN_GAP = 10  # Closest a vehicle follows the one ahead, as in TrafficSystem
+
+
+class RoadNetwork:
+    """Directed road graph: nodes, edges with lanes, and signalized nodes.
+
+    Everything is stored as flat arrays indexed by node or edge id.
+    Lanes get global ids, ``lane_offset[edge] + lane``, so vehicles on
+    the whole network can be sorted by a single key. An edge that ends at a
+    signalized node belongs to one of two approach groups by direction
+    (mostly horizontal or mostly vertical), and the node serves them in
+    alternating phases of ``signal_green`` ticks, shifted by
+    ``signal_offset``.
+    """
+
+    def __init__(self, node_x, node_y, edge_from, edge_to, lanes=1, speed=MAX_SPEED,
+                 length=None, signals=(), green=DEFAULT_GREEN, offset=0, node_ids=None):
+        self.node_x = np.asarray(node_x, dtype=np.float64)
+        self.node_y = np.asarray(node_y, dtype=np.float64)
+        self.node_ids = list(node_ids) if node_ids is not None else list(range(self.node_x.size))
+        self.edge_from = np.asarray(edge_from, dtype=np.int64)
+        self.edge_to = np.asarray(edge_to, dtype=np.int64)
+        edges = self.edge_from.size
+        self.edge_lanes = np.broadcast_to(np.asarray(lanes, dtype=np.int64), (edges,)).copy()
+        self.edge_speed = np.broadcast_to(np.asarray(speed, dtype=np.float64), (edges,)).copy()
+        if length is None:
+            length = np.hypot(self.node_x[self.edge_to] - self.node_x[self.edge_from],
+                              self.node_y[self.edge_to] - self.node_y[self.edge_from])
+        self.edge_length = np.broadcast_to(np.asarray(length, dtype=np.float64), (edges,)).copy()
+        self.lane_offset = np.concatenate([[0], np.cumsum(self.edge_lanes)[:-1]]).astype(np.int64)
+
+        # Signals: one per signalized node
+        self.signal_node = np.asarray(signals, dtype=np.int64)
+        self.signal_green = np.broadcast_to(np.asarray(green, dtype=np.float64), self.signal_node.shape).copy()
+        self.signal_offset = np.broadcast_to(np.asarray(offset, dtype=np.float64), self.signal_node.shape).copy()
+        node_signal = np.full(self.node_x.size, -1, dtype=np.int64)
+        node_signal[self.signal_node] = np.arange(self.signal_node.size)
+        self.edge_signal = node_signal[self.edge_to]
+        dx = self.node_x[self.edge_to] - self.node_x[self.edge_from]
+        dy = self.node_y[self.edge_to] - self.node_y[self.edge_from]
+        self.edge_group = (np.abs(dy) > np.abs(dx)).astype(np.int64)
+
+    @property
+    def nodes(self):
+        return self.node_x.size
+
+    @property
+    def edges(self):
+        return self.edge_from.size
+
+    def green(self, edges, ticks):
+        # Whether each edge may enter its end node at time ``ticks``
+        signal = self.edge_signal[edges]
+        green = np.ones(np.size(edges), dtype=bool)
+        gated = signal >= 0
+        if gated.any():
+            s = signal[gated]
+            phase = ((ticks + self.signal_offset[s]) // self.signal_green[s]).astype(np.int64) % 2
+            green[gated] = phase == self.edge_group[edges][gated]
+        return green
+
+    @classmethod
+    def ring(cls, length=800, lanes=2):
+        # The classic single-strip road: one looping edge
+        return cls([0.0], [0.0], [0], [0], lanes=lanes, length=length)
+
+    @classmethod
+    def grid(cls, rows, cols, spacing=300, lanes=2, speed=MAX_SPEED, green=DEFAULT_GREEN):
+        # Two-way streets between neighbouring nodes; every junction is signalized
+        ids = np.arange(rows * cols).reshape(rows, cols)
+        node_y, node_x = np.divmod(np.arange(rows * cols), cols)
+        pairs = [(ids[:, :-1], ids[:, 1:]), (ids[:-1, :], ids[1:, :])]
+        a = np.concatenate([p[0].ravel() for p in pairs])
+        b = np.concatenate([p[1].ravel() for p in pairs])
+        edge_from = np.concatenate([a, b])
+        edge_to = np.concatenate([b, a])
+        degree = np.bincount(edge_to, minlength=rows * cols)
+        return cls(node_x * spacing, node_y * spacing, edge_from, edge_to, lanes=lanes, speed=speed,
+                   signals=np.flatnonzero(degree > 2), green=green)
+
+    @classmethod
+    def load(cls, path):
+        """Read a network from JSON.
+
+        ``{"nodes": [{"id": "a", "x": 0, "y": 0, "signal": {"green": 120, "offset": 0}}],
+        "edges": [{"from": "a", "to": "b", "lanes": 2, "speed": 2.0, "length": 300}]}``;
+        ``signal`` may also be ``true``, and edge length defaults to the
+        distance between its nodes.
+        """
+        with open(path) as f:
+            spec = json.load(f)
+        nodes = spec['nodes']
+        index = {node['id']: i for i, node in enumerate(nodes)}
+        signals, green, offset = [], [], []
+        for i, node in enumerate(nodes):
+            signal = node.get('signal')
+            if signal:
+                signal = signal if isinstance(signal, dict) else {}
+                signals.append(i)
+                green.append(signal.get('green', DEFAULT_GREEN))
+                offset.append(signal.get('offset', 0))
+        edges = spec['edges']
+        edge_from = [index[edge['from']] for edge in edges]
+        edge_to = [index[edge['to']] for edge in edges]
+        network = cls([node['x'] for node in nodes], [node['y'] for node in nodes], edge_from, edge_to,
+                      lanes=[edge.get('lanes', 1) for edge in edges],
+                      speed=[edge.get('speed', MAX_SPEED) for edge in edges],
+                      signals=signals, green=green, offset=offset, node_ids=[node['id'] for node in nodes])
+        # Lengths given in the file override the straight-line distance
+        for e, edge in enumerate(edges):
+            if 'length' in edge:
+                network.edge_length[e] = edge['length']
+        return network
+
+    def save(self, path):
+        signal_of = {node: s for s, node in enumerate(self.signal_node.tolist())}
+        nodes = []
+        for i, node_id in enumerate(self.node_ids):
+            node = {'id': node_id, 'x': float(self.node_x[i]), 'y': float(self.node_y[i])}
+            if i in signal_of:
+                s = signal_of[i]
+                node['signal'] = {'green': float(self.signal_green[s]), 'offset': float(self.signal_offset[s])}
+            nodes.append(node)
+        edges = [
+            {'from': self.node_ids[a], 'to': self.node_ids[b], 'lanes': lanes, 'speed': speed, 'length': length}
+            for a, b, lanes, speed, length in zip(self.edge_from.tolist(), self.edge_to.tolist(),
+                                                  self.edge_lanes.tolist(), self.edge_speed.tolist(),
+                                                  self.edge_length.tolist())
+        ]
+        with open(path, 'w') as f:
+            json.dump({'nodes': nodes, 'edges': edges}, f, indent=1)
+
+
+class Router:
+    """Fastest routes by free-flow travel time, cached per destination.
+
+    One Dijkstra over the reversed graph gives, for every node, the edge to
+    take towards a destination. Those next-hop tables are kept for as
+    many recently used destinations as fit in ``cache_entries``, so a
+    vehicle only costs a table lookup when it reaches the end of an edge.
+    Call ``invalidate`` after changing edge lengths or speeds.
+    """
+
+    def __init__(self, network, cache_entries=ROUTE_CACHE_ENTRIES):
+        self.network = network
+        self.cache_size = max(1, cache_entries // max(network.nodes, 1))
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.cost = None
+        self.invalidate()
+        self.incoming = [[] for _ in range(network.nodes)]
+        for e, (a, b) in enumerate(zip(network.edge_from.tolist(), network.edge_to.tolist())):
+            self.incoming[b].append((e, a))
+
+    def invalidate(self):
+        # Travel times changed: drop every cached table
+        self.cost = (self.network.edge_length / self.network.edge_speed).tolist()
+        self.cache.clear()
+
+    def table(self, dest):
+        # Next edge from every node towards dest; -1 at dest or when unreachable
+        table = self.cache.get(dest)
+        if table is not None:
+            self.cache.move_to_end(dest)
+            self.hits += 1
+            return table
+        self.misses += 1
+
+        dist = [float('inf')] * self.network.nodes
+        next_edge = [-1] * self.network.nodes
+        dist[dest] = 0.0
+        heap = [(0.0, dest)]
+        while heap:
+            d, node = heapq.heappop(heap)
+            if d > dist[node]:
+                continue
+            for e, prev in self.incoming[node]:
+                nd = d + self.cost[e]
+                if nd < dist[prev]:
+                    dist[prev] = nd
+                    next_edge[prev] = e
+                    heapq.heappush(heap, (nd, prev))
+
+        table = np.asarray(next_edge, dtype=np.int32)
+        self.cache[dest] = table
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return table
+
+    def next_edges(self, nodes, dests):
+        # Vectorized lookup, one table per distinct destination
+        result = np.full(np.size(nodes), -1, dtype=np.int64)
+        for dest in np.unique(dests).tolist():
+            members = dests == dest
+            result[members] = self.table(dest)[nodes[members]]
+        return result
+
+    def route(self, origin, dest):
+        # Edge list from node origin to node dest (empty if unreachable)
+        table = self.table(dest)
+        edges = []
+        node = origin
+        while node != dest and table[node] >= 0:
+            edge = int(table[node])
+            edges.append(edge)
+            node = int(self.network.edge_to[edge])
+        return edges if node == dest else []
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'cached': len(self.cache)}
+
+
+class NetworkTraffic:
+    """Vehicles routed over a RoadNetwork, stored as struct-of-arrays.
+
+    ``pos`` is the front bumper's distance along the vehicle's edge.
+    Each tick all vehicles are sorted by (global lane, pos) once; a
+    vehicle follows the next one in its lane, and the first vehicle in a
+    lane looks at the stop line (when its signal is red) and at the last
+    vehicle in its next edge's lane. Routes are only looked up when a
+    vehicle moves onto a new edge, so the cost of a tick depends on the
+    number of vehicles, not on the size of the network. Vehicles that
+    reach their destination are removed and counted in ``arrived``.
+
+    Vehicles drive by the same Intelligent Driver Model as the strip
+    engines, each with its own drawn parameters in ``drivers``, and never
+    wish to go faster than their edge's speed limit.
+
+    Random destinations are drawn from ``destinations`` (all nodes by
+    default); a few zones keep route planning to a handful of tables.
+    """
+
+    def __init__(self, network, rng=None, router=None, destinations=None, driver_parameters=DRIVER_PARAMETERS):
+        self.network = network
+        self.destinations = (np.arange(network.nodes) if destinations is None
+                             else np.asarray(destinations, dtype=np.int64))
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.router = router if router is not None else Router(network)
+        self.edge = np.empty(0, dtype=np.int64)
+        self.lane = np.empty(0, dtype=np.int64)
+        self.pos = np.empty(0, dtype=np.float64)
+        self.speed = np.empty(0, dtype=np.float64)
+        self.length = np.empty(0, dtype=np.float64)
+        self.dest = np.empty(0, dtype=np.int64)
+        self.next_edge = np.empty(0, dtype=np.int64)  # -1 when this edge ends at dest
+        self.driver_parameters = driver_parameters
+        self.drivers = empty_drivers()
+        self.order = np.empty(0, dtype=np.int64)  # Last (lane, pos) sort, re-sorted each tick
+        self.lane_stride = float(network.edge_length.max()) + 1 if network.edges else 1.0
+        self.ticks = 0.0
+        self.arrived = 0
+        self.unroutable = 0  # Spawns dropped because dest was unreachable
+
+    def __len__(self):
+        return self.edge.size
+
+    def route_from(self, edges, dests):
+        nodes = self.network.edge_to[edges]
+        next_edge = self.router.next_edges(nodes, dests)
+        next_edge[nodes == dests] = -1
+        return next_edge
+
+    def add_vehicles(self, count, edges=None, dests=None):
+        net = self.network
+        edges = self.rng.integers(0, net.edges, size=count) if edges is None else np.asarray(edges, dtype=np.int64)
+        pos = self.rng.uniform(0, 1, size=count) * net.edge_length[edges]
+        lane = self.rng.integers(0, net.edge_lanes[edges])
+        speed = self.rng.uniform(1, 2, size=count)
+        if dests is None:
+            dests = self.destinations[self.rng.integers(0, self.destinations.size, size=count)]
+        dests = np.asarray(dests, dtype=np.int64)
+        drivers = draw_drivers(self.rng, count, self.driver_parameters)
+
+        # Keep only vehicles that can reach their destination
+        next_edge = self.route_from(edges, dests)
+        ok = (next_edge >= 0) | (net.edge_to[edges] == dests)
+        self.unroutable += int(count - np.count_nonzero(ok))
+        self.edge = np.concatenate([self.edge, edges[ok]])
+        self.lane = np.concatenate([self.lane, lane[ok]])
+        self.pos = np.concatenate([self.pos, pos[ok]])
+        self.speed = np.concatenate([self.speed, speed[ok]])
+        self.length = np.concatenate([self.length, np.full(np.count_nonzero(ok), float(VEHICLE_LENGTH))])
+        self.dest = np.concatenate([self.dest, dests[ok]])
+        self.next_edge = np.concatenate([self.next_edge, next_edge[ok]])
+        self.drivers = append_drivers(self.drivers, {name: values[ok] for name, values in drivers.items()})
+
+    def following(self):
+        """Leader and red light ahead of every vehicle, as ``(gap, leader, stop)``.
+
+        ``gap`` is the bumper gap to the leader, the next vehicle in the
+        lane or, for a lane's first vehicle, the last one in its next
+        edge's lane on the route (inf with no leader, -1 in ``leader``).
+        ``stop`` is the distance to the end of the edge while its signal
+        is red, else inf.
+        """
+        net = self.network
+        n = self.edge.size
+        lane_id = net.lane_offset[self.edge] + self.lane
+
+        # Stable re-sort of last tick's order: nearly sorted, so close to linear
+        if self.order.size != n:
+            self.order = np.concatenate([self.order, np.arange(self.order.size, n, dtype=np.int64)])
+        order = self.order
+        order = self.order = order[np.argsort(lane_id[order] * self.lane_stride + self.pos[order], kind='stable')]
+        s_lane = lane_id[order]
+        s_pos = self.pos[order]
+        s_len = self.length[order]
+
+        gap = np.full(n, np.inf)
+        leader = np.full(n, -1, dtype=np.int64)
+        stop = np.full(n, np.inf)
+        same = s_lane[1:] == s_lane[:-1]
+        gap[:-1][same] = (s_pos[1:] - s_len[1:] - s_pos[:-1])[same]
+        leader[:-1][same] = order[1:][same]
+
+        # Lane heads follow the tail of the next lane on their route and stop at a red line
+        head = np.ones(n, dtype=bool)
+        head[:-1] = ~same
+        heads = order[head]
+        if heads.size:
+            edge = self.edge[heads]
+            to_end = net.edge_length[edge] - self.pos[heads]
+            head_gap = np.full(heads.size, np.inf)
+            head_leader = np.full(heads.size, -1, dtype=np.int64)
+
+            onward = self.next_edge[heads]
+            routed = onward >= 0
+            if routed.any():
+                next_edges = onward[routed]
+                next_lane = net.lane_offset[next_edges] + np.minimum(self.lane[heads][routed],
+                                                                    net.edge_lanes[next_edges] - 1)
+                tail = np.searchsorted(s_lane, next_lane, side='left')
+                found = tail < n
+                found[found] = s_lane[tail[found]] == next_lane[found]
+                tail_gap = np.full(next_edges.size, np.inf)
+                tail_gap[found] = to_end[routed][found] + s_pos[tail[found]] - s_len[tail[found]]
+                tail_leader = np.full(next_edges.size, -1, dtype=np.int64)
+                tail_leader[found] = order[tail[found]]
+                head_gap[routed] = tail_gap
+                head_leader[routed] = tail_leader
+
+            red = ~net.green(edge, self.ticks)
+            head_stop = np.where(red, np.maximum(to_end, 0), np.inf)
+            gap[head] = head_gap
+            leader[head] = head_leader
+            stop[head] = head_stop
+
+        # Back from sorted order to vehicle order
+        unsorted = np.empty(n, dtype=np.int64)
+        unsorted[order] = np.arange(n)
+        return gap[unsorted], leader[unsorted], stop[unsorted]
+
+    def update(self, dt=FIXED_DT):
+        ticks = ticks_for(dt)
+        net = self.network
+        if self.edge.size:
+            # IDM accelerations as in TrafficSystem, desired speeds capped by the edge's limit
+            gap, leader, stop = self.following()
+            drivers = dict(self.drivers, v0=np.minimum(self.drivers['v0'], net.edge_speed[self.edge]))
+            v_lead = np.where(leader >= 0, self.speed[leader], 0.0)
+            acc = np.minimum(driver_acceleration(drivers, self.speed, v_lead, gap),
+                             driver_acceleration(drivers, self.speed, 0.0, stop))
+            speed = np.maximum(self.speed + acc * ticks, 0)
+
+            # Move without closing in on the leader or running a red light
+            room = np.minimum(np.maximum(gap - MIN_GAP, 0), stop)
+            step = np.minimum(speed * ticks, room)
+            self.pos += step
+            self.speed = np.minimum(speed, step / ticks)  # No faster than the room allowed
+
+            # Vehicles past the end of their edge arrive or move onto the next one
+            crossed = np.flatnonzero(self.pos > net.edge_length[self.edge])
+            if crossed.size:
+                done = crossed[self.next_edge[crossed] < 0]
+                moving = crossed[self.next_edge[crossed] >= 0]
+                if moving.size:
+                    self.pos[moving] -= net.edge_length[self.edge[moving]]
+                    self.edge[moving] = self.next_edge[moving]
+                    self.lane[moving] = np.minimum(self.lane[moving], net.edge_lanes[self.edge[moving]] - 1)
+                    self.next_edge[moving] = self.route_from(self.edge[moving], self.dest[moving])
+                if done.size:
+                    self.arrived += done.size
+                    keep = np.ones(self.edge.size, dtype=bool)
+                    keep[done] = False
+                    for name in ('edge', 'lane', 'pos', 'speed', 'length', 'dest', 'next_edge'):
+                        setattr(self, name, getattr(self, name)[keep])
+                    self.drivers = {name: values[keep] for name, values in self.drivers.items()}
+                    # Renumber the remembered order to the compacted arrays
+                    new_index = np.cumsum(keep) - 1
+                    self.order = new_index[self.order[keep[self.order]]]
+        self.ticks += ticks
+
+    def stats(self):
+        return {
+            'vehicles': len(self),
+            'arrived': self.arrived,
+            'unroutable': self.unroutable,
+            'mean_speed': float(self.speed.mean()) if self.speed.size else 0.0,
+        }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run routed traffic on a road network headless.")
+    parser.add_argument('--network', default=None, help="network JSON file (default: a signalized grid)")
+    parser.add_argument('--grid', type=int, nargs=2, default=[10, 10], metavar=('ROWS', 'COLS'))
+    parser.add_argument('--vehicles', type=int, default=1000, help="vehicles spawned at the start")
+    parser.add_argument('--zones', type=int, default=None, help="number of destination nodes (default: all)")
+    parser.add_argument('--ticks', type=int, default=3600, help="number of simulation ticks to run")
+    parser.add_argument('--seed', type=int, default=None, help="root seed")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    network = RoadNetwork.load(args.network) if args.network else RoadNetwork.grid(*args.grid)
+    rng = spawn_streams(args.seed)['traffic']
+    zones = None
+    if args.zones:
+        zones = rng.choice(network.nodes, size=min(args.zones, network.nodes), replace=False)
+    traffic = NetworkTraffic(network, rng=rng, destinations=zones)
+    traffic.add_vehicles(args.vehicles)
+
+    start = time.perf_counter()
+    for _ in range(args.ticks):
+        traffic.update()
+    elapsed = time.perf_counter() - start
+
+    print(f"nodes: {network.nodes}")
+    print(f"edges: {network.edges}")
+    print(f"signals: {network.signal_node.size}")
+    for name, value in traffic.stats().items():
+        print(f"{name}: {value:.2f}" if isinstance(value, float) else f"{name}: {value}")
+    for name, value in traffic.router.stats().items():
+        print(f"routes_{name}: {value}")
+    print(f"ticks_per_second: {args.ticks / elapsed:.0f}" if elapsed > 0 else "ticks_per_second: inf")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+import numpy as np
+
+
+class ParticleSystem:
+    """Fixed-capacity particle pool backed by preallocated NumPy buffers.
+
+    Every particle has a position, velocity (pixels per reference tick),
+    size and remaining life. ``alive`` marks used slots and freed slots go
+    back on a stack, so emitting and expiring never reallocate. Integration
+    and expiry are single array operations over the live slots. When the
+    pool is full, new emissions are dropped and counted in ``dropped``.
+
+    Lowest free slots are handed out first and ``high_water`` tracks the
+    highest slot in use, so a big pool with few live particles only scans
+    the slots it has actually touched.
+    """
+
+    def __init__(self, capacity, bounds=None, decay=0.0):
+        self.capacity = capacity
+        self.bounds = bounds  # (xmin, ymin, xmax, ymax); particles leaving it expire
+        self.decay = decay  # Life lost per reference tick
+
+        self.x = np.zeros(capacity, dtype=np.float32)
+        self.y = np.zeros(capacity, dtype=np.float32)
+        self.vx = np.zeros(capacity, dtype=np.float32)
+        self.vy = np.zeros(capacity, dtype=np.float32)
+        self.size = np.zeros(capacity, dtype=np.float32)
+        self.life = np.zeros(capacity, dtype=np.float32)
+        self.alive = np.zeros(capacity, dtype=bool)
+
+        # Free slots, popped from the end
+        self.free = np.arange(capacity - 1, -1, -1, dtype=np.int64)
+        self.free_count = capacity
+        self.high_water = 0
+        self.dropped = 0
+
+    def __len__(self):
+        return self.capacity - self.free_count
+
+    def emit(self, x, y, vx=0.0, vy=0.0, size=1.0, life=1.0):
+        # Arguments are scalars or arrays of the number of particles to emit
+        count = max(np.size(a) for a in (x, y, vx, vy, size, life))
+        take = min(count, self.free_count)
+        self.dropped += count - take
+        if take == 0:
+            return
+        slots = self.free[self.free_count - take:self.free_count]
+        self.free_count -= take
+        for buffer, value in ((self.x, x), (self.y, y), (self.vx, vx), (self.vy, vy),
+                              (self.size, size), (self.life, life)):
+            buffer[slots] = np.broadcast_to(value, (count,))[:take]
+        self.alive[slots] = True
+        self.high_water = max(self.high_water, int(slots.max()) + 1)
+
+    def update(self, ticks=1.0):
+        live = self.live()
+        if live.size == 0:
+            return
+        self.x[live] += self.vx[live] * ticks
+        self.y[live] += self.vy[live] * ticks
+        if self.decay:
+            self.life[live] -= self.decay * ticks
+
+        # Bulk expiry: out of life or out of bounds
+        dead = self.life[live] <= 0
+        if self.bounds is not None:
+            xmin, ymin, xmax, ymax = self.bounds
+            x, y = self.x[live], self.y[live]
+            dead |= (x < xmin) | (x > xmax) | (y < ymin) | (y > ymax)
+        expired = live[dead]
+        if expired.size:
+            self.alive[expired] = False
+            # Push highest first so the lowest freed slot is reused next
+            self.free[self.free_count:self.free_count + expired.size] = expired[::-1]
+            self.free_count += expired.size
+            if self.free_count == self.capacity:
+                self.high_water = 0
+
+    def clear(self):
+        self.alive[:] = False
+        self.free[:] = np.arange(self.capacity - 1, -1, -1)
+        self.free_count = self.capacity
+        self.high_water = 0
+
+    def live(self):
+        # Indices of live slots, for drawing
+        return np.flatnonzero(self.alive[:self.high_water])
@@ -0,0 +1,63 @@
+import time
+
+STATS_REFRESH_RATE = 10  # Text refreshes per second, independent of the physics rate
+
+
+class StatsPresenter:
+    """Pushes stats to widgets only when what they show actually changes.
+
+    The last text, value and style state pushed to each widget is cached,
+    so repeated updates with the same content never reach Qt. Style
+    states are names matched by ``[state="..."]`` selectors in a widget's
+    stylesheet, which Qt parses once; switching state only re-polishes the
+    widget. ``due()`` limits how often callers format and push text.
+    """
+
+    def __init__(self, refresh_rate=STATS_REFRESH_RATE, clock=time.perf_counter):
+        self.interval = 1.0 / refresh_rate if refresh_rate else 0.0
+        self.clock = clock
+        self.next_refresh = None
+        self.shown = {}  # (widget, kind) -> last pushed content
+        self.pushes = 0  # Updates that reached Qt
+        self.skipped = 0  # Updates dropped because nothing changed
+
+    def due(self):
+        # True at most refresh_rate times per second
+        now = self.clock()
+        if self.next_refresh is not None and now < self.next_refresh:
+            return False
+        self.next_refresh = now + self.interval
+        return True
+
+    def changed(self, widget, kind, content):
+        key = (widget, kind)
+        if self.shown.get(key) == content:
+            self.skipped += 1
+            return False
+        self.shown[key] = content
+        self.pushes += 1
+        return True
+
+    def set_text(self, widget, text):
+        if self.changed(widget, 'text', text):
+            widget.setText(text)
+
+    def set_value(self, widget, value):
+        if self.changed(widget, 'value', value):
+            widget.setValue(value)
+
+    def set_state(self, widget, state):
+        # Switch to a named style state from the widget's stylesheet
+        if self.changed(widget, 'state', state):
+            widget.setProperty('state', state)
+            style = widget.style()
+            style.unpolish(widget)
+            style.polish(widget)
+
+    def forget(self, widget=None):
+        # Drop cached content so the next update is pushed again
+        if widget is None:
+            self.shown.clear()
+        else:
+            for key in [key for key in self.shown if key[0] is widget]:
+                del self.shown[key]
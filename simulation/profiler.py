@@ -0,0 +1,165 @@
+import csv
+import json
+import time
+import numpy as np
+
+PROFILE_FRAMES = 600  # Frames kept in the ring buffer (10 s at 60 FPS)
+
+
+class NullScope:
+    # Shared no-op context manager handed out while profiling is off
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_SCOPE = NullScope()
+
+
+class Scope:
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.record(self.name, (time.perf_counter() - self.start) * 1000)
+        return False
+
+
+class FrameProfiler:
+    """Named timing scopes collected into a ring buffer of per-frame rows.
+
+    Wrap a stage in ``with profiler.scope('name'):`` and call
+    ``end_frame()`` once per frame; each row holds the frame time and the
+    milliseconds spent in every stage during that frame. Scopes with the
+    same name add up, and one scope object is reused per name, so a stage
+    must not nest inside itself. While ``enabled`` is False, ``scope``
+    returns a shared no-op and ``end_frame`` returns at once.
+
+    A profiler belongs to one thread. Another thread's stage times come
+    over as its running ``totals()`` (say, inside published frames) and
+    are added with ``merge``.
+    """
+
+    def __init__(self, capacity=PROFILE_FRAMES, enabled=False):
+        self.capacity = capacity
+        self.enabled = enabled
+        self.stages = []  # Column order, in order of first use
+        self.scopes = {}
+        self.total_ms = np.zeros(0)  # Running total per stage, never reset
+        self.merged = {}  # Last totals seen from another profiler, per stage
+        self.reset()
+
+    def reset(self):
+        self.frame_ms = np.zeros(self.capacity)
+        self.stage_ms = np.zeros((self.capacity, len(self.stages)))
+        self.current = np.zeros(len(self.stages))
+        self.frames = 0  # Frames recorded since reset, including overwritten ones
+        self.last_frame = None
+
+    def set_enabled(self, enabled):
+        self.enabled = enabled
+        # Don't count the time spent disabled as one long frame
+        self.last_frame = None
+        self.current[:] = 0
+
+    def scope(self, name):
+        if not self.enabled:
+            return NULL_SCOPE
+        scope = self.scopes.get(name)
+        if scope is None:
+            scope = self.scopes[name] = Scope(self, name)
+        return scope
+
+    def column(self, name):
+        if name not in self.stages:
+            self.stages.append(name)
+            self.stage_ms = np.hstack([self.stage_ms, np.zeros((self.capacity, 1))])
+            self.current = np.append(self.current, 0.0)
+            self.total_ms = np.append(self.total_ms, 0.0)
+        return self.stages.index(name)
+
+    def record(self, name, ms):
+        # Add time measured elsewhere to the current frame
+        if self.enabled:
+            column = self.column(name)
+            self.current[column] += ms
+            self.total_ms[column] += ms
+
+    def totals(self):
+        # Milliseconds recorded per stage so far, for handing to another thread
+        return dict(zip(self.stages, self.total_ms.tolist()))
+
+    def merge(self, totals):
+        # Add what another profiler's totals() gained since the last merge to this frame
+        for name, total in totals.items():
+            self.record(name, total - self.merged.get(name, 0.0))
+            self.merged[name] = total
+
+    def end_frame(self):
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        if self.last_frame is not None:
+            row = self.frames % self.capacity
+            self.frame_ms[row] = (now - self.last_frame) * 1000
+            self.stage_ms[row] = self.current
+            self.frames += 1
+        self.last_frame = now
+        self.current[:] = 0
+
+    def trace(self):
+        # (frame_ms, stage_ms) for the buffered frames, oldest first
+        count = min(self.frames, self.capacity)
+        order = (np.arange(count) + self.frames - count) % self.capacity
+        return self.frame_ms[order], self.stage_ms[order]
+
+    def summary(self):
+        frame_ms, stage_ms = self.trace()
+        if frame_ms.size == 0:
+            return {'frames': 0, 'fps': 0.0, 'p50_ms': 0.0, 'p99_ms': 0.0, 'stages': {}}
+        p50, p99 = np.percentile(frame_ms, [50, 99])
+        mean = frame_ms.mean()
+        return {
+            'frames': int(frame_ms.size),
+            'fps': float(1000 / mean) if mean > 0 else 0.0,
+            'p50_ms': float(p50),
+            'p99_ms': float(p99),
+            'stages': dict(zip(self.stages, stage_ms.mean(axis=0).tolist())),
+        }
+
+    def overlay_lines(self):
+        # Text for an on-screen readout of the summary
+        summary = self.summary()
+        lines = [
+            f"FPS {summary['fps']:5.1f}",
+            f"p50 {summary['p50_ms']:5.1f} ms",
+            f"p99 {summary['p99_ms']:5.1f} ms",
+        ]
+        return lines + [f"{name:<8}{ms:6.2f} ms" for name, ms in summary['stages'].items()]
+
+    def export(self, path):
+        # CSV (one row per frame) or JSON (summary plus every frame), by extension
+        frame_ms, stage_ms = self.trace()
+        if str(path).endswith('.json'):
+            trace = {
+                'summary': self.summary(),
+                'stages': self.stages,
+                'frame_ms': frame_ms.tolist(),
+                'stage_ms': stage_ms.tolist(),
+            }
+            with open(path, 'w') as f:
+                json.dump(trace, f, indent=1)
+        else:
+            with open(path, 'w', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(['frame', 'frame_ms'] + self.stages)
+                for i, (total, stages) in enumerate(zip(frame_ms.tolist(), stage_ms.tolist())):
+                    writer.writerow([i, f"{total:.4f}"] + [f"{ms:.4f}" for ms in stages])
@@ -0,0 +1,314 @@
+import json
+import os
+import queue
+import threading
+import numpy as np
+from simulation.core import Simulation
+from simulation.frames import TrafficFrame
+from simulation.network import VEHICLE_LENGTH
+from simulation.scheduler import FIXED_DT, ticks_for
+
+RECORDING_VERSION = 1
+CHUNK_TICKS = 600  # Ticks buffered before a chunk goes to the writer thread
+QUEUE_CHUNKS = 8  # Chunks waiting for the writer before the recorder holds on to them
+
+# One record per tick
+EGO_DTYPE = np.dtype([
+    ('tick', np.int64), ('clock', np.float64), ('car_x', np.float32), ('current_speed', np.float32),
+    ('speed', np.float32), ('battery', np.float32), ('distance', np.float32), ('safety_score', np.float32),
+    ('cars_passed', np.int32), ('collisions_avoided', np.int32), ('time_elapsed', np.int32),
+    ('boost_mode', np.bool_), ('is_running', np.bool_), ('weather', np.int8), ('time_of_day', np.int8),
+    ('camera_x', np.float32), ('origin', np.float64),
+])
+WEATHERS = ("Clear", "Rain", "Snow", "Fog")
+TIMES = ("Day", "Night", "Sunset")
+
+# Variable-length groups: per-tick counts are stored as running end offsets
+GROUPS = {
+    'car': (('x', np.float32), ('lane', np.int8)),
+    'ped': (('x', np.float32),),
+    'light': (('x', np.float32), ('green', np.bool_)),
+}
+
+
+def weather_code(weather):
+    if weather.is_raining:
+        return 1
+    if weather.is_snowing:
+        return 2
+    if weather.is_foggy:
+        return 3
+    return 0
+
+
+class TrajectoryRecorder:
+    """Streams per-tick simulation state to an append-only columnar recording.
+
+    A recording is a directory with one raw binary file per column and a
+    ``meta.json`` describing them. ``ego.bin`` holds one EGO_DTYPE record
+    per tick. Cars, pedestrians and lights are flat column files, plus an
+    ``*_end.bin`` of running end offsets (one per tick) to split them
+    back into ticks. ``record(sim)`` only copies the arrays into the
+    current chunk. Full chunks go through a bounded queue to a writer
+    thread that concatenates and appends them. If the queue is full, the
+    chunk keeps growing instead of blocking the caller.
+    """
+
+    def __init__(self, path, chunk_ticks=CHUNK_TICKS, queue_chunks=QUEUE_CHUNKS, meta=None):
+        self.path = path
+        self.chunk_ticks = chunk_ticks
+        self.meta = dict(meta or {})
+        self.ticks = 0
+        self.chunks_written = 0
+        self.stalls = 0  # Times a full queue made a chunk wait
+        self.error = None
+        self.totals = {}  # Elements written per group, owned by the writer thread
+        os.makedirs(path, exist_ok=True)
+        self.files = {name: open(os.path.join(path, name + '.bin'), 'wb') for name in self.column_names()}
+        self.queue = queue.Queue(maxsize=queue_chunks)
+        self.reset_chunk()
+        self.thread = threading.Thread(target=self.write_loop, name="trajectory-writer", daemon=True)
+        self.thread.start()
+
+    @staticmethod
+    def column_names():
+        names = ['ego']
+        for group, columns in GROUPS.items():
+            names.append(group + '_end')
+            names.extend(f"{group}_{column}" for column, _ in columns)
+        return names
+
+    def reset_chunk(self):
+        self.chunk = {'ego': []}
+        for group, columns in GROUPS.items():
+            for column, _ in columns:
+                self.chunk[f"{group}_{column}"] = []
+
+    def record(self, sim):
+        ego = np.empty((), dtype=EGO_DTYPE)
+        ego['tick'] = sim.ticks
+        ego['clock'] = sim.clock
+        for name in ('car_x', 'current_speed', 'speed', 'battery', 'distance', 'safety_score',
+                     'cars_passed', 'time_elapsed', 'boost_mode', 'is_running', 'origin'):
+            ego[name] = getattr(sim, name)
+        ego['camera_x'] = sim.camera.x
+        ego['collisions_avoided'] = sim.traffic.collisions_avoided
+        ego['weather'] = weather_code(sim.weather)
+        ego['time_of_day'] = TIMES.index(sim.weather.time_of_day.capitalize())
+        self.chunk['ego'].append(ego)
+
+        x, lane, _ = sim.traffic.car_arrays()
+        signals = sim.traffic.signals
+        self.chunk['car_x'].append(np.array(x, dtype=np.float32))
+        self.chunk['car_lane'].append(np.array(lane, dtype=np.int8))
+        self.chunk['ped_x'].append(np.array(sim.traffic.pedestrian_arrays(), dtype=np.float32))
+        self.chunk['light_x'].append(np.array(signals.x, dtype=np.float32))
+        self.chunk['light_green'].append(signals.green.copy())
+        self.ticks += 1
+
+        if len(self.chunk['ego']) >= self.chunk_ticks:
+            self.flush(block=False)
+
+    def flush(self, block=True):
+        if not self.chunk['ego']:
+            return
+        try:
+            self.queue.put(self.chunk, block=block)
+        except queue.Full:
+            self.stalls += 1
+            return
+        self.reset_chunk()
+
+    def write_loop(self):
+        # Keep draining after a failure so close() never blocks; the first error
+        # is raised from close() and later chunks are dropped
+        while True:
+            chunk = self.queue.get()
+            if chunk is None:
+                break
+            if self.error is not None:
+                continue
+            try:
+                self.write_chunk(chunk)
+            except Exception as error:
+                self.error = error
+
+    def write_chunk(self, chunk):
+        self.files['ego'].write(np.stack(chunk['ego']).tobytes())
+        for group, columns in GROUPS.items():
+            counts = np.fromiter((a.size for a in chunk[f"{group}_{columns[0][0]}"]), np.int64)
+            ends = self.totals.get(group, 0) + np.cumsum(counts)
+            self.totals[group] = int(ends[-1])
+            self.files[group + '_end'].write(ends.tobytes())
+            for column, dtype in columns:
+                name = f"{group}_{column}"
+                self.files[name].write(np.concatenate(chunk[name]).astype(dtype, copy=False).tobytes())
+        for f in self.files.values():
+            f.flush()
+        self.chunks_written += 1
+
+    def close(self):
+        self.flush(block=True)
+        self.queue.put(None)
+        self.thread.join()
+        for f in self.files.values():
+            f.close()
+        meta = {
+            'version': RECORDING_VERSION,
+            'ticks': self.ticks,
+            'dt': FIXED_DT,
+            'ego_dtype': [(name, EGO_DTYPE[name].str) for name in EGO_DTYPE.names],
+            'groups': {group: [(column, np.dtype(dtype).str) for column, dtype in columns]
+                       for group, columns in GROUPS.items()},
+        }
+        meta.update(self.meta)
+        with open(os.path.join(self.path, 'meta.json'), 'w') as f:
+            json.dump(meta, f, indent=1)
+        if self.error is not None:
+            raise self.error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+def map_column(path, dtype):
+    # Read-only memory map; an empty file maps to an empty array
+    dtype = np.dtype(dtype)
+    size = os.path.getsize(path) // dtype.itemsize
+    if size == 0:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r', shape=(size,))
+
+
+class Recording:
+    """Memory-mapped view of a recording; opening it reads only meta.json.
+
+    ``frame(i)`` returns the ego record and the car, pedestrian and light
+    columns of tick ``i`` as views into the mapped files, so seeking is
+    O(1) and an hour-long recording never has to fit in memory. Ticks
+    written before a crash (without meta.json) are still readable.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        meta_path = os.path.join(path, 'meta.json')
+        self.meta = {}
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                self.meta = json.load(f)
+        version = self.meta.get('version', RECORDING_VERSION)
+        if version > RECORDING_VERSION:
+            raise ValueError(f"recording version {version} is newer than supported ({RECORDING_VERSION})")
+
+        self.ego = map_column(os.path.join(path, 'ego.bin'), EGO_DTYPE)
+        self.ends = {}
+        self.columns = {}
+        ticks = self.ego.size
+        for group, columns in GROUPS.items():
+            self.ends[group] = map_column(os.path.join(path, group + '_end.bin'), np.int64)
+            ticks = min(ticks, self.ends[group].size)
+            for column, dtype in columns:
+                name = f"{group}_{column}"
+                self.columns[name] = map_column(os.path.join(path, name + '.bin'), dtype)
+        self.ticks = ticks
+
+    def __len__(self):
+        return self.ticks
+
+    def span(self, group, i):
+        ends = self.ends[group]
+        return (int(ends[i - 1]) if i > 0 else 0), int(ends[i])
+
+    def column(self, group, column, i):
+        start, end = self.span(group, i)
+        return self.columns[f"{group}_{column}"][start:end]
+
+    def frame(self, i):
+        if not 0 <= i < self.ticks:
+            raise IndexError(f"tick {i} outside recording of {self.ticks} ticks")
+        return {
+            'ego': self.ego[i],
+            'car_x': self.column('car', 'x', i),
+            'car_lane': self.column('car', 'lane', i),
+            'ped_x': self.column('ped', 'x', i),
+            'light_x': self.column('light', 'x', i),
+            'light_green': self.column('light', 'green', i),
+        }
+
+
+class ReplayTraffic(TrafficFrame):
+    # Traffic as recorded; adding cars or pedestrians does nothing
+    @classmethod
+    def from_recording(cls, frame):
+        return cls(frame['car_x'], frame['car_lane'], np.full(frame['car_x'].size, float(VEHICLE_LENGTH)),
+                   frame['ped_x'], frame['light_x'], frame['light_green'],
+                   collisions_avoided=int(frame['ego']['collisions_avoided']))
+
+    def add_traffic_cars(self, count):
+        pass  # A replay only shows what was recorded
+
+    def add_pedestrians(self, count):
+        pass
+
+
+class ReplaySimulation(Simulation):
+    """A Simulation whose ``step`` plays back a Recording, one tick per step.
+
+    It drives SimulationView unchanged. Weather visuals are regenerated
+    from the recorded mode rather than stored. ``seek(tick)`` jumps
+    anywhere in O(1). Control inputs are ignored.
+    """
+
+    def __init__(self, recording, **kwargs):
+        super().__init__(traffic=ReplayTraffic(), **kwargs)
+        self.recording = recording
+        self.position = 0
+        if len(recording):
+            self.seek(0)
+
+    def seek(self, tick):
+        tick = max(0, min(int(tick), len(self.recording) - 1))
+        frame = self.recording.frame(tick)
+        previous = self.recording.ego[tick - 1] if tick > 0 else frame['ego']
+        ego = frame['ego']
+        self.position = tick
+        self.prev_car_x = float(previous['car_x'])
+        self.car_x = float(ego['car_x'])
+        self.current_speed = float(ego['current_speed'])
+        self.speed = self.target_speed = float(ego['speed'])
+        self.battery = float(ego['battery'])
+        self.distance = float(ego['distance'])
+        self.safety_score = float(ego['safety_score'])
+        self.cars_passed = int(ego['cars_passed'])
+        self.time_elapsed = int(ego['time_elapsed'])
+        self.boost_mode = bool(ego['boost_mode'])
+        self.ticks = int(ego['tick'])
+        self.clock = float(ego['clock'])
+        self.camera.prev_x = float(previous['camera_x'])
+        self.camera.x = float(ego['camera_x'])
+        self.origin = float(ego['origin'])
+        self.traffic = ReplayTraffic.from_recording(frame)
+        weather = WEATHERS[int(ego['weather'])]
+        if weather_code(self.weather) != int(ego['weather']):
+            self.change_weather(weather)
+        time_of_day = TIMES[int(ego['time_of_day'])]
+        if self.weather.time_of_day != time_of_day.lower():
+            self.change_time(time_of_day)
+
+    def step(self, dt=FIXED_DT):
+        if self.position + 1 < len(self.recording):
+            self.seek(self.position + 1)
+        self.weather.update(dt)
+        self.add_boost_particle()
+        self.update_boost_particles(ticks_for(dt))
+
+    # Driving controls do nothing during a replay
+    def drive(self, throttle=0.0, brake=0.0, ticks=1.0):
+        pass
+
+    def set_speed(self, speed):
+        pass
@@ -0,0 +1,168 @@
+from collections import OrderedDict
+import numpy as np
+from PyQt6 import sip
+from PyQt6.QtCore import Qt, QLineF, QPointF, QRectF
+from PyQt6.QtGui import QColor, QPainter, QPixmap
+
+ALPHA_LEVELS = 8  # Distinct opacities used for fading particles
+LAYER_CACHE_ENTRIES = 8  # Pixmaps a LayerCache keeps: a few sizes, each at any time of day
+
+
+class PrimitiveArray:
+    """Reusable ``sip.array`` of QLineF, QRectF or QPointF filled from NumPy.
+
+    The Qt objects' coordinates are written through a NumPy view of the
+    array's memory, so building a batch for ``drawLines``, ``drawRects`` or
+    ``drawPoints`` costs a few array assignments instead of one Python
+    object per primitive. Storage only grows.
+    """
+
+    FIELDS = {QLineF: 4, QRectF: 4, QPointF: 2}
+
+    def __init__(self, klass):
+        self.klass = klass
+        self.fields = self.FIELDS[klass]
+        self.capacity = 0
+        self.objects = None
+        self.view = None
+
+    def reserve(self, count):
+        if self.objects is None or count > self.capacity:
+            self.capacity = max(count, 2 * self.capacity, 64)
+            self.objects = sip.array(self.klass, self.capacity)
+            pointer = sip.voidptr(self.objects, self.capacity * self.fields * 8)
+            self.view = np.frombuffer(pointer, dtype=np.float64).reshape(-1, self.fields)
+
+    def fill(self, *columns):
+        # One column per field (x1, y1, x2, y2 / x, y, w, h / x, y); scalars broadcast
+        sizes = [np.size(column) for column in columns]
+        count = max(sizes) if min(sizes) else 0  # An empty column (everything culled) means nothing to draw
+        self.reserve(count)
+        for i, column in enumerate(columns):
+            self.view[:count, i] = column
+        return self.objects[:count]
+
+
+def alpha_buckets(life, levels=ALPHA_LEVELS):
+    # Quantize life in [0, 1] to a bucket index; bucket b is drawn with alpha (b + 1) / levels
+    return np.clip(np.ceil(life * levels).astype(np.int64) - 1, 0, levels - 1)
+
+
+class LayerCache:
+    """Pre-rendered static layers, keyed by (width, height, pixel ratio, time of day).
+
+    ``paint(painter, width, height, time_of_day)`` draws the layers once into
+    a QPixmap; later frames blit that pixmap in a single call. Only the
+    ``entries`` most recently used pixmaps are kept, so resizing a window
+    doesn't pile up one per size. Call ``invalidate`` when anything the
+    paint function reads, other than the key, changes.
+    """
+
+    def __init__(self, paint, entries=LAYER_CACHE_ENTRIES):
+        self.paint = paint
+        self.entries = entries
+        self.pixmaps = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, width, height, time_of_day, pixel_ratio=1.0):
+        key = (width, height, pixel_ratio, time_of_day)
+        pixmap = self.pixmaps.get(key)
+        if pixmap is not None:
+            self.pixmaps.move_to_end(key)
+            self.hits += 1
+            return pixmap
+
+        self.misses += 1
+        pixmap = QPixmap(max(1, round(width * pixel_ratio)), max(1, round(height * pixel_ratio)))
+        pixmap.setDevicePixelRatio(pixel_ratio)
+        pixmap.fill(Qt.GlobalColor.transparent)
+        painter = QPainter(pixmap)
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        self.paint(painter, width, height, time_of_day)
+        painter.end()
+        self.pixmaps[key] = pixmap
+        if len(self.pixmaps) > self.entries:
+            self.pixmaps.popitem(last=False)
+        return pixmap
+
+    def invalidate(self):
+        self.pixmaps.clear()
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'cached': len(self.pixmaps)}
+
+
+def draw_text_panel(painter, lines, font, x=5, y=5, width=150):
+    # Monospace readout on a translucent panel, for debug overlays
+    painter.save()
+    painter.setFont(font)
+    metrics = painter.fontMetrics()
+    line_height = metrics.height()
+    painter.fillRect(x, y, width, line_height * len(lines) + 10, QColor(0, 0, 0, 160))
+    painter.setPen(QColor(0, 255, 0))
+    for i, line in enumerate(lines):
+        painter.drawText(x + 5, y + 5 + line_height * (i + 1) - metrics.descent(), line)
+    painter.restore()
+
+
+MARKING_PERIOD = 50  # Lane markings: a 30 px dash every 50 px
+MARKING_HEIGHT = 20  # Height of the marking strip, glow included
+STAR_DENSITY = 50 / (800 * 400)  # Stars per square pixel of sky (50 on the default view)
+TWINKLE_LEVELS = 4  # Distinct brightnesses used when twinkling
+
+
+class StarField:
+    """Night-sky stars generated once per (seed, widget size).
+
+    Positions, sizes and twinkle phases are drawn from a generator keyed by
+    the seed and the size, so the sky is stable between frames and
+    reproducible between runs. The count scales with the sky area, and
+    drawing is one ``drawRects`` call, or one per brightness level when
+    ``twinkle`` is on.
+    """
+
+    def __init__(self, seed=None, density=STAR_DENSITY, twinkle=False):
+        self.entropy = np.random.SeedSequence(seed).entropy
+        self.density = density
+        self.twinkle = twinkle
+        self.key = None
+        self.rects = PrimitiveArray(QRectF)
+        self.brushes = [QColor(255, 255, 255, int(255 * (level + 1) / TWINKLE_LEVELS))
+                        for level in range(TWINKLE_LEVELS)]
+
+    def generate(self, width, sky_height):
+        key = (width, sky_height)
+        if key == self.key:
+            return
+        self.key = key
+        rng = np.random.default_rng(np.random.SeedSequence(self.entropy, spawn_key=(width, max(sky_height, 0))))
+        count = int(round(self.density * width * max(sky_height, 0)))
+        self.size = rng.integers(1, 4, size=count).astype(np.float64)
+        self.x = rng.integers(0, width + 1, size=count).astype(np.float64)
+        self.y = rng.integers(0, max(sky_height, 1), size=count) - np.maximum(self.size - 1, 0)
+        self.phase = rng.uniform(0, 2 * np.pi, size=count)
+        self.rate = rng.uniform(0.5, 2.0, size=count)  # Twinkles per second (roughly)
+
+    def __len__(self):
+        return 0 if self.key is None else self.x.size
+
+    def brightness(self, t):
+        # Vectorized twinkle in [0.4, 1.0]
+        return 0.7 + 0.3 * np.sin(self.rate * (2 * np.pi * t) + self.phase)
+
+    def draw(self, painter, width, sky_height, t=0.0):
+        self.generate(width, sky_height)
+        painter.save()
+        painter.setPen(Qt.PenStyle.NoPen)
+        if not self.twinkle:
+            painter.setBrush(QColor(255, 255, 255))
+            painter.drawRects(self.rects.fill(self.x, self.y, self.size, self.size))
+        else:
+            levels = np.minimum((self.brightness(t) * TWINKLE_LEVELS).astype(np.int64), TWINKLE_LEVELS - 1)
+            for level in np.unique(levels).tolist():
+                members = levels == level
+                painter.setBrush(self.brushes[level])
+                painter.drawRects(self.rects.fill(self.x[members], self.y[members],
+                                                  self.size[members], self.size[members]))
+        painter.restore()
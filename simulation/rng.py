@@ -0,0 +1,17 @@
+import numpy as np
+
+# One independent stream per subsystem, spawned in this order (append only:
+# earlier streams stay the same when one is added)
+STREAMS = ('traffic', 'weather', 'effects', 'stars', 'world', 'sensors')
+
+
+def spawn_streams(seed=None, names=STREAMS):
+    """Independent ``numpy.random.Generator`` per subsystem from one root seed.
+
+    ``seed`` may be an int, None (fresh OS entropy) or a SeedSequence, so
+    sweeps can hand each worker ``SeedSequence(root).spawn(n)[i]`` and get
+    streams that never overlap with another worker's.
+    """
+    root = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+    children = root.spawn(len(names))
+    return {name: np.random.Generator(np.random.PCG64(child)) for name, child in zip(names, children)}
@@ -0,0 +1,102 @@
+import argparse
+import time
+from simulation.control import POLICIES, Controller
+from simulation.core import Simulation
+from simulation.profiler import FrameProfiler
+from simulation.recording import TrajectoryRecorder
+from simulation.signals import PLANS
+from simulation.traffic import TrafficSystem, VectorizedTrafficSystem
+from simulation.world import CARS_PER_SEGMENT, FAR_SEGMENTS
+
+ENGINES = {
+    'dict': TrafficSystem,
+    'vectorized': VectorizedTrafficSystem,
+}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run the traffic simulation headless and print final stats.")
+    parser.add_argument('--ticks', type=int, default=3600, help="number of simulation ticks to run")
+    parser.add_argument('--seed', type=int, default=None, help="root seed for every subsystem's random stream")
+    parser.add_argument('--speed', type=int, default=60, help="ego car cruise speed in km/h")
+    parser.add_argument('--cars', type=int, default=0, help="extra traffic cars on top of the initial ones")
+    parser.add_argument('--pedestrians', type=int, default=0, help="extra pedestrians on top of the initial ones")
+    parser.add_argument('--weather', choices=["Clear", "Rain", "Snow", "Fog"], default="Clear")
+    parser.add_argument('--time', choices=["Day", "Night", "Sunset"], default="Day")
+    parser.add_argument('--engine', choices=sorted(ENGINES), default='dict', help="traffic engine")
+    parser.add_argument('--lights', type=int, default=0, help="extra traffic lights on top of the initial ones")
+    parser.add_argument('--signal-plan', choices=sorted(PLANS), default='fixed', help="timing plan for every light")
+    parser.add_argument('--lane-changes', action='store_true', help="let traffic cars change lanes (MOBIL)")
+    parser.add_argument('--world', action='store_true', help="drive an endless streamed road instead of a loop")
+    parser.add_argument('--far-segments', type=int, default=FAR_SEGMENTS,
+                        help="with --world, road segments ahead simulated as cell densities")
+    parser.add_argument('--segment-cars', type=float, default=CARS_PER_SEGMENT,
+                        help="with --world, mean cars per new segment (a full segment holds ~26)")
+    parser.add_argument('--sensors', type=float, default=None, metavar='HZ',
+                        help="scan lidar and radar from the ego car this many times per simulated second")
+    parser.add_argument('--autopilot', choices=sorted(POLICIES), default=None,
+                        help="drive the ego car with a built-in policy, cruising at --speed")
+    parser.add_argument('--traffic-policy', choices=sorted(POLICIES), default=None,
+                        help="drive every traffic car with a built-in policy instead of the IDM")
+    parser.add_argument('--record', default=None, help="stream every tick to this recording directory")
+    parser.add_argument('--profile', default=None, help="write a per-tick stage trace (.csv or .json)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    sim = Simulation(seed=args.seed, traffic_engine=ENGINES[args.engine])
+    if args.world:
+        sim.enable_world(far=args.far_segments, cars_per_segment=args.segment_cars)
+    if args.sensors:
+        sim.enable_sensors(rate=args.sensors)
+    sim.traffic.add_traffic_cars(args.cars)
+    sim.traffic.add_pedestrians(args.pedestrians)
+    if args.lights:
+        sim.traffic.add_traffic_lights(args.lights)
+    sim.traffic.signals.set_plan(args.signal_plan)
+    sim.traffic.lane_changing = args.lane_changes
+    sim.change_weather(args.weather)
+    sim.change_time(args.time)
+    sim.is_running = True
+    sim.set_speed(args.speed)
+    if args.autopilot or args.traffic_policy:
+        sim.controller = Controller(POLICIES[args.autopilot]() if args.autopilot else None,
+                                    POLICIES[args.traffic_policy]() if args.traffic_policy else None,
+                                    cruise=args.speed)
+
+    # Each tick is one profiler frame; keep all of them
+    profiler = sim.profiler = FrameProfiler(capacity=max(args.ticks, 1), enabled=args.profile is not None)
+    profiler.end_frame()
+
+    recorder = TrajectoryRecorder(args.record, meta={'seed': args.seed}) if args.record else None
+
+    start = time.perf_counter()
+    for _ in range(args.ticks):
+        sim.step()
+        if recorder is not None:
+            recorder.record(sim)
+        profiler.end_frame()
+    if recorder is not None:
+        recorder.close()
+    elapsed = time.perf_counter() - start
+
+    for name, value in sim.stats().items():
+        if isinstance(value, float):
+            value = f"{value:.2f}"
+        print(f"{name}: {value}")
+    print(f"ticks_per_second: {args.ticks / elapsed:.0f}" if elapsed > 0 else "ticks_per_second: inf")
+    if args.profile:
+        profiler.export(args.profile)
+        summary = profiler.summary()
+        print(f"tick_p50_ms: {summary['p50_ms']:.3f}")
+        print(f"tick_p99_ms: {summary['p99_ms']:.3f}")
+        for name, ms in summary['stages'].items():
+            print(f"{name}_ms: {ms:.3f}")
+        print(f"profile: {args.profile}")
+    if recorder is not None:
+        print(f"recording: {args.record} ({recorder.ticks} ticks, {recorder.stalls} stalls)")
+
+
+if __name__ == "__main__":
+    main()
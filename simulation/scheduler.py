@@ -0,0 +1,61 @@
+PHYSICS_RATE = 60  # Fixed physics steps per second; per-tick constants are tuned for this rate
+FIXED_DT = 1.0 / PHYSICS_RATE
+MAX_STEPS_PER_FRAME = 5
+
+
+def ticks_for(dt):
+    # How many reference ticks ``dt`` seconds are worth
+    return dt * PHYSICS_RATE
+
+
+class FixedStepScheduler:
+    """Runs a step function at a fixed rate from real elapsed time.
+
+    ``advance(elapsed)`` adds wall-clock time to an accumulator and calls
+    ``step(dt)`` as many times as whole steps fit, so physics speed no longer
+    depends on how often the caller gets to run. Rendering happens once per
+    ``advance`` call (frames are skipped when several steps are needed), and
+    ``alpha`` is the fraction of a step left over, for interpolating
+    between the previous and current state when drawing.
+
+    At most ``max_steps_per_frame`` steps run per call; time beyond that is
+    dropped so a stall can't snowball into ever longer catch-up frames.
+    """
+
+    def __init__(self, step, rate=PHYSICS_RATE, max_steps_per_frame=MAX_STEPS_PER_FRAME):
+        self.step = step
+        self.dt = 1.0 / rate
+        self.max_steps_per_frame = max_steps_per_frame
+        self.accumulator = 0.0
+        self.alpha = 0.0
+
+        # Counters
+        self.frames = 0
+        self.steps = 0
+        self.skipped_frames = 0  # Frames that needed more than one step
+        self.dropped_time = 0.0  # Seconds discarded by the max-steps safeguard
+
+    def advance(self, elapsed):
+        self.accumulator += max(0.0, elapsed)
+        steps = 0
+        while self.accumulator >= self.dt and steps < self.max_steps_per_frame:
+            self.step(self.dt)
+            self.accumulator -= self.dt
+            steps += 1
+
+        if self.accumulator >= self.dt:
+            # Too far behind: keep only the partial step for interpolation
+            dropped = self.accumulator - self.accumulator % self.dt
+            self.dropped_time += dropped
+            self.accumulator -= dropped
+
+        self.frames += 1
+        self.steps += steps
+        if steps > 1:
+            self.skipped_frames += steps - 1
+        self.alpha = self.accumulator / self.dt
+        return steps
+
+    def reset(self):
+        self.accumulator = 0.0
+        self.alpha = 0.0
@@ -0,0 +1,184 @@
+import numpy as np
+from simulation.scheduler import FIXED_DT
+
+# Obstacle kinds in scans and object lists
+NONE, CAR, PEDESTRIAN, LIGHT = -1, 0, 1, 2
+
+# Where things are drawn, relative to the top of the road (see SimulationView)
+LANE_OFFSET = 15  # Top of lane 0's cars
+LANE_SPACING = 40
+CAR_HEIGHT = 20
+PEDESTRIAN_OFFSET = 110  # On the sidewalk below the road
+PEDESTRIAN_SIZE = 5
+LIGHT_OFFSET = -20  # Above the road
+LIGHT_SIZE = 10
+
+# Sensors; distances are in pixels (a traffic car is 40 px, 4.5 m), angles in degrees
+SENSOR_RATE = 10.0  # Scans per simulated second
+LIDAR_BEAMS = 360
+LIDAR_FOV = 360.0  # Centred on the heading
+LIDAR_RANGE = 800.0
+LIDAR_NOISE = 0.5  # Range noise standard deviation in clear weather
+RADAR_FOV = 120.0
+RADAR_RANGE = 1600.0
+RADAR_NOISE = 2.0
+RADAR_RATE_NOISE = 0.05  # Range rate noise, px per reference tick
+CULL_MARGIN = 100  # Covers a car's width plus any moves since the lane index was sorted
+
+# (range factor, noise factor) per condition; with several, the worst of each applies
+LIDAR_WEATHER = {'rain': (0.7, 3.0), 'snow': (0.5, 4.0), 'fog': (0.4, 2.0)}
+RADAR_WEATHER = {'rain': (0.9, 1.5), 'snow': (0.85, 1.5), 'fog': (1.0, 1.0)}
+
+OBJECT_DTYPE = np.dtype([
+    ('kind', 'i1'), ('index', 'i8'), ('range', 'f8'), ('azimuth', 'f8'), ('range_rate', 'f8'),
+])
+
+
+def weather_factors(weather, table):
+    conditions = [name for name, active in (('rain', weather.is_raining), ('snow', weather.is_snowing),
+                                            ('fog', weather.is_foggy)) if active]
+    if not conditions:
+        return 1.0, 1.0
+    return min(table[name][0] for name in conditions), max(table[name][1] for name in conditions)
+
+
+def obstacles(sim, lo, hi):
+    """Boxes of the cars, pedestrians and lights overlapping ``lo < x <= hi`` (engine coordinates).
+
+    Cars are culled through the traffic engine's lane index, a binary
+    search per lane, so only those near the window are ever touched.
+    Returns ``(kind, index, x0, y0, x1, y1, vx)`` arrays, where ``index``
+    is the obstacle's position in its engine array and ``vx`` is its
+    speed along the road in px per reference tick.
+    """
+    traffic = sim.traffic
+    road_y = sim.road_y
+
+    car_x, car_lane, car_width = traffic.car_arrays()
+    ids = traffic.cars_between(lo - CULL_MARGIN, hi + CULL_MARGIN)
+    ids = ids[(car_x[ids] + car_width[ids] > lo) & (car_x[ids] <= hi)]
+    ped_x = traffic.pedestrian_arrays()
+    peds = np.flatnonzero((ped_x + PEDESTRIAN_SIZE > lo) & (ped_x <= hi))
+    light_x = traffic.signals.x
+    lights = np.flatnonzero((light_x + LIGHT_SIZE > lo) & (light_x <= hi))
+
+    car_y = road_y + LANE_OFFSET + LANE_SPACING * car_lane[ids]
+    x0 = np.concatenate([car_x[ids], ped_x[peds], light_x[lights]])
+    y0 = np.concatenate([car_y, np.full(peds.size, road_y + PEDESTRIAN_OFFSET),
+                         np.full(lights.size, road_y + LIGHT_OFFSET)]).astype(np.float64)
+    x1 = x0 + np.concatenate([car_width[ids], np.full(peds.size, PEDESTRIAN_SIZE), np.full(lights.size, LIGHT_SIZE)])
+    y1 = y0 + np.concatenate([np.full(ids.size, CAR_HEIGHT), np.full(peds.size, PEDESTRIAN_SIZE),
+                              np.full(lights.size, LIGHT_SIZE)])
+    kind = np.repeat(np.array([CAR, PEDESTRIAN, LIGHT], dtype=np.int8), [ids.size, peds.size, lights.size])
+    index = np.concatenate([ids, peds, lights])
+    vx = np.concatenate([traffic.car_speeds()[ids], traffic.pedestrian_speeds()[peds], np.zeros(lights.size)])
+    return kind, index, x0, y0, x1, y1, vx
+
+
+def raycast(x, y, angles, x0, y0, x1, y1, max_range):
+    """Distance along each ray from ``(x, y)`` to the first box it enters.
+
+    Boxes are axis aligned, ``[x0, x1] x [y0, y1]``. The slab test runs
+    on a (rays, boxes) grid in one pass, so cost grows with rays times
+    the boxes left after culling. Returns ``(ranges, hit)``. ``hit`` is the
+    box each ray stopped at, or -1 when nothing is within ``max_range``;
+    those rays read ``max_range``. Rays starting inside a box ignore it.
+    """
+    if not x0.size:
+        return np.full(angles.size, float(max_range)), np.full(angles.size, -1, dtype=np.int64)
+    dx, dy = np.cos(angles), np.sin(angles)
+    # A ray parallel to an axis never leaves the slab it starts in; keep the division finite
+    inv_dx = (1 / np.where(np.abs(dx) < 1e-12, 1e-12, dx))[:, None]
+    inv_dy = (1 / np.where(np.abs(dy) < 1e-12, 1e-12, dy))[:, None]
+    tx0, tx1 = (x0 - x) * inv_dx, (x1 - x) * inv_dx
+    ty0, ty1 = (y0 - y) * inv_dy, (y1 - y) * inv_dy
+    near = np.maximum(np.minimum(tx0, tx1), np.minimum(ty0, ty1))
+    far = np.minimum(np.maximum(tx0, tx1), np.maximum(ty0, ty1))
+    near[(near > far) | (near < 0)] = np.inf
+    hit = np.argmin(near, axis=1)
+    ranges = near[np.arange(angles.size), hit]
+    missed = ranges > max_range
+    return np.where(missed, float(max_range), ranges), np.where(missed, -1, hit)
+
+
+class SensorSuite:
+    """Lidar and radar on the ego car, scanned ``rate`` times per simulated second.
+
+    Both sit at the middle of the ego car and turn with its
+    ``car_angle``. Angles are radians from the heading, with y pointing
+    down as on screen. Each scan replaces, rather than fills, the output
+    arrays, so a reader can keep the ones it has:
+
+    - ``ranges`` and ``kinds``: one distance and obstacle kind per lidar
+      beam. Beams that hit nothing read ``lidar_range`` with kind NONE.
+    - ``objects``: an OBJECT_DTYPE record per obstacle the radar sees
+      (nearest point within range and field of view), sorted by range.
+      ``range_rate`` is the rate the gap opens, in px per reference tick.
+
+    Rain, snow and fog shorten both sensors' reach and add noise, the
+    lidar much more than the radar (see LIDAR_WEATHER and RADAR_WEATHER).
+    """
+
+    def __init__(self, rng=None, rate=SENSOR_RATE, beams=LIDAR_BEAMS, lidar_fov=LIDAR_FOV,
+                 lidar_range=LIDAR_RANGE, radar_fov=RADAR_FOV, radar_range=RADAR_RANGE):
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.period = 1 / rate
+        self.angles = np.radians(np.linspace(-lidar_fov / 2, lidar_fov / 2, beams, endpoint=lidar_fov < 360))
+        self.lidar_range = float(lidar_range)
+        self.radar_half_fov = np.radians(radar_fov / 2)
+        self.radar_range = float(radar_range)
+        self.elapsed = self.period  # Scan on the first step
+        self.scans = 0
+        self.timestamp = None  # Simulation clock of the last scan
+        self.ranges = np.full(beams, self.lidar_range)
+        self.kinds = np.full(beams, NONE, dtype=np.int8)
+        self.objects = np.empty(0, dtype=OBJECT_DTYPE)
+
+    def update(self, sim, dt=FIXED_DT):
+        # Scan if one is due; a late scan doesn't make the next one early
+        self.elapsed += dt
+        if self.elapsed < self.period - 1e-9:
+            return False
+        self.elapsed = min(self.elapsed - self.period, self.period)
+        self.scan(sim)
+        return True
+
+    def scan(self, sim):
+        rng = self.rng
+        x = sim.car_x - sim.origin + sim.car_width / 2
+        y = sim.car_y + sim.car_height / 2
+        heading = np.radians(sim.car_angle)
+        lidar_reach, lidar_noise = weather_factors(sim.weather, LIDAR_WEATHER)
+        radar_reach, radar_noise = weather_factors(sim.weather, RADAR_WEATHER)
+        lidar_reach *= self.lidar_range
+        radar_reach *= self.radar_range
+        reach = max(lidar_reach, radar_reach)
+        kind, index, x0, y0, x1, y1, vx = obstacles(sim, x - reach, x + reach)
+
+        # Lidar: first box along each beam; beyond the weather's reach there is no return
+        ranges, hit = raycast(x, y, self.angles + heading, x0, y0, x1, y1, lidar_reach)
+        returned = hit >= 0
+        noisy = np.clip(ranges + rng.normal(0, LIDAR_NOISE * lidar_noise, size=ranges.size), 0, self.lidar_range)
+        self.ranges = np.where(returned, noisy, self.lidar_range)
+        kinds = np.full(hit.size, NONE, dtype=np.int8)
+        kinds[returned] = kind[hit[returned]]  # Nothing to look up when nothing is in reach
+        self.kinds = kinds
+
+        # Radar: nearest point of each box, and how fast it moves along the line of sight
+        px = np.clip(x, x0, x1) - x
+        py = np.clip(y, y0, y1) - y
+        distance = np.hypot(px, py)
+        azimuth = (np.arctan2(py, px) - heading + np.pi) % (2 * np.pi) - np.pi
+        seen = np.flatnonzero((distance <= radar_reach) & (np.abs(azimuth) <= self.radar_half_fov))
+        relative = vx[seen] - sim.current_speed / 10  # Ego speed in px per reference tick
+        objects = np.empty(seen.size, dtype=OBJECT_DTYPE)
+        objects['kind'] = kind[seen]
+        objects['index'] = index[seen]
+        objects['range'] = distance[seen] + rng.normal(0, RADAR_NOISE * radar_noise, size=seen.size)
+        objects['azimuth'] = azimuth[seen]
+        objects['range_rate'] = (relative * px[seen] / np.maximum(distance[seen], 1e-9)
+                                 + rng.normal(0, RADAR_RATE_NOISE * radar_noise, size=seen.size))
+        self.objects = objects[np.argsort(objects['range'], kind='stable')]
+
+        self.timestamp = sim.clock
+        self.scans += 1
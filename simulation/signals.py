@@ -0,0 +1,162 @@
+import numpy as np
+
+FIXED, GREEN_WAVE, ACTUATED = 0, 1, 2  # Signal plans
+PLANS = {'fixed': FIXED, 'green_wave': GREEN_WAVE, 'actuated': ACTUATED}
+DETECTOR_RANGE = 120  # Actuated signals see cars this far before the stop line
+QUEUE_RANGE = 200  # Stopped cars this close to a red line count as queued
+MIN_GREEN = 60  # Actuated green never ends sooner (reference ticks)
+MAX_GREEN = 300  # ... nor later, even with steady demand
+
+
+class SignalController:
+    """Traffic lights on a looping road, with all state held in arrays.
+
+    Every light has a stop line at ``x``, a ``green`` flag and a ``timer``
+    of reference ticks left in its phase. Fixed-time and green-wave lights
+    alternate ``green_time`` and ``red_time``; a green wave is fixed-time
+    with offsets set so a car at the progression speed meets every light
+    green. Actuated lights hold green between ``min_green`` and
+    ``max_green`` while cars are detected before the line. ``update``
+    advances every light in one pass of array operations.
+
+    ``queue`` holds the number of stopped cars waiting at each red light,
+    and ``throughput`` counts the cars that have crossed each stop line.
+    """
+
+    def __init__(self, road_length=800):
+        self.road_length = road_length
+        self.x = np.empty(0, dtype=np.float64)
+        self.green = np.empty(0, dtype=bool)
+        self.timer = np.empty(0, dtype=np.float64)
+        self.elapsed = np.empty(0, dtype=np.float64)  # Ticks since the last switch
+        self.plan = np.empty(0, dtype=np.int64)
+        self.green_time = np.empty(0, dtype=np.float64)
+        self.red_time = np.empty(0, dtype=np.float64)
+        self.min_green = np.empty(0, dtype=np.float64)
+        self.max_green = np.empty(0, dtype=np.float64)
+        self.queue = np.empty(0, dtype=np.int64)
+        self.throughput = np.empty(0, dtype=np.int64)
+
+    def __len__(self):
+        return self.x.size
+
+    @property
+    def lights(self):
+        # Dict view in the old traffic_lights layout (a copy, not live)
+        return [{'x': x, 'state': 'green' if green else 'red', 'timer': timer}
+                for x, green, timer in zip(self.x.tolist(), self.green.tolist(), self.timer.tolist())]
+
+    def add(self, x, green_time, red_time, plan='fixed', offset=0.0,
+            min_green=MIN_GREEN, max_green=MAX_GREEN):
+        # Lights start at ``offset`` ticks into a cycle that begins with green
+        x = np.atleast_1d(np.asarray(x, dtype=np.float64))
+        count = x.size
+        green_time = np.broadcast_to(np.asarray(green_time, dtype=np.float64), (count,))
+        red_time = np.broadcast_to(np.asarray(red_time, dtype=np.float64), (count,))
+        position = np.broadcast_to(np.asarray(offset, dtype=np.float64), (count,)) % (green_time + red_time)
+        green = position < green_time
+        timer = np.where(green, green_time - position, green_time + red_time - position)
+
+        self.x = np.concatenate([self.x, x])
+        self.green = np.concatenate([self.green, green])
+        self.timer = np.concatenate([self.timer, timer])
+        self.elapsed = np.concatenate([self.elapsed, np.where(green, position, position - green_time)])
+        self.plan = np.concatenate([self.plan, np.full(count, PLANS[plan])])
+        self.green_time = np.concatenate([self.green_time, green_time])
+        self.red_time = np.concatenate([self.red_time, red_time])
+        self.min_green = np.concatenate([self.min_green, np.broadcast_to(float(min_green), (count,))])
+        self.max_green = np.concatenate([self.max_green, np.broadcast_to(float(max_green), (count,))])
+        self.queue = np.concatenate([self.queue, np.zeros(count, dtype=np.int64)])
+        self.throughput = np.concatenate([self.throughput, np.zeros(count, dtype=np.int64)])
+
+    def keep(self, keep):
+        # Drop the lights where ``keep`` is False
+        for name in ('x', 'green', 'timer', 'elapsed', 'plan', 'green_time', 'red_time',
+                     'min_green', 'max_green', 'queue', 'throughput'):
+            setattr(self, name, getattr(self, name)[keep])
+
+    def set_green_wave(self, speed, green_time=None, red_time=None):
+        """Retime every light so a car at ``speed`` (pixels per reference
+        tick) leaving the first line at the start of green meets each
+        following line at the start of its green. All lights share one
+        cycle, by default the mean of their current green and red times."""
+        if self.x.size == 0:
+            return
+        self.green_time[:] = green_time if green_time is not None else self.green_time.mean()
+        self.red_time[:] = red_time if red_time is not None else self.red_time.mean()
+        cycle = self.green_time + self.red_time
+        # Light at distance d downstream turns green d / speed ticks later
+        travel = (self.x - self.x.min()) / speed
+        position = (-travel) % cycle
+        self.green = position < self.green_time
+        self.timer = np.where(self.green, self.green_time - position, cycle - position)
+        self.elapsed = np.where(self.green, position, position - self.green_time)
+        self.plan[:] = GREEN_WAVE
+
+    def set_plan(self, plan, speed=2.0):
+        # Switch every light to a plan; green waves progress at ``speed``
+        if PLANS[plan] == GREEN_WAVE:
+            self.set_green_wave(speed)
+        else:
+            self.plan[:] = PLANS[plan]
+
+    def update(self, ticks, demand=None):
+        # demand: cars detected before each stop line (for actuated plans)
+        if self.x.size == 0:
+            return
+        self.timer -= ticks
+        self.elapsed += ticks
+        switch = self.timer <= 0
+
+        actuated = self.plan == ACTUATED
+        if actuated.any():
+            waiting = demand > 0 if demand is not None else np.zeros(self.x.size, dtype=bool)
+            green = actuated & self.green
+            # Gap out once the minimum green is served, max out regardless
+            switch[green] = ((self.elapsed[green] >= self.min_green[green]) & ~waiting[green]) | \
+                            (self.elapsed[green] >= self.max_green[green])
+
+        if switch.any():
+            self.green[switch] = ~self.green[switch]
+            self.elapsed[switch] = 0
+            duration = np.where(self.green[switch], self.green_time[switch], self.red_time[switch])
+            # Carry the overshoot so fixed plans do not drift
+            self.timer[switch] = np.where(actuated[switch], duration, self.timer[switch] + duration)
+
+    def ahead(self, front, lights=None):
+        # Index of the next stop line at or ahead of each front, and its distance,
+        # wrapping around the ring; restricted to ``lights`` when given
+        candidates = np.arange(self.x.size) if lights is None else np.flatnonzero(lights)
+        front = np.asarray(front, dtype=np.float64)
+        if candidates.size == 0:
+            return np.full(front.shape, -1, dtype=np.int64), np.full(front.shape, np.inf)
+        order = candidates[np.argsort(self.x[candidates], kind='stable')]
+        line_x = self.x[order]
+        k = np.searchsorted(line_x, front, side='left')
+        wrapped = k == line_x.size
+        k[wrapped] = 0
+        distance = line_x[k] - front
+        distance[wrapped] += self.road_length
+        return order[k], distance
+
+    def stop_distance(self, front):
+        # How far each front may advance before the next red stop line
+        return self.ahead(front, ~self.green)[1]
+
+    def record(self, front_before, front_after, stopped):
+        """Per-light queue and throughput from one tick of car movement."""
+        if self.x.size == 0:
+            return
+        light, distance = self.ahead(front_before)
+        travelled = np.asarray(front_after) - np.asarray(front_before)
+        crossed = (travelled >= distance) & (travelled > 0)
+        self.throughput += np.bincount(light[crossed], minlength=self.x.size)
+        queued = stopped & (distance <= QUEUE_RANGE) & ~self.green[light]
+        self.queue = np.bincount(light[queued], minlength=self.x.size)
+
+    def demand(self, front):
+        # Cars within detector range of each stop line
+        if self.x.size == 0:
+            return np.empty(0, dtype=np.int64)
+        light, distance = self.ahead(front)
+        return np.bincount(light[distance <= DETECTOR_RANGE], minlength=self.x.size)
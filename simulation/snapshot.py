@@ -0,0 +1,312 @@
+import struct
+import numpy as np
+from simulation.core import Simulation
+from simulation.idm import DRIVER_FIELDS
+from simulation.network import RoadNetwork
+from simulation.particles import ParticleSystem
+from simulation.signals import SignalController
+from simulation.spatial import LaneIndex
+from simulation.traffic import TrafficSystem, VectorizedTrafficSystem
+from simulation.weather import WeatherEffect
+
+SNAPSHOT_VERSION = 1
+MAGIC = b'AVSN'
+HEADER = struct.Struct('<4sH')
+ENGINES = (TrafficSystem, VectorizedTrafficSystem)  # Engine codes are indices
+TIMES = ("day", "night", "sunset")
+
+# Every scalar of the simulation, in one fixed-layout record
+STATE_DTYPE = np.dtype([
+    # Ego car and vehicle stats
+    ('width', '<i8'), ('height', '<i8'), ('car_x', '<f8'), ('prev_car_x', '<f8'),
+    ('target_speed', '<i8'), ('current_speed', '<f8'), ('car_width', '<f8'), ('car_height', '<f8'),
+    ('car_angle', '<f8'), ('boost_mode', '?'), ('speed', '<i8'), ('battery', '<f8'), ('distance', '<f8'),
+    ('safety_score', '<f8'), ('cars_passed', '<i8'), ('red_light_stops', '<i8'), ('time_elapsed', '<i8'),
+    ('is_running', '?'), ('ticks', '<i8'), ('clock', '<f8'), ('stats_clock', '<f8'),
+    # Weather
+    ('is_raining', '?'), ('is_snowing', '?'), ('is_foggy', '?'), ('time_of_day', '<i1'),
+    ('emission_rate', '<f8'), ('spawn_budget', '<f8'),
+    # Traffic
+    ('engine', '<i1'), ('road_length', '<f8'), ('lanes', '<i8'), ('lane_changing', '?'),
+    ('lane_changes', '<i8'), ('collisions_avoided', '<i8'),
+    ('driver_mean', '<f8', len(DRIVER_FIELDS)), ('driver_sd', '<f8', len(DRIVER_FIELDS)),
+])
+
+# PCG64 state: 128-bit state and increment, plus the buffered 32-bit half
+RNG_DTYPE = np.dtype([('state', '<u8', 2), ('inc', '<u8', 2), ('has_uint32', '<i4'), ('uinteger', '<u4')])
+RNG_ROLES = ('traffic', 'weather', 'effects', 'stars')
+
+PARTICLE_DTYPE = np.dtype([('capacity', '<i8'), ('high_water', '<i8'), ('free_count', '<i8'),
+                           ('untouched', '<i8'), ('dropped', '<i8'), ('decay', '<f8'), ('bounds', '<f8', 4)])
+PARTICLE_ARRAYS = (('x', '<f4'), ('y', '<f4'), ('vx', '<f4'), ('vy', '<f4'), ('size', '<f4'),
+                   ('life', '<f4'), ('alive', '?'))
+
+# Variable-length arrays, each stored as a uint64 length and its raw bytes
+TRAFFIC_ARRAYS = (
+    ('car_x', '<f8'), ('car_speed', '<f8'), ('car_width', '<f8'), ('car_lane', '<i8'),
+    ('ped_x', '<f8'), ('ped_speed', '<f8'), ('index_perm', '<i8'), ('charge', '<f8'),
+) + tuple((name, '<f8') for name in DRIVER_FIELDS)
+SIGNAL_ARRAYS = (
+    ('x', '<f8'), ('green', '?'), ('timer', '<f8'), ('elapsed', '<f8'), ('plan', '<i8'),
+    ('green_time', '<f8'), ('red_time', '<f8'), ('min_green', '<f8'), ('max_green', '<f8'),
+    ('queue', '<i8'), ('throughput', '<i8'),
+)
+LENGTH = struct.Struct('<Q')
+
+
+def split_u128(value):
+    return value & 0xFFFFFFFFFFFFFFFF, value >> 64
+
+
+def join_u128(pair):
+    return int(pair[0]) | (int(pair[1]) << 64)
+
+
+def rng_record(rng):
+    state = rng.bit_generator.state
+    if state['bit_generator'] != 'PCG64':
+        raise ValueError(f"cannot snapshot a {state['bit_generator']} generator, only PCG64")
+    record = np.zeros((), dtype=RNG_DTYPE)
+    record['state'] = split_u128(state['state']['state'])
+    record['inc'] = split_u128(state['state']['inc'])
+    record['has_uint32'] = state['has_uint32']
+    record['uinteger'] = state['uinteger']
+    return record
+
+
+def restore_rng(rng, record):
+    rng.bit_generator.state = {
+        'bit_generator': 'PCG64',
+        'state': {'state': join_u128(record['state']), 'inc': join_u128(record['inc'])},
+        'has_uint32': int(record['has_uint32']),
+        'uinteger': int(record['uinteger']),
+    }
+
+
+def traffic_arrays(traffic):
+    # Both engines as (name -> array) in the vectorized layout
+    if isinstance(traffic, VectorizedTrafficSystem):
+        arrays = {'car_x': traffic.car_x, 'car_speed': traffic.car_speed, 'car_width': traffic.car_width,
+                  'car_lane': traffic.car_lane, 'ped_x': traffic.ped_x, 'ped_speed': traffic.ped_speed}
+    else:
+        x, lane, width = traffic.car_arrays()
+        arrays = {'car_x': x, 'car_lane': lane, 'car_width': width, 'ped_x': traffic.pedestrian_arrays(),
+                  'car_speed': np.fromiter((car['speed'] for car in traffic.cars), np.float64, len(traffic.cars)),
+                  'ped_speed': np.fromiter((ped['speed'] for ped in traffic.pedestrians), np.float64,
+                                           len(traffic.pedestrians))}
+    arrays['index_perm'] = traffic.index.perm
+    arrays['charge'] = traffic.charge
+    arrays.update(traffic.drivers)
+    return arrays
+
+
+def particle_state(particles):
+    header = np.zeros((), dtype=PARTICLE_DTYPE)
+    count = particles.free_count
+    # The bottom of the free stack is the never-used slots in their initial order; only the rest is stored
+    initial = np.arange(particles.capacity - 1, particles.capacity - 1 - count, -1)
+    differs = np.flatnonzero(particles.free[:count] != initial)
+    untouched = int(differs[0]) if differs.size else count
+    for name in ('capacity', 'high_water', 'free_count', 'dropped', 'decay'):
+        header[name] = getattr(particles, name)
+    header['untouched'] = untouched
+    header['bounds'] = particles.bounds if particles.bounds is not None else (np.nan,) * 4
+    used = particles.high_water
+    arrays = {name: getattr(particles, name)[:used] for name, _ in PARTICLE_ARRAYS}
+    arrays['free'] = particles.free[untouched:count]
+    return header, arrays
+
+
+def restore_particles(header, arrays):
+    bounds = tuple(header['bounds'].tolist())
+    particles = ParticleSystem(int(header['capacity']), bounds=None if np.isnan(bounds[0]) else bounds,
+                               decay=float(header['decay']))
+    used = int(header['high_water'])
+    for name, _ in PARTICLE_ARRAYS:
+        getattr(particles, name)[:used] = arrays[name]
+    untouched = int(header['untouched'])
+    particles.free_count = int(header['free_count'])
+    particles.free[untouched:particles.free_count] = arrays['free']
+    particles.high_water = used
+    particles.dropped = int(header['dropped'])
+    return particles
+
+
+class Writer:
+    def __init__(self):
+        self.parts = []
+
+    def record(self, record):
+        self.parts.append(record.tobytes())
+
+    def arrays(self, arrays, spec):
+        for name, dtype in spec:
+            array = np.ascontiguousarray(arrays[name], dtype=dtype)
+            self.parts.append(LENGTH.pack(array.size))
+            self.parts.append(array.tobytes())
+
+    def getvalue(self):
+        return b''.join(self.parts)
+
+
+class Reader:
+    def __init__(self, data, offset=0):
+        self.data = memoryview(data)
+        self.offset = offset
+
+    def record(self, dtype):
+        record = np.frombuffer(self.data, dtype=dtype, count=1, offset=self.offset)[0]
+        self.offset += dtype.itemsize
+        return record
+
+    def arrays(self, spec):
+        arrays = {}
+        for name, dtype in spec:
+            dtype = np.dtype(dtype)
+            (size,) = LENGTH.unpack_from(self.data, self.offset)
+            self.offset += LENGTH.size
+            # Copy so restored state is writable and independent of ``data``
+            arrays[name] = np.frombuffer(self.data, dtype=dtype, count=size, offset=self.offset).copy()
+            self.offset += size * dtype.itemsize
+        return arrays
+
+
+def snapshot(sim):
+    """Encode the complete state of ``sim`` as compact versioned bytes.
+
+    Everything ``step`` reads is included: ego car, vehicle stats, clock,
+    traffic cars, pedestrians, drivers and lights, weather mode and
+    particles, boost particles, and the state of every random stream. So a
+    restored simulation continues exactly as the original would have.
+    Particle pools only store the slots they have used. Streamed worlds
+    (``enable_world``), sensors (``enable_sensors``) and controllers are
+    not supported yet.
+    """
+    if sim.world is not None:
+        raise ValueError("snapshots of a streamed world are not supported")
+    if sim.sensors is not None:
+        raise ValueError("snapshots of a simulation with sensors are not supported")
+    if sim.controller is not None:
+        raise ValueError("snapshots of a simulation with a controller are not supported")
+    traffic, weather = sim.traffic, sim.weather
+    state = np.zeros((), dtype=STATE_DTYPE)
+    for name in ('width', 'height', 'car_x', 'prev_car_x', 'target_speed', 'current_speed', 'car_width',
+                 'car_height', 'car_angle', 'boost_mode', 'speed', 'battery', 'distance', 'safety_score',
+                 'cars_passed', 'red_light_stops', 'time_elapsed', 'is_running', 'ticks', 'clock'):
+        state[name] = getattr(sim, name)
+    state['stats_clock'] = sim._stats_clock
+    for name in ('is_raining', 'is_snowing', 'is_foggy', 'emission_rate'):
+        state[name] = getattr(weather, name)
+    state['time_of_day'] = TIMES.index(weather.time_of_day)
+    state['spawn_budget'] = weather._spawn_budget
+    state['engine'] = ENGINES.index(type(traffic))
+    for name in ('road_length', 'lanes', 'lane_changing', 'lane_changes', 'collisions_avoided'):
+        state[name] = getattr(traffic, name)
+    state['driver_mean'] = [traffic.driver_parameters[name][0] for name in DRIVER_FIELDS]
+    state['driver_sd'] = [traffic.driver_parameters[name][1] for name in DRIVER_FIELDS]
+
+    out = Writer()
+    out.parts.append(HEADER.pack(MAGIC, SNAPSHOT_VERSION))
+    out.record(state)
+    rngs = {'traffic': traffic.rng, 'weather': weather.rng, 'effects': sim.effects_rng, 'stars': sim.rngs['stars']}
+    for role in RNG_ROLES:
+        out.record(rng_record(rngs[role]))
+    out.arrays(traffic_arrays(traffic), TRAFFIC_ARRAYS)
+    out.arrays({name: getattr(traffic.signals, name) for name, _ in SIGNAL_ARRAYS}, SIGNAL_ARRAYS)
+    for particles in (weather.particles, sim.boost_particles):
+        header, arrays = particle_state(particles)
+        out.record(header)
+        out.arrays(arrays, PARTICLE_ARRAYS + (('free', '<i8'),))
+    return out.getvalue()
+
+
+def restore(data, reseed=None):
+    """Build a new Simulation from ``snapshot`` bytes.
+
+    With ``reseed``, every random stream is spawned fresh from that seed
+    instead of restored, so branches forked from one checkpoint share the
+    prefix but diverge afterwards.
+    """
+    magic, version = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("not a simulation snapshot")
+    if version != SNAPSHOT_VERSION:
+        raise ValueError(f"snapshot version {version} is not supported (expected {SNAPSHOT_VERSION})")
+    reader = Reader(data, HEADER.size)
+    state = reader.record(STATE_DTYPE)
+    rng_records = [reader.record(RNG_DTYPE) for _ in RNG_ROLES]
+    traffic_state = reader.arrays(TRAFFIC_ARRAYS)
+    signal_state = reader.arrays(SIGNAL_ARRAYS)
+    particle_systems = []
+    for _ in range(2):
+        header = reader.record(PARTICLE_DTYPE)
+        particle_systems.append(restore_particles(header, reader.arrays(PARTICLE_ARRAYS + (('free', '<i8'),))))
+
+    # Subsystems are created empty and filled in; constructors' random setup is bypassed
+    engine = ENGINES[int(state['engine'])]
+    traffic = engine.__new__(engine)
+    restore_traffic(traffic, state, traffic_state, signal_state)
+    weather = WeatherEffect.__new__(WeatherEffect)
+    weather.emission_rate = float(state['emission_rate'])
+    weather.particles = particle_systems[0]
+    weather.is_raining = bool(state['is_raining'])
+    weather.is_snowing = bool(state['is_snowing'])
+    weather.is_foggy = bool(state['is_foggy'])
+    weather.time_of_day = TIMES[int(state['time_of_day'])]
+    weather._spawn_budget = float(state['spawn_budget'])
+
+    sim = Simulation(traffic=traffic, weather=weather, width=int(state['width']), height=int(state['height']),
+                     seed=reseed)
+    if reseed is None:
+        for role, record in zip(RNG_ROLES, rng_records):
+            restore_rng(sim.rngs[role], record)
+    traffic.rng = sim.rngs['traffic']
+    weather.rng = sim.rngs['weather']
+    sim.boost_particles = particle_systems[1]
+    for name in ('car_x', 'prev_car_x', 'current_speed', 'car_width', 'car_height', 'car_angle',
+                 'battery', 'distance', 'safety_score', 'clock'):
+        setattr(sim, name, float(state[name]))
+    for name in ('target_speed', 'speed', 'cars_passed', 'red_light_stops', 'time_elapsed', 'ticks'):
+        setattr(sim, name, int(state[name]))
+    sim.boost_mode = bool(state['boost_mode'])
+    sim.is_running = bool(state['is_running'])
+    sim._stats_clock = float(state['stats_clock'])
+    return sim
+
+
+def restore_traffic(traffic, state, arrays, signal_arrays):
+    traffic.driver_parameters = {name: (float(mean), float(sd)) for name, mean, sd
+                                 in zip(DRIVER_FIELDS, state['driver_mean'], state['driver_sd'])}
+    traffic.drivers = {name: arrays[name] for name in DRIVER_FIELDS}
+    traffic.charge = arrays['charge']
+    traffic.lane_changing = bool(state['lane_changing'])
+    traffic.lane_changes = int(state['lane_changes'])
+    traffic.collisions_avoided = int(state['collisions_avoided'])
+    traffic.road_length = float(state['road_length'])
+    traffic.lanes = int(state['lanes'])
+    traffic.network = RoadNetwork.ring(traffic.road_length, traffic.lanes)
+
+    signals = traffic.signals = SignalController(traffic.road_length)
+    for name, _ in SIGNAL_ARRAYS:
+        setattr(signals, name, signal_arrays[name])
+
+    if isinstance(traffic, VectorizedTrafficSystem):
+        for name in ('car_x', 'car_speed', 'car_width', 'car_lane', 'ped_x', 'ped_speed'):
+            setattr(traffic, name, arrays[name])
+    else:
+        traffic.cars = [{'x': x, 'speed': speed, 'width': width, 'lane': lane}
+                        for x, speed, width, lane in zip(arrays['car_x'].tolist(), arrays['car_speed'].tolist(),
+                                                         arrays['car_width'].tolist(), arrays['car_lane'].tolist())]
+        traffic.pedestrians = [{'x': x, 'speed': speed}
+                               for x, speed in zip(arrays['ped_x'].tolist(), arrays['ped_speed'].tolist())]
+
+    # The index keeps its tie order, so the restored run sorts exactly like the original
+    traffic.index = LaneIndex(traffic.lanes, traffic.road_length)
+    traffic.index.perm = arrays['index_perm']
+    if traffic.index.perm.size:
+        traffic.index.update(*traffic.car_arrays())
+
+
+def fork(data, count, reseed=None):
+    # ``count`` independent simulations from one checkpoint; branch i reseeds from reseed + i
+    return [restore(data, None if reseed is None else reseed + i) for i in range(count)]
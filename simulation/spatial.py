@@ -0,0 +1,88 @@
+import numpy as np
+
+LANE_KEY_STRIDE = 1e9  # Separates lanes in the combined (lane, x) sort key
+
+
+class LaneIndex:
+    """Per-lane ordering of traffic cars by position on the ring road.
+
+    ``perm`` lists car indices sorted by (lane, x). Between ticks cars keep
+    their order except when they wrap at ``road_length`` or switch lanes,
+    so ``update`` re-sorts the previous permutation with a stable sort,
+    which is linear on nearly sorted input. Leaders and gaps then come out
+    of a single shift, and range queries are a binary search per lane.
+    """
+
+    def __init__(self, lanes=2, road_length=800):
+        self.lanes = lanes
+        self.road_length = road_length
+        self.perm = np.empty(0, dtype=np.int64)
+        self.sorted_x = np.empty(0, dtype=np.float64)
+        self.lane_start = np.zeros(lanes, dtype=np.int64)
+        self.lane_end = np.zeros(lanes, dtype=np.int64)
+        self.leader = np.empty(0, dtype=np.int64)
+        self.gap = np.empty(0, dtype=np.float64)
+
+    def __len__(self):
+        return self.perm.size
+
+    def update(self, x, lane, width):
+        n = len(x)
+        # Keep the previous order and append any cars added since
+        if n != self.perm.size:
+            self.perm = np.concatenate([self.perm, np.arange(self.perm.size, n, dtype=np.int64)])
+
+        # Stable re-sort of the old order by (lane, x)
+        key = lane[self.perm] * LANE_KEY_STRIDE + x[self.perm]
+        self.perm = self.perm[np.argsort(key, kind='stable')]
+        sorted_lane = lane[self.perm]
+        self.sorted_x = x[self.perm]
+        lane_ids = np.arange(self.lanes)
+        self.lane_start = np.searchsorted(sorted_lane, lane_ids, side='left')
+        self.lane_end = np.searchsorted(sorted_lane, lane_ids, side='right')
+
+        # Leader is the next car in the same lane; the last car follows the first around the ring
+        next_pos = np.arange(1, n + 1)
+        lane_of_pos = np.searchsorted(self.lane_end, np.arange(n), side='right')
+        at_end = next_pos == self.lane_end[lane_of_pos]
+        next_pos[at_end] = self.lane_start[lane_of_pos[at_end]]
+        leader_sorted = self.perm[next_pos]
+        sorted_width = width[self.perm]
+        gap = x[leader_sorted] - self.sorted_x - sorted_width
+        gap[at_end] += self.road_length + width[leader_sorted[at_end]]
+
+        # A car alone in its lane has no leader
+        alone = leader_sorted == self.perm
+        gap[alone] = np.inf
+        leader_sorted = np.where(alone, -1, leader_sorted)
+
+        self.leader = np.empty(n, dtype=np.int64)
+        self.leader[self.perm] = leader_sorted
+        self.gap = np.empty(n, dtype=np.float64)
+        self.gap[self.perm] = gap
+
+    def remove(self, keep):
+        # Forget the cars where ``keep`` is False, renumbering the rest in order;
+        # call ``update`` before the next query
+        new_id = np.cumsum(keep) - 1
+        self.perm = new_id[self.perm[keep[self.perm]]]
+
+    def leader_of(self, i):
+        return int(self.leader[i])
+
+    def between(self, lo, hi):
+        # Indices of the cars (all lanes) with lo < x <= hi, lane by lane
+        found = []
+        for start, end in zip(self.lane_start.tolist(), self.lane_end.tolist()):
+            lane_x = self.sorted_x[start:end]
+            first, last = np.searchsorted(lane_x, [lo, hi], side='right')
+            found.append(self.perm[start + first:start + last])
+        return np.concatenate(found) if found else np.empty(0, dtype=np.int64)
+
+    def count_between(self, lo, hi):
+        # Number of cars (all lanes) with lo < x <= hi
+        count = 0
+        for start, end in zip(self.lane_start.tolist(), self.lane_end.tolist()):
+            lane_x = self.sorted_x[start:end]
+            count += int(np.searchsorted(lane_x, hi, side='right') - np.searchsorted(lane_x, lo, side='right'))
+        return count
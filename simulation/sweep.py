@@ -0,0 +1,153 @@
+import argparse
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from simulation.core import Simulation
+from simulation.run import ENGINES
+from simulation.snapshot import restore, snapshot
+
+# Columns written for every episode, in file order
+RESULT_COLUMNS = (
+    'seed', 'traffic_cars', 'weather', 'time_of_day', 'speed', 'engine', 'ticks',
+    'distance', 'battery_drained', 'safety_score', 'collisions_avoided', 'cars_passed',
+    'wall_time', 'ticks_per_second',
+)
+
+
+def build_grid(seeds, traffic=(0,), weathers=("Clear",), times=("Day",), speeds=(60,),
+               engine='dict', ticks=3600):
+    # Cartesian product of the scenario parameters, one dict per episode
+    return [
+        {'seed': seed, 'traffic_cars': cars, 'weather': weather, 'time_of_day': time_of_day,
+         'speed': speed, 'engine': engine, 'ticks': ticks}
+        for seed, cars, weather, time_of_day, speed
+        in itertools.product(seeds, traffic, weathers, times, speeds)
+    ]
+
+
+def run_episode(params):
+    sim = Simulation(seed=params['seed'], traffic_engine=ENGINES[params['engine']])
+    return play(sim, params)
+
+
+def run_branch(params, checkpoint):
+    # Same scenario, continued from a shared checkpoint with this episode's seed
+    return play(restore(checkpoint, reseed=params['seed']), params)
+
+
+def build_checkpoint(seed, engine, ticks, speed=60):
+    # Shared prefix for branched sweeps: a plain run of ``ticks`` ticks
+    sim = Simulation(seed=seed, traffic_engine=ENGINES[engine])
+    sim.is_running = True
+    sim.set_speed(speed)
+    for _ in range(ticks):
+        sim.step()
+    return snapshot(sim)
+
+
+def play(sim, params):
+    sim.traffic.add_traffic_cars(params['traffic_cars'])
+    sim.change_weather(params['weather'])
+    sim.change_time(params['time_of_day'])
+    sim.is_running = True
+    sim.set_speed(params['speed'])
+
+    start = time.perf_counter()
+    for _ in range(params['ticks']):
+        sim.step()
+    wall_time = time.perf_counter() - start
+
+    result = dict(params)
+    result.update({
+        'distance': sim.distance,
+        'battery_drained': 100 - sim.battery,
+        'safety_score': sim.safety_score,
+        'collisions_avoided': sim.traffic.collisions_avoided,
+        'cars_passed': sim.cars_passed,
+        'wall_time': wall_time,
+        'ticks_per_second': params['ticks'] / wall_time if wall_time > 0 else float('inf'),
+    })
+    return result
+
+
+def run_sweep(grid, workers=None, checkpoint=None):
+    """Run every episode in ``grid`` across a process pool.
+
+    Yields result dicts in completion order, so callers can report or
+    store them while the rest of the sweep is still running. With a
+    ``checkpoint`` (snapshot bytes), every episode branches from it
+    instead of starting from scratch.
+    """
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        if checkpoint is None:
+            futures = [pool.submit(run_episode, params) for params in grid]
+        else:
+            futures = [pool.submit(run_branch, params, checkpoint) for params in grid]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def write_results(results, path):
+    # One array per column; load with load_results() or np.load()
+    columns = {name: np.asarray([result[name] for result in results]) for name in RESULT_COLUMNS}
+    with open(path, 'wb') as f:
+        np.savez(f, **columns)
+
+
+def load_results(path):
+    import pandas as pd
+
+    with np.load(path) as data:
+        return pd.DataFrame({name: data[name] for name in data.files})
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run headless scenario sweeps across all cores.")
+    parser.add_argument('--seeds', type=int, default=10, help="number of seeds per scenario")
+    parser.add_argument('--seed-start', type=int, default=0, help="first seed")
+    parser.add_argument('--cars', type=int, nargs='+', default=[0], help="extra traffic car counts")
+    parser.add_argument('--weather', nargs='+', choices=["Clear", "Rain", "Snow", "Fog"], default=["Clear"])
+    parser.add_argument('--time', nargs='+', choices=["Day", "Night", "Sunset"], default=["Day"])
+    parser.add_argument('--speed', type=int, nargs='+', default=[60], help="ego cruise speeds in km/h")
+    parser.add_argument('--engine', choices=sorted(ENGINES), default='vectorized', help="traffic engine")
+    parser.add_argument('--ticks', type=int, default=3600, help="ticks per episode")
+    parser.add_argument('--branch-after', type=int, default=0,
+                        help="run this many ticks once and branch every episode from the snapshot")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument('--output', default='sweep_results.npz', help="columnar result file")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    grid = build_grid(range(args.seed_start, args.seed_start + args.seeds), args.cars,
+                      args.weather, args.time, args.speed, args.engine, args.ticks)
+
+    checkpoint = None
+    if args.branch_after:
+        checkpoint = build_checkpoint(args.seed_start, args.engine, args.branch_after)
+        print(f"checkpoint: {args.branch_after} ticks, {len(checkpoint)} bytes")
+
+    results = []
+    start = time.perf_counter()
+    for result in run_sweep(grid, args.workers, checkpoint):
+        results.append(result)
+        print(f"[{len(results)}/{len(grid)}] seed={result['seed']} cars={result['traffic_cars']} "
+              f"weather={result['weather']} time={result['time_of_day']} "
+              f"distance={result['distance']:.1f} safety={result['safety_score']:.1f} "
+              f"tps={result['ticks_per_second']:.0f}", flush=True)
+    elapsed = time.perf_counter() - start
+
+    write_results(results, args.output)
+    total_ticks = sum(result['ticks'] for result in results)
+    print(f"episodes: {len(results)}")
+    print(f"elapsed: {elapsed:.2f} s")
+    print(f"episodes_per_second: {len(results) / elapsed:.2f}")
+    print(f"aggregate_ticks_per_second: {total_ticks / elapsed:.0f}")
+    print(f"results: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,461 @@
+import numpy as np
+from simulation.idm import (DRIVER_PARAMETERS, append_drivers, draw_drivers, empty_drivers,
+                            following_acceleration, mobil_lane_changes)
+from simulation.network import RoadNetwork
+from simulation.scheduler import FIXED_DT, ticks_for
+from simulation.signals import SignalController
+from simulation.spatial import LaneIndex
+
+MIN_GAP = 10  # Closest a traffic car follows the car ahead in its lane
+
+
+def place_traffic_lights(signals, count, rng, plan='fixed'):
+    # Evenly spaced lights, each with its own green and red time
+    spacing = signals.road_length / (count + 1)
+    x = (spacing * np.arange(1, count + 1)).astype(np.int64)
+    green_time = rng.integers(50, 151, size=count)
+    red_time = rng.integers(50, 151, size=count)
+    signals.add(x, green_time, red_time, plan)
+
+
+def update_signals(signals, front, new_front, ticks):
+    # Queue and throughput from this tick's movement, then advance the lights
+    stopped = np.abs(new_front - front) <= 0.1 * ticks
+    signals.record(front, new_front, stopped)
+    signals.update(ticks, signals.demand(new_front))
+
+
+def entering_cars(x, lane, width, wrapped, new_lane, lanes, road_length):
+    # Which wrapped cars may start over at x = -width in their new lane. On the ring
+    # that spot is also the end of the road, so the lane's first car must be MIN_GAP
+    # past the entry, its last car MIN_GAP short of the end, and no other wrapped
+    # car may be waiting there; a lane takes one car a tick
+    staying = np.ones(x.size, dtype=bool)
+    staying[wrapped] = False
+    first = np.full(lanes, np.inf)
+    np.minimum.at(first, lane[staying], x[staying])
+    last = np.full(lanes, -np.inf)
+    np.maximum.at(last, lane[staying], (x + width)[staying])
+    old_lane = lane[wrapped]
+    waiting = np.bincount(old_lane, minlength=lanes)[new_lane] - (old_lane == new_lane)
+    enters = np.zeros(wrapped.size, dtype=bool)
+    enters[np.unique(new_lane, return_index=True)[1]] = True
+    return enters & (first[new_lane] >= MIN_GAP) & (last[new_lane] <= road_length - MIN_GAP) & (waiting == 0)
+
+
+class TrafficSystem:
+    def __init__(self, rng=None, network=None, driver_parameters=DRIVER_PARAMETERS, lane_changing=False):
+        self.rng = rng if rng is not None else np.random.default_rng()
+        # Cars follow the Intelligent Driver Model; each driver draws its own
+        # parameters, kept in arrays parallel to self.cars
+        self.driver_parameters = driver_parameters
+        self.drivers = empty_drivers()
+        self.charge = np.empty(0, dtype=np.float64)  # Battery percent per car, parallel to self.cars
+        self.lane_changing = lane_changing  # MOBIL lane changes each tick
+        self.lane_changes = 0
+        # The strip is a one-edge network: a looping road as long as the screen.
+        # Only that edge's length and lanes are read; routed traffic over a
+        # whole network is NetworkTraffic's job
+        self.network = network if network is not None else RoadNetwork.ring()
+        if self.network.edges != 1:
+            raise ValueError("the strip engines drive a one-edge network; use NetworkTraffic for more")
+        self.road_length = float(self.network.edge_length[0])
+        self.lanes = int(self.network.edge_lanes[0])
+        self.cars = []
+        self.pedestrians = []
+        self.signals = SignalController(self.road_length)
+        self.index = LaneIndex(self.lanes, self.road_length)
+        self.collisions_avoided = 0  # Moves held back to avoid hitting the main car
+
+        # Initialize some traffic
+        self.add_traffic_cars(3)
+        self.add_pedestrians(2)
+        self.add_traffic_lights(2)
+
+    @property
+    def traffic_lights(self):
+        return self.signals.lights
+
+    def check_collision(self, x1, w1, x2, w2):
+        # Check if two objects overlap horizontally
+        return (x1 < x2 + w2) and (x1 + w1 > x2)
+
+    def add_traffic_cars(self, count):
+        xs = self.rng.integers(100, 701, size=count).tolist()
+        speeds = self.rng.uniform(1, 2, size=count).tolist()
+        lanes = self.rng.integers(0, self.lanes, size=count).tolist()
+        for x, speed, lane in zip(xs, speeds, lanes):
+            self.cars.append({
+                'x': x,
+                'speed': speed,
+                'width': 40,  # Car width
+                'lane': lane  # 0 for top lane, 1 for bottom lane on the default road
+            })
+        self.drivers = append_drivers(self.drivers, draw_drivers(self.rng, count, self.driver_parameters))
+        self.charge = np.concatenate([self.charge, np.full(count, 100.0)])
+
+    def add_pedestrians(self, count):
+        xs = self.rng.integers(100, 701, size=count).tolist()
+        speeds = self.rng.uniform(0.5, 1, size=count).tolist()
+        for x, speed in zip(xs, speeds):
+            self.pedestrians.append({'x': x, 'speed': speed})
+
+    def add_traffic_lights(self, count, plan='fixed'):
+        place_traffic_lights(self.signals, count, self.rng, plan)
+
+    def insert_cars(self, x, lane, speed):
+        # Cars at given positions, with freshly drawn drivers
+        for car_x, car_lane, car_speed in zip(np.asarray(x, dtype=np.float64).tolist(),
+                                              np.asarray(lane).tolist(), np.asarray(speed).tolist()):
+            self.cars.append({'x': car_x, 'speed': car_speed, 'width': 40, 'lane': car_lane})
+        self.drivers = append_drivers(self.drivers, draw_drivers(self.rng, len(x), self.driver_parameters))
+        self.charge = np.concatenate([self.charge, np.full(len(x), 100.0)])
+
+    def keep_cars(self, keep):
+        # Drop the cars where ``keep`` is False; the rest keep their order
+        self.cars = [car for car, kept in zip(self.cars, keep.tolist()) if kept]
+        self.drivers = {name: values[keep] for name, values in self.drivers.items()}
+        self.charge = self.charge[keep]
+        self.index.remove(keep)
+        self.refresh_index()
+
+    def hold_cars(self, which, x):
+        # Stop the cars at indices ``which`` at position ``x`` (one, or one per car)
+        which = np.asarray(which)
+        for i, car_x in zip(which.tolist(), np.broadcast_to(x, which.shape).tolist()):
+            self.cars[i]['x'] = car_x
+            self.cars[i]['speed'] = 0.0
+
+    def insert_pedestrians(self, x, speed):
+        for ped_x, ped_speed in zip(np.asarray(x, dtype=np.float64).tolist(), np.asarray(speed).tolist()):
+            self.pedestrians.append({'x': ped_x, 'speed': ped_speed})
+
+    def keep_pedestrians(self, keep):
+        self.pedestrians = [ped for ped, kept in zip(self.pedestrians, keep.tolist()) if kept]
+
+    def shift(self, dx):
+        # Move cars, pedestrians and stop lines by ``dx`` (the road scrolled)
+        for item in self.cars + self.pedestrians:
+            item['x'] += dx
+        self.signals.x += dx
+        self.refresh_index()
+
+    def car_arrays(self):
+        # (x, lane, width) as arrays, the layout VectorizedTrafficSystem stores natively
+        count = len(self.cars)
+        return (np.fromiter((car['x'] for car in self.cars), np.float64, count),
+                np.fromiter((car['lane'] for car in self.cars), np.int64, count),
+                np.fromiter((car['width'] for car in self.cars), np.float64, count))
+
+    def pedestrian_arrays(self):
+        return np.fromiter((ped['x'] for ped in self.pedestrians), np.float64, len(self.pedestrians))
+
+    def car_speeds(self):
+        return np.fromiter((car['speed'] for car in self.cars), np.float64, len(self.cars))
+
+    def pedestrian_speeds(self):
+        return np.fromiter((ped['speed'] for ped in self.pedestrians), np.float64, len(self.pedestrians))
+
+    def refresh_index(self):
+        self.index.update(*self.car_arrays())
+
+    def count_cars_between(self, lo, hi):
+        # Cars (any lane) with lo < x <= hi
+        if len(self.index) != len(self.cars):
+            self.refresh_index()
+        return self.index.count_between(lo, hi)
+
+    def cars_between(self, lo, hi):
+        # Indices of the cars (any lane) with lo < x <= hi, as of the last index refresh
+        if len(self.index) != len(self.cars):
+            self.refresh_index()
+        return self.index.between(lo, hi)
+
+    def following(self):
+        # (gap, leader) of every car in its lane, as the IDM sees them
+        if len(self.index) != len(self.cars):
+            self.refresh_index()
+        return self.index.gap, self.index.leader
+
+    def update(self, main_car_x=0, main_car_width=60, dt=FIXED_DT, acceleration=None):
+        # Speeds are in pixels per reference tick; scale them to dt
+        ticks = ticks_for(dt)
+        if len(self.index) != len(self.cars):
+            self.refresh_index()
+        # IDM accelerations for every car at once (leader, red light, main car);
+        # a controller's ``acceleration`` replaces them wherever it isn't NaN
+        x, lane, width = self.car_arrays()
+        speed = self.car_speeds()
+        front = x + width
+        stop = self.signals.stop_distance(front)
+        acc, static = following_acceleration(speed, self.index, self.drivers, stop, front, main_car_x)
+        if acceleration is not None:
+            acc = np.where(np.isnan(acceleration), acc, acceleration)
+        new_speed = np.maximum(speed + acc * ticks, 0).tolist()
+        new_lanes = None
+        if self.lane_changing:
+            new_lanes = mobil_lane_changes(x, speed, width, lane, self.index, self.drivers, acc, static)
+            self.lane_changes += int(np.count_nonzero(new_lanes != lane))
+            new_lanes = new_lanes.tolist()
+
+        # Room ahead: the leader or the next red stop line, whichever is closer
+        room = np.minimum(np.maximum(self.index.gap - MIN_GAP, 0), stop).tolist()
+
+        # Update traffic cars
+        wrapped = []
+        for i, (car, speed, max_step) in enumerate(zip(self.cars, new_speed, room)):
+            # Store old position for collision check
+            old_x = car['x']
+
+            # Update position, without closing in on the car ahead or running a red light
+            step = min(speed * ticks, max_step)
+            car['x'] += step
+
+            # Check collision with main car
+            if self.check_collision(car['x'], car['width'], main_car_x, main_car_width):
+                # If collision would occur, revert to old position and stop
+                car['x'] = old_x
+                car['speed'] = 0.0
+                self.collisions_avoided += 1
+            else:
+                car['speed'] = min(speed, step / ticks)  # No faster than the room allowed
+
+            if new_lanes is not None:
+                car['lane'] = new_lanes[i]
+
+            if car['x'] > self.road_length:
+                wrapped.append(i)
+
+        # Cars off screen draw new lanes in one batch and start over where there is
+        # room; the rest wait at the end of the road
+        if wrapped:
+            new_lane = self.rng.integers(0, self.lanes, size=len(wrapped))
+            x, lane, width = self.car_arrays()
+            enters = entering_cars(x, lane, width, np.array(wrapped), new_lane, self.lanes, self.road_length)
+            for i, car_lane, entered in zip(wrapped, new_lane.tolist(), enters.tolist()):
+                car = self.cars[i]
+                if entered:
+                    car['x'] = -car['width']
+                    car['lane'] = car_lane
+                else:
+                    car['x'] = self.road_length
+                    car['speed'] = 0.0
+
+        new_front = self.car_arrays()[0] + width
+
+        # Update pedestrians
+        for ped in self.pedestrians:
+            ped['x'] += ped['speed'] * ticks
+            if ped['x'] > self.road_length:
+                ped['x'] = 0
+
+        self.refresh_index()
+
+        # Update traffic lights
+        update_signals(self.signals, front, new_front, ticks)
+
+
+class VectorizedTrafficSystem:
+    """Struct-of-arrays drop-in for TrafficSystem.
+
+    Cars and pedestrians live in contiguous NumPy arrays and a tick is a
+    handful of array operations. Random draws happen in the same order as
+    in TrafficSystem, so both engines produce identical runs from
+    identically seeded generators.
+    """
+
+    def __init__(self, rng=None, network=None, driver_parameters=DRIVER_PARAMETERS, lane_changing=False):
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.driver_parameters = driver_parameters
+        self.drivers = empty_drivers()
+        self.charge = np.empty(0, dtype=np.float64)
+        self.lane_changing = lane_changing
+        self.lane_changes = 0
+        self.network = network if network is not None else RoadNetwork.ring()  # One edge, as in TrafficSystem
+        if self.network.edges != 1:
+            raise ValueError("the strip engines drive a one-edge network; use NetworkTraffic for more")
+        self.road_length = float(self.network.edge_length[0])
+        self.lanes = int(self.network.edge_lanes[0])
+        self.car_x = np.empty(0, dtype=np.float64)
+        self.car_speed = np.empty(0, dtype=np.float64)
+        self.car_width = np.empty(0, dtype=np.float64)
+        self.car_lane = np.empty(0, dtype=np.int64)
+        self.ped_x = np.empty(0, dtype=np.float64)
+        self.ped_speed = np.empty(0, dtype=np.float64)
+        self.signals = SignalController(self.road_length)
+        self.index = LaneIndex(self.lanes, self.road_length)
+        self.collisions_avoided = 0  # Moves held back to avoid hitting the main car
+
+        # Initialize some traffic
+        self.add_traffic_cars(3)
+        self.add_pedestrians(2)
+        self.add_traffic_lights(2)
+
+    @property
+    def cars(self):
+        # Dict view for code written against TrafficSystem (a copy, not live)
+        return [
+            {'x': x, 'speed': speed, 'width': width, 'lane': lane}
+            for x, speed, width, lane in zip(self.car_x.tolist(), self.car_speed.tolist(),
+                                             self.car_width.tolist(), self.car_lane.tolist())
+        ]
+
+    @property
+    def pedestrians(self):
+        return [{'x': x, 'speed': speed}
+                for x, speed in zip(self.ped_x.tolist(), self.ped_speed.tolist())]
+
+    @property
+    def traffic_lights(self):
+        return self.signals.lights
+
+    def check_collision(self, x1, w1, x2, w2):
+        # Element-wise horizontal overlap test, works on arrays and scalars
+        return (x1 < x2 + w2) & (x1 + w1 > x2)
+
+    def add_traffic_cars(self, count):
+        # Same draw order as TrafficSystem.add_traffic_cars
+        x = self.rng.integers(100, 701, size=count)
+        speed = self.rng.uniform(1, 2, size=count)
+        lane = self.rng.integers(0, self.lanes, size=count)
+        self.car_x = np.concatenate([self.car_x, x.astype(np.float64)])
+        self.car_speed = np.concatenate([self.car_speed, speed])
+        self.car_width = np.concatenate([self.car_width, np.full(count, 40.0)])
+        self.car_lane = np.concatenate([self.car_lane, lane.astype(np.int64)])
+        self.drivers = append_drivers(self.drivers, draw_drivers(self.rng, count, self.driver_parameters))
+        self.charge = np.concatenate([self.charge, np.full(count, 100.0)])
+
+    def add_pedestrians(self, count):
+        x = self.rng.integers(100, 701, size=count)
+        speed = self.rng.uniform(0.5, 1, size=count)
+        self.ped_x = np.concatenate([self.ped_x, x.astype(np.float64)])
+        self.ped_speed = np.concatenate([self.ped_speed, speed])
+
+    def add_traffic_lights(self, count, plan='fixed'):
+        place_traffic_lights(self.signals, count, self.rng, plan)
+
+    def insert_cars(self, x, lane, speed):
+        count = len(x)
+        self.car_x = np.concatenate([self.car_x, np.asarray(x, dtype=np.float64)])
+        self.car_speed = np.concatenate([self.car_speed, np.asarray(speed, dtype=np.float64)])
+        self.car_width = np.concatenate([self.car_width, np.full(count, 40.0)])
+        self.car_lane = np.concatenate([self.car_lane, np.asarray(lane, dtype=np.int64)])
+        self.drivers = append_drivers(self.drivers, draw_drivers(self.rng, count, self.driver_parameters))
+        self.charge = np.concatenate([self.charge, np.full(count, 100.0)])
+
+    def keep_cars(self, keep):
+        self.car_x = self.car_x[keep]
+        self.car_speed = self.car_speed[keep]
+        self.car_width = self.car_width[keep]
+        self.car_lane = self.car_lane[keep]
+        self.drivers = {name: values[keep] for name, values in self.drivers.items()}
+        self.charge = self.charge[keep]
+        self.index.remove(keep)
+        self.refresh_index()
+
+    def hold_cars(self, which, x):
+        self.car_x[which] = x
+        self.car_speed[which] = 0.0
+
+    def insert_pedestrians(self, x, speed):
+        self.ped_x = np.concatenate([self.ped_x, np.asarray(x, dtype=np.float64)])
+        self.ped_speed = np.concatenate([self.ped_speed, np.asarray(speed, dtype=np.float64)])
+
+    def keep_pedestrians(self, keep):
+        self.ped_x = self.ped_x[keep]
+        self.ped_speed = self.ped_speed[keep]
+
+    def shift(self, dx):
+        self.car_x += dx
+        self.ped_x += dx
+        self.signals.x += dx
+        self.refresh_index()
+
+    def car_arrays(self):
+        return self.car_x, self.car_lane, self.car_width
+
+    def pedestrian_arrays(self):
+        return self.ped_x
+
+    def car_speeds(self):
+        return self.car_speed
+
+    def pedestrian_speeds(self):
+        return self.ped_speed
+
+    def refresh_index(self):
+        self.index.update(self.car_x, self.car_lane, self.car_width)
+
+    def count_cars_between(self, lo, hi):
+        # Cars (any lane) with lo < x <= hi
+        if len(self.index) != self.car_x.size:
+            self.refresh_index()
+        return self.index.count_between(lo, hi)
+
+    def cars_between(self, lo, hi):
+        # Indices of the cars (any lane) with lo < x <= hi, as of the last index refresh
+        if len(self.index) != self.car_x.size:
+            self.refresh_index()
+        return self.index.between(lo, hi)
+
+    def following(self):
+        # (gap, leader) of every car in its lane, as the IDM sees them
+        if len(self.index) != self.car_x.size:
+            self.refresh_index()
+        return self.index.gap, self.index.leader
+
+    def update(self, main_car_x=0, main_car_width=60, dt=FIXED_DT, acceleration=None):
+        # Speeds are in pixels per reference tick; scale them to dt
+        ticks = ticks_for(dt)
+        if len(self.index) != self.car_x.size:
+            self.refresh_index()
+
+        # IDM accelerations for every car at once (leader, red light, main car),
+        # unless a controller's ``acceleration`` (not NaN) replaces them
+        front = self.car_x + self.car_width
+        stop = self.signals.stop_distance(front)
+        acc, static = following_acceleration(self.car_speed, self.index, self.drivers, stop, front, main_car_x)
+        if acceleration is not None:
+            acc = np.where(np.isnan(acceleration), acc, acceleration)
+        speed = np.maximum(self.car_speed + acc * ticks, 0)
+        new_lane = None
+        if self.lane_changing:
+            new_lane = mobil_lane_changes(self.car_x, self.car_speed, self.car_width, self.car_lane,
+                                          self.index, self.drivers, acc, static)
+
+        # Move every car without closing in on its leader or running a red
+        # light, then revert the ones that would hit the main car
+        room = np.minimum(np.maximum(self.index.gap - MIN_GAP, 0), stop)
+        step = np.minimum(speed * ticks, room)
+        new_x = self.car_x + step
+        blocked = self.check_collision(new_x, self.car_width, main_car_x, main_car_width)
+        np.copyto(self.car_x, new_x, where=~blocked)
+        self.collisions_avoided += int(np.count_nonzero(blocked))
+        # Blocked cars stop; the rest go no faster than the room allowed
+        self.car_speed = np.where(blocked, 0.0, np.minimum(speed, step / ticks))
+        if new_lane is not None:
+            self.lane_changes += int(np.count_nonzero(new_lane != self.car_lane))
+            self.car_lane = new_lane
+
+        # Cars that left the screen draw new lanes in one batch and start over
+        # where there is room; the rest wait at the end of the road
+        wrapped = np.flatnonzero(self.car_x > self.road_length)
+        if wrapped.size:
+            new_lane = self.rng.integers(0, self.lanes, size=wrapped.size)
+            enters = entering_cars(self.car_x, self.car_lane, self.car_width, wrapped, new_lane,
+                                   self.lanes, self.road_length)
+            entered, held = wrapped[enters], wrapped[~enters]
+            self.car_x[entered] = -self.car_width[entered]
+            self.car_lane[entered] = new_lane[enters]
+            self.car_x[held] = self.road_length
+            self.car_speed[held] = 0.0
+        new_front = self.car_x + self.car_width
+
+        # Update pedestrians
+        self.ped_x += self.ped_speed * ticks
+        self.ped_x[self.ped_x > self.road_length] = 0
+
+        self.refresh_index()
+
+        # Update traffic lights
+        update_signals(self.signals, front, new_front, ticks)
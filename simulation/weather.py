@@ -0,0 +1,54 @@
+import numpy as np
+from simulation.particles import ParticleSystem
+from simulation.scheduler import FIXED_DT, ticks_for
+
+EMISSION_RATE = 5  # Rain/snow particles spawned per reference tick
+PARTICLE_CAPACITY = 65536
+
+
+class WeatherEffect:
+    def __init__(self, rng=None, emission_rate=EMISSION_RATE, capacity=PARTICLE_CAPACITY, width=800, height=600):
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.emission_rate = emission_rate
+        # Drops fall straight down and expire below the bottom of the screen
+        self.width = width
+        self.height = height
+        self.particles = ParticleSystem(capacity, bounds=(-np.inf, -np.inf, np.inf, height))
+        self.is_raining = False
+        self.is_snowing = False
+        self.is_foggy = False
+        self.time_of_day = "day"  # day, night, sunset
+        self._spawn_budget = 0.0
+
+    @property
+    def raindrops(self):
+        # Live particles as rows of [x, y, speed]
+        live = self.particles.live()
+        return np.column_stack((self.particles.x[live], self.particles.y[live], self.particles.vy[live]))
+
+    def resize(self, width, height):
+        # Weather is drawn in screen space: spawn across the view, expire below it
+        self.width = width
+        self.height = height
+        self.particles.bounds = (-np.inf, -np.inf, np.inf, height)
+
+    def set_density(self, emission_rate, capacity=None):
+        # Heavier storms: more particles per tick, optionally a bigger pool
+        self.emission_rate = emission_rate
+        if capacity is not None and capacity != self.particles.capacity:
+            self.particles = ParticleSystem(capacity, bounds=self.particles.bounds)
+
+    def update(self, dt=FIXED_DT):
+        ticks = ticks_for(dt)
+        if self.is_raining or self.is_snowing:
+            # Add new particles (fractions carried over to the next tick)
+            self._spawn_budget += self.emission_rate * ticks
+            count = int(self._spawn_budget)
+            self._spawn_budget -= count
+            if count:
+                self.particles.emit(self.rng.integers(0, self.width + 1, size=count),
+                                    self.rng.integers(0, self.height + 1, size=count),
+                                    vy=self.rng.uniform(5, 10, size=count))
+
+        # Move every particle down and expire the ones that left the screen
+        self.particles.update(ticks)
@@ -0,0 +1,99 @@
+import queue
+import threading
+import time
+from simulation.frames import SimulationFrame
+from simulation.scheduler import MAX_STEPS_PER_FRAME, PHYSICS_RATE, FixedStepScheduler
+
+
+class FrameBuffer:
+    """Double-buffered handoff of immutable frames from one writer thread.
+
+    The writer builds each frame off to the side (the back buffer) and
+    publishes it with a single reference assignment, which is atomic, so
+    readers calling ``latest()`` never lock and never see a frame being
+    built. A reader keeps whatever frame it took for as long as it needs
+    it; frames are never modified after they are published. Once the
+    writer has ``fail``ed, every read raises its error.
+    """
+
+    def __init__(self):
+        self.front = None
+        self.published = 0  # Frames published so far
+        self.error = None
+
+    def publish(self, frame):
+        self.front = frame
+        self.published += 1
+
+    def fail(self, error):
+        self.error = error
+
+    def latest(self):
+        if self.error is not None:
+            raise self.error
+        return self.front
+
+
+class SimulationWorker:
+    """Steps a Simulation on its own thread at a fixed rate.
+
+    ``step(dt)`` (by default ``sim.step``) runs only on the worker
+    thread, from a FixedStepScheduler fed with real elapsed time. After
+    every batch of steps, a SimulationFrame is published to ``frames``.
+    Anything that changes the simulation from another thread, such as key
+    presses or button clicks, goes through ``submit(fn, *args)``. The call
+    is queued and runs on the worker thread between steps, so the
+    simulation is never touched by two threads at once. If stepping
+    raises, the worker stops and the error comes out of the next
+    ``frames.latest()`` (and ``stop()``).
+    """
+
+    def __init__(self, sim, step=None, rate=PHYSICS_RATE, max_steps_per_frame=MAX_STEPS_PER_FRAME):
+        self.sim = sim
+        self.scheduler = FixedStepScheduler(step or sim.step, rate, max_steps_per_frame)
+        self.commands = queue.SimpleQueue()
+        self.frames = FrameBuffer()
+        self.stopping = threading.Event()
+        self.thread = threading.Thread(target=self.run, name="simulation-worker", daemon=True)
+        self.error = None
+        self.frames.publish(SimulationFrame(sim))
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopping.set()
+        if self.thread.is_alive():
+            self.thread.join()
+        if self.error is not None:
+            raise self.error
+
+    def submit(self, fn, *args):
+        self.commands.put((fn, args))
+
+    def run_commands(self):
+        ran = False
+        while True:
+            try:
+                fn, args = self.commands.get_nowait()
+            except queue.Empty:
+                return ran
+            fn(*args)
+            ran = True
+
+    def run(self):
+        scheduler = self.scheduler
+        last = time.perf_counter()
+        try:
+            while not self.stopping.is_set():
+                changed = self.run_commands()
+                now = time.perf_counter()
+                steps = scheduler.advance(now - last)
+                last = now
+                if steps or changed:
+                    self.frames.publish(SimulationFrame(self.sim, scheduler.alpha))
+                # Sleep until the next step is due
+                self.stopping.wait(max(0.0, scheduler.dt - scheduler.accumulator))
+        except Exception as error:
+            self.error = error
+            self.frames.fail(error)
@@ -0,0 +1,259 @@
+import numpy as np
+from simulation.ctm import CELL_LENGTH, CellTransmissionModel
+from simulation.profiler import FrameProfiler
+from simulation.scheduler import FIXED_DT, ticks_for
+from simulation.traffic import MIN_GAP
+
+SEGMENT_LENGTH = 800  # One default screen of road per segment
+NEAR_SEGMENTS = 3  # Simulated car by car: the camera's segment and the two past it
+FAR_SEGMENTS = 8  # Further ahead, simulated as cell densities
+CARS_PER_SEGMENT = 3.0  # Mean traffic cars per segment, both lanes
+PEDESTRIANS_PER_SEGMENT = 1.0
+OPEN_ROAD = 1e7  # Ring length the traffic engine sees, so nothing ever wraps
+CAMERA_LEAD = 200  # Ego car distance from the left edge of the view
+COUNT, CONTENTS = 0, 1  # Per-segment random streams
+
+
+class Camera:
+    """A ``width``-pixel window onto the road; ``x`` is its left edge in world coordinates.
+
+    Without a World the camera never moves and world coordinates are
+    screen coordinates.
+    """
+
+    def __init__(self, width=800, lead=CAMERA_LEAD):
+        self.width = width
+        self.lead = lead
+        self.x = 0.0
+        self.prev_x = 0.0  # Position before the last step, for interpolated drawing
+
+    def follow(self, target_x):
+        # Keep the target ``lead`` pixels from the left edge; never scroll back
+        self.prev_x = self.x
+        self.x = max(self.x, target_x - self.lead)
+
+    def interpolated_x(self, alpha):
+        return self.prev_x + (self.x - self.prev_x) * alpha
+
+    def project(self, x, width, origin=0.0, alpha=1.0):
+        # Screen x of objects at engine-local ``x`` (world ``x + origin``), and which are in view
+        screen_x = x + (origin - self.interpolated_x(alpha))
+        return screen_x, (screen_x + width >= 0) & (screen_x <= self.width)
+
+
+class World:
+    """Unbounded straight road, streamed in fixed-length segments at two levels of detail.
+
+    The microscopic tier is the traffic engine. It holds only the ``near``
+    segments from ``origin`` (the world x of the engine's local 0). Those
+    are simulated car by car, in local coordinates, on a road long enough
+    that nothing wraps. The macroscopic tier covers the ``far`` segments
+    beyond them: a CellTransmissionModel in ``macro`` with
+    ``CELL_LENGTH`` cells. It can hold hundreds of thousands of cars for
+    the cost of a few array operations.
+
+    Cars cross between the tiers at their shared boundary. A car that
+    drives past the last near segment becomes one car of inflow to the
+    first cell. Once the camera's left edge moves into the second segment,
+    the first is dropped and the engine shifts back by a segment. The
+    first macroscopic segment is then materialized car by car, at its
+    cells' equilibrium speeds. Whole cars are taken by cumulative
+    rounding, and the fraction left over carries to the next segment, so
+    no car is created or lost at the boundary. Memory and work per tick
+    depend on the segment counts, not on the distance driven.
+
+    ``tiers`` is a FrameProfiler with ``micro``, ``macro`` and
+    ``convert`` stages. ``stats()`` reports the cars in each tier and what
+    each tier cost per tick.
+
+    Segment contents (starting density, lights, pedestrians, car
+    placement) come from generators keyed by segment number. The road
+    ahead is therefore the same for a given seed, whenever it is
+    generated.
+    """
+
+    def __init__(self, traffic, seed=None, segment_length=SEGMENT_LENGTH, near=NEAR_SEGMENTS,
+                 far=FAR_SEGMENTS, cars_per_segment=CARS_PER_SEGMENT, cell_length=CELL_LENGTH):
+        self.traffic = traffic
+        self.seed = np.random.SeedSequence(seed).entropy
+        self.segment_length = float(segment_length)
+        self.near = near
+        self.far = far
+        self.cars_per_segment = cars_per_segment
+        self.cells_per_segment = max(1, int(round(segment_length / cell_length)))
+        self.macro = CellTransmissionModel(far * self.cells_per_segment, traffic.lanes,
+                                           self.segment_length / self.cells_per_segment,
+                                           traffic.driver_parameters)
+        self.tiers = FrameProfiler(enabled=True)
+        self.first = 0  # Number of the segment at the origin
+        self.origin = 0.0
+        self.carry = 0.0  # Fraction of a car not yet materialized
+        self.admit_budget = 0.0  # Cars the first cell has room for, built up tick by tick
+        self.entry_budget = 0.0  # Fraction of a car due to enter behind the near segments
+
+        # Car flows, for checking that the tiers conserve cars
+        self.cars_spawned = 0  # Generated with new segments
+        self.cars_entered = 0  # Arrived from behind the near segments
+        self.cars_dropped = 0  # Left behind the camera
+        self.cars_added = 0  # Put on the road from outside the world, e.g. by add_traffic_cars
+        self.to_macro = 0  # Microscopic cars absorbed into the first cell
+        self.to_micro = 0  # Cars materialized from cells
+
+        # Open the engine's road up and replace its starting traffic with the first segments
+        traffic.road_length = traffic.index.road_length = traffic.signals.road_length = OPEN_ROAD
+        traffic.keep_cars(np.zeros(len(traffic.car_arrays()[0]), dtype=bool))
+        traffic.keep_pedestrians(np.zeros(len(traffic.pedestrian_arrays()), dtype=bool))
+        traffic.signals.keep(np.zeros(len(traffic.signals), dtype=bool))
+        for k in range(near):
+            self.materialize(k, self.initial_cells(k))
+        self.macro.count[:] = np.concatenate([self.initial_cells(k) for k in range(near, near + far)])
+        self.micro_seen = self.micro_cars()  # Microscopic cars when the world last changed them
+
+    def segment_rng(self, k, stream):
+        return np.random.default_rng(np.random.SeedSequence(self.seed, spawn_key=(k, stream)))
+
+    def initial_cells(self, k):
+        # A new segment's cars, spread evenly over its cells
+        cars = int(self.segment_rng(k, COUNT).poisson(self.cars_per_segment))
+        self.cars_spawned += cars
+        return np.full(self.cells_per_segment, cars / self.cells_per_segment)
+
+    def materialize(self, k, cells):
+        # Put segment ``k`` into the engine car by car from per-cell counts, plus its light and pedestrians
+        rng = self.segment_rng(k, CONTENTS)
+        length = self.segment_length
+        start = (k - self.first) * length
+        traffic = self.traffic
+
+        # Whole cars per cell by cumulative rounding; the leftover fraction carries on
+        whole = np.floor(self.carry + np.cumsum(cells))
+        cars = np.diff(whole, prepend=0).astype(np.int64)
+        total = int(whole[-1])
+        self.carry += float(np.sum(cells)) - total
+        self.to_micro += total
+
+        # Spread each cell's cars over its lanes, evenly spaced with some jitter
+        cell = np.repeat(np.arange(cells.size), cars)
+        rank = np.arange(total) - np.repeat(np.cumsum(cars) - cars, cars)
+        lane = (rank + rng.integers(0, traffic.lanes, size=total)) % traffic.lanes
+        per_lane = np.maximum(np.ceil(cars[cell] / traffic.lanes), 1)
+        cell_length = length / cells.size
+        slot = (rank // traffic.lanes + rng.uniform(0.1, 0.5, size=total)) / per_lane
+        x = start + (cell + slot) * cell_length
+        traffic.insert_cars(np.minimum(x, start + length - 40), lane, self.macro.speed(cells)[cell])
+
+        green_time, red_time = rng.integers(50, 151, size=2)
+        traffic.signals.add(start + rng.integers(100, int(length) - 100), green_time, red_time,
+                            offset=rng.uniform(0, green_time + red_time))
+        walkers = rng.poisson(PEDESTRIANS_PER_SEGMENT)
+        traffic.insert_pedestrians(start + rng.uniform(0, length, size=walkers), rng.uniform(0.5, 1, size=walkers))
+
+    @property
+    def near_end(self):
+        return self.near * self.segment_length
+
+    def micro_cars(self):
+        return len(self.traffic.car_arrays()[0])
+
+    def count_added(self):
+        # Cars added to (or taken off) the engine from outside since the world last changed it
+        micro = self.micro_cars()
+        self.cars_added += micro - self.micro_seen
+        self.micro_seen = micro
+
+    def update(self, camera_x, dt=FIXED_DT):
+        ticks = ticks_for(dt)
+        traffic = self.traffic
+        tiers = self.tiers
+        self.count_added()
+
+        # Cars that drove off the front of the near segments flow into the first cell, as
+        # fast as it can receive them; the rest queue up behind the boundary in their
+        # lanes, a car and MIN_GAP apart, so queues spill back
+        with tiers.scope('convert'):
+            self.admit_budget = min(self.admit_budget + self.macro.receiving(ticks), traffic.lanes)
+            x, lane, width = traffic.car_arrays()
+            ahead = np.flatnonzero(x >= self.near_end)
+            arrived = min(ahead.size, int(self.admit_budget))
+            if ahead.size:
+                ahead = ahead[np.argsort(-x[ahead], kind='stable')]
+                held = ahead[arrived:]
+                held = held[np.argsort(lane[held], kind='stable')]
+                first = np.searchsorted(lane[held], lane[held])
+                rank = np.arange(held.size) - first
+                traffic.hold_cars(held, self.near_end - rank * (width[held] + MIN_GAP))
+            if arrived:
+                keep = np.ones(x.size, dtype=bool)
+                keep[ahead[:arrived]] = False
+                traffic.keep_cars(keep)
+                self.admit_budget -= arrived
+                self.to_macro += arrived
+            ped_x = traffic.pedestrian_arrays()
+            if ped_x.size and ped_x.max() >= self.near_end:
+                traffic.keep_pedestrians(ped_x < self.near_end)
+
+        with tiers.scope('macro'):
+            self.macro.update(ticks, arrived)
+
+        # Traffic arrives from behind at the equilibrium flow of the starting density, into lanes with room
+        density = self.cars_per_segment / self.cells_per_segment
+        self.entry_budget = min(self.entry_budget + float(self.macro.flow(density)) * ticks, traffic.lanes)
+        if self.entry_budget >= 1:
+            rng = traffic.rng
+            x, lane, _ = traffic.car_arrays()
+            wanted = rng.integers(0, traffic.lanes, size=int(self.entry_budget))
+            free = np.ones(traffic.lanes, dtype=bool)
+            free[lane[x < MIN_GAP]] = False
+            wanted = np.unique(wanted[free[wanted]])
+            if wanted.size:
+                self.entry_budget -= wanted.size
+                self.cars_entered += wanted.size
+                traffic.insert_cars(np.full(wanted.size, -40.0), wanted,
+                                    np.full(wanted.size, self.macro.speed(np.array([density]))[0]))
+
+        with tiers.scope('convert'):
+            while camera_x - self.origin >= self.segment_length:
+                self.advance()
+        self.micro_seen = self.micro_cars()
+        tiers.end_frame()
+
+    def advance(self):
+        # Drop the segment behind the camera and slide the rest back by one
+        length = self.segment_length
+        traffic = self.traffic
+        x, _, width = traffic.car_arrays()
+        behind = x + width <= length
+        self.cars_dropped += int(np.count_nonzero(behind))
+        traffic.keep_cars(~behind)
+        traffic.keep_pedestrians(traffic.pedestrian_arrays() >= length)
+        traffic.signals.keep(traffic.signals.x >= length)
+        traffic.shift(-length)
+        self.origin += length
+        self.first += 1
+
+        # The first macroscopic segment becomes the last near one, and a new one appears at the horizon
+        cells = self.macro.take(self.cells_per_segment)
+        self.macro.fill(self.initial_cells(self.first + self.near + self.far - 1))
+        self.materialize(self.first + self.near - 1, cells)
+
+    def unaccounted(self):
+        # Cars created or lost anywhere but the road's ends (zero up to rounding)
+        self.count_added()
+        present = self.micro_cars() + self.macro.total() + self.carry
+        arrived = self.cars_spawned + self.cars_entered + self.cars_added
+        departed = self.cars_dropped + self.macro.outflow
+        return present - (arrived - departed)
+
+    def stats(self):
+        stages = self.tiers.summary()['stages']
+        return {
+            'segment': self.first,
+            'micro_cars': self.micro_cars(),
+            'macro_cars': self.macro.total(),
+            'to_macro': self.to_macro,
+            'to_micro': self.to_micro,
+            'cars_dropped': self.cars_dropped,
+            'micro_ms': stages.get('micro', 0.0),
+            'macro_ms': stages.get('macro', 0.0),
+            'convert_ms': stages.get('convert', 0.0),
+        }
@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+
+from simulation.control import AdaptiveCruisePolicy, Controller, RuleBasedPolicy, evaluate
+from simulation.core import SPEED_RESPONSE, Simulation
+from simulation.scheduler import ticks_for
+
+
+def observation(gap, lead_speed, stop_distance):
+    # Vehicles at 5 px/tick wanting 10, with the given leaders and stop lines
+    count = len(gap)
+    return {
+        'speed': np.full(count, 5.0),
+        'desired_speed': np.full(count, 10.0),
+        'gap': np.array(gap, dtype=float),
+        'lead_speed': np.array(lead_speed, dtype=float),
+        'stop_distance': np.array(stop_distance, dtype=float),
+        'max_acceleration': np.full(count, 0.1),
+        'max_braking': np.full(count, 0.1),
+    }
+
+
+@pytest.mark.parametrize("policy", [RuleBasedPolicy(), AdaptiveCruisePolicy()])
+def test_policies_brake_for_a_stopped_leader_and_a_red_line(policy):
+    # Rows: stopped leader close ahead, red stop line close ahead, open road
+    throttle, brake = policy(observation(gap=[50, np.inf, np.inf], lead_speed=[0, 0, 0],
+                                         stop_distance=[np.inf, 50, np.inf]))
+    np.testing.assert_array_equal(throttle[:2], 0)
+    assert np.all(brake[:2] > 0)
+    assert throttle[2] > 0 and brake[2] == 0
+
+
+def test_evaluate_splits_results_per_observation():
+    # One call over joined observations of different sizes; each gets its own rows back
+    observations = [observation([float(i)] * size, [0] * size, [np.inf] * size) for i, size in enumerate([1, 3, 2])]
+    for i, given in enumerate(observations):
+        given['speed'] = given['speed'] + np.arange(len(given['speed'])) + 10 * i
+    observations[1]['lidar'] = np.zeros((3, 4))  # Fields missing from any observation are left out
+    seen = []
+
+    def policy(merged):
+        seen.append(sorted(merged))
+        return merged['speed'], merged['gap']
+
+    results = evaluate(policy, observations)
+    assert len(seen) == 1 and 'lidar' not in seen[0]
+    assert len(results) == len(observations)
+    for (throttle, brake), given in zip(results, observations):
+        np.testing.assert_array_equal(throttle, given['speed'])
+        np.testing.assert_array_equal(brake, given['gap'])
+
+
+def test_controller_holds_the_pedals_between_decisions():
+    calls = []
+
+    def policy(obs):
+        calls.append(obs['speed'][0])
+        return np.ones(1), np.zeros(1)
+
+    sim = Simulation(seed=0)
+    sim.is_running = True
+    controller = Controller(policy, interval=0.25)
+    targets = []
+    for step in range(12):
+        sim.current_speed = step  # The car moves on between decisions
+        controller.update(sim, 0.0625)
+        targets.append(sim.target_speed)
+
+    # One decision every fourth step; the target only moves when one is made
+    assert calls == pytest.approx([0.3, 0.7, 1.1])  # Observed speeds are in px per tick
+    ticks = ticks_for(0.25)
+    assert targets == [0] * 3 + [3 + ticks * SPEED_RESPONSE] * 4 + [7 + ticks * SPEED_RESPONSE] * 4 \
+        + [11 + ticks * SPEED_RESPONSE]
+
+    # A stopped simulation isn't driven
+    sim.is_running = False
+    for _ in range(8):
+        controller.update(sim, 0.0625)
+    assert len(calls) == 3
@@ -0,0 +1,70 @@
+import numpy as np
+
+from simulation.core import SPEED_RESPONSE, Simulation
+
+
+def test_ego_brakes_gradually_for_a_red_light_and_moves_off_on_green():
+    sim = Simulation(seed=0)
+    signals = sim.traffic.signals
+    signals.green[:] = True
+    signals.green[-1] = False
+    signals.timer[:] = 1e9
+    line = signals.x[-1]
+    sim.car_x = line - 400 - sim.car_width
+    sim.is_running = True
+    sim.set_speed(60)
+    sim.current_speed = 60
+
+    speeds = []
+    for _ in range(300):
+        sim.step()
+        speeds.append(sim.current_speed)
+        assert sim.car_x + sim.car_width <= line + 1e-9
+    drops = -np.diff(speeds)
+    assert speeds[-1] == 0
+    assert drops.max() < SPEED_RESPONSE  # No sudden stop
+    assert np.count_nonzero(drops > 0) > 50
+    assert sim.car_x + sim.car_width > line - 1
+    assert sim.red_light_stops > 0
+
+    signals.green[-1] = True
+    x = sim.car_x
+    for _ in range(60):
+        sim.step()
+    assert sim.current_speed == 60
+    assert sim.car_x != x
+
+
+def test_drive_without_pedals_keeps_the_target():
+    # Stopped at a red light, a controller with no pedal pressed lets the car move off again
+    sim = Simulation(seed=0)
+    sim.set_speed(60)
+    sim.current_speed = 0
+    sim.drive(0.0, 0.0, ticks=3)
+    assert sim.target_speed == 60
+
+    sim.drive(1.0, 0.0, ticks=3)
+    assert sim.target_speed == 3 * SPEED_RESPONSE
+    sim.drive(0.0, 1.0, ticks=3)
+    assert sim.target_speed == 0
+
+
+def test_distance_stands_still_at_a_red_light():
+    sim = Simulation(seed=0)
+    signals = sim.traffic.signals
+    signals.green[:] = False
+    signals.timer[:] = 1e9
+    sim.car_x = signals.x[0] - sim.car_width - 100
+    sim.is_running = True
+    sim.set_speed(60)
+    sim.current_speed = 60
+    for _ in range(300):
+        sim.step()
+    assert sim.current_speed == 0
+
+    # Held at the line with a target of 60 km/h, the car covers no more ground
+    distance = sim.distance
+    for _ in range(300):
+        sim.step()
+    assert sim.distance == distance
+    assert distance > 0
@@ -0,0 +1,15 @@
+import numpy as np
+import pytest
+
+from simulation.energy import HOURS_PER_TICK, EnergyModel, game_motion, traffic_motion
+
+
+def test_ego_and_traffic_share_one_time_base():
+    # A traffic car moving like the ego car on screen drains its battery the same way
+    model = EnergyModel()
+    ego = game_motion(60.0, 59.0, 2.0)
+    traffic = traffic_motion(np.array([6.0]), np.array([5.9]), 2.0)
+    assert traffic[0][0] == pytest.approx(ego[0])
+    assert traffic[1][0] == pytest.approx(ego[1])
+    hours = HOURS_PER_TICK * 2.0
+    assert model.drain(np.array([80.0]), *traffic, hours)[0] == pytest.approx(model.drain(80.0, *ego, hours))
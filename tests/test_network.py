@@ -0,0 +1,95 @@
+import numpy as np
+import pytest
+
+from simulation.network import MIN_GAP, NetworkTraffic, RoadNetwork, Router
+from simulation.traffic import TrafficSystem
+
+
+def corridor(green=1e9, offset=1e9, speed=2.0):
+    # a -> b -> c along x; b's signal holds the first edge red until the offset is cleared
+    return RoadNetwork([0, 300, 600], [0, 0, 0], [0, 1], [1, 2], speed=speed,
+                       signals=[1], green=green, offset=offset, node_ids=['a', 'b', 'c'])
+
+
+def test_save_and_load_round_trip(tmp_path):
+    network = RoadNetwork([0, 300, 300], [0, 0, 400], [0, 1, 2], [1, 2, 0], lanes=[1, 2, 3],
+                          speed=[2.0, 1.5, 1.0], length=[350, 400, 500], signals=[1], green=80, offset=20,
+                          node_ids=['west', 'east', 'south'])
+    path = tmp_path / "network.json"
+    network.save(path)
+    loaded = RoadNetwork.load(path)
+
+    assert loaded.node_ids == network.node_ids
+    for name in ('node_x', 'node_y', 'edge_from', 'edge_to', 'edge_lanes', 'edge_speed', 'edge_length',
+                 'lane_offset', 'signal_node', 'signal_green', 'signal_offset', 'edge_signal', 'edge_group'):
+        np.testing.assert_array_equal(getattr(loaded, name), getattr(network, name), err_msg=name)
+
+    # Saving what was loaded writes the same file
+    again = tmp_path / "again.json"
+    loaded.save(again)
+    assert again.read_text() == path.read_text()
+
+
+def test_router_takes_the_fastest_route_and_caches_tables():
+    # Two ways from 0 to 3: via 1 (200 px) and via 2 (350 px)
+    network = RoadNetwork([0, 100, 50, 200], [0, 0, 100, 0], [0, 1, 0, 2], [1, 3, 2, 3],
+                          length=[100, 100, 50, 300])
+    router = Router(network, cache_entries=2 * network.nodes)  # Tables for two destinations
+    assert router.route(0, 3) == [0, 1]
+    assert router.route(0, 3) == [0, 1]
+    assert router.stats() == {'hits': 1, 'misses': 1, 'cached': 1}
+    assert router.route(3, 0) == []  # Nothing leaves node 3
+
+    # The least recently used destination is dropped past the cap
+    router.table(3)
+    router.table(1)
+    assert list(router.cache) == [3, 1]
+    assert router.stats() == {'hits': 2, 'misses': 3, 'cached': 2}
+
+    # A slower edge only changes routes once the router is told
+    network.edge_speed[0] = 0.1
+    assert router.route(0, 3) == [0, 1]
+    router.invalidate()
+    assert router.stats()['cached'] == 0
+    assert router.route(0, 3) == [2, 3]
+
+
+def test_vehicles_wait_at_a_red_junction_and_arrive_on_green():
+    network = corridor(speed=1.5)
+    traffic = NetworkTraffic(network, rng=np.random.default_rng(0))
+    traffic.add_vehicles(2, edges=[0, 0], dests=[2, 2])
+    traffic.pos[:] = [200, 100]
+    traffic.speed[:] = 0.0
+    for _ in range(2000):
+        traffic.update()
+        assert np.all(traffic.edge == 0)
+        assert np.all(traffic.pos <= network.edge_length[0])
+        assert np.all(traffic.speed <= 1.5)
+
+    # Queued behind the line: the first just short of it, the second behind with room to spare
+    first, second = np.argsort(-traffic.pos)
+    assert network.edge_length[0] - 30 < traffic.pos[first] <= network.edge_length[0]  # IDM stops s0 short
+    assert traffic.pos[first] - traffic.length[first] - traffic.pos[second] >= MIN_GAP
+    assert np.all(traffic.speed < 1e-3)
+
+    # Green: both cross onto the next edge, reach node c and leave the network
+    network.signal_offset[:] = 0
+    for _ in range(3000):
+        traffic.update()
+        assert len(traffic.drivers['v0']) == len(traffic)
+    assert len(traffic) == 0
+    assert traffic.arrived == 2
+    assert traffic.stats()['vehicles'] == 0
+
+
+def test_unreachable_destinations_are_not_spawned():
+    traffic = NetworkTraffic(corridor(), rng=np.random.default_rng(0))
+    traffic.add_vehicles(3, edges=[1, 0, 1], dests=[0, 2, 2])  # Nothing leads back to a
+    assert traffic.unroutable == 1
+    assert len(traffic) == len(traffic.drivers['T']) == 2
+    np.testing.assert_array_equal(traffic.next_edge, [1, -1])
+
+
+def test_strip_engines_refuse_a_many_edge_network():
+    with pytest.raises(ValueError, match="one-edge"):
+        TrafficSystem(network=RoadNetwork.grid(2, 2))
@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+
+from simulation.core import Simulation
+from simulation.particles import ParticleSystem
+from simulation.weather import WeatherEffect
+
+
+def test_emitting_past_capacity_drops_the_rest():
+    pool = ParticleSystem(4)
+    pool.emit(np.arange(3.0), 0.0)
+    pool.emit(np.arange(3.0), 1.0)
+    assert len(pool) == 4
+    assert pool.dropped == 2
+    # The first batch kept all its particles, the second only one
+    np.testing.assert_array_equal(pool.y[pool.live()], [0, 0, 0, 1])
+    pool.emit(9.0, 9.0)
+    assert (len(pool), pool.dropped) == (4, 3)
+
+
+def test_update_moves_and_fades_in_proportion_to_ticks():
+    pools = [ParticleSystem(8, decay=0.1) for _ in range(2)]
+    for pool in pools:
+        pool.emit([0.0, 10.0], [0.0, 5.0], vx=[1.0, -2.0], vy=[0.5, 0.0])
+    pools[0].update(3.0)
+    for _ in range(3):
+        pools[1].update(1.0)
+    for pool in pools:
+        live = pool.live()
+        order = np.argsort(pool.y[live])
+        np.testing.assert_allclose(pool.x[live][order], [3.0, 4.0])
+        np.testing.assert_allclose(pool.y[live][order], [1.5, 5.0])
+        np.testing.assert_allclose(pool.life[live], 0.7, rtol=1e-6)
+
+
+def test_dead_particles_free_their_slots():
+    pool = ParticleSystem(4, bounds=(-np.inf, -np.inf, np.inf, 100.0), decay=0.5)
+    pool.emit([0.0, 1.0, 2.0], [0.0, 200.0, 0.0], life=[1.0, 1.0, 3.0])
+    pool.update()  # The second leaves the bounds
+    np.testing.assert_array_equal(np.sort(pool.x[pool.live()]), [0.0, 2.0])
+    pool.update()  # The first runs out of life
+    np.testing.assert_array_equal(pool.x[pool.live()], [2.0])
+
+    # Freed slots are reused lowest first, so the pool never has to grow
+    slots = pool.live()
+    pool.emit([5.0, 6.0], 0.0)
+    assert len(pool) == 3 and pool.high_water == 3
+    assert pool.x[slots[0]] == 2.0  # The survivor keeps its slot
+    pool.emit([7.0, 8.0], 0.0)
+    assert len(pool) == 4 and pool.dropped == 1
+
+    # Once every particle is gone, live() stops scanning used slots
+    pool.update(10.0)
+    assert len(pool) == 0 and pool.high_water == 0
+
+
+def test_weather_and_boost_share_the_pool():
+    weather = WeatherEffect(rng=np.random.default_rng(0), emission_rate=5, capacity=16)
+    weather.is_raining = True
+    for _ in range(10):
+        weather.update()
+    assert isinstance(weather.particles, ParticleSystem)
+    assert len(weather.particles) == 16 and weather.particles.dropped > 0
+    assert weather.raindrops.shape == (16, 3)
+
+    sim = Simulation(seed=0)
+    sim.boost_mode = True
+    sim.current_speed = sim.target_speed = 50
+    sim.step()
+    boost = sim.boost_particles
+    assert isinstance(boost, ParticleSystem) and len(boost) == 1
+    x = boost.x[boost.live()][0]
+    sim.boost_mode = False
+    sim.step()
+    assert boost.x[boost.live()][0] == pytest.approx(x - 5)
+    assert boost.life[boost.live()][0] == pytest.approx(0.8)
+    for _ in range(10):
+        sim.step()
+    assert len(boost) == 0
@@ -0,0 +1,172 @@
+"""Performance benchmarks for the simulation hot paths.
+
+Run with ``pytest tests/test_performance_benchmark.py --benchmark-only``.
+Save a baseline with ``--benchmark-autosave`` and fail on regressions with
+``--benchmark-compare --benchmark-compare-fail=mean:20%``. Every benchmark
+also reports its rate (ticks/s or frames/s) in ``extra_info``.
+"""
+import numpy as np
+import pytest
+
+from simulation.control import POLICIES, Controller
+from simulation.core import Simulation
+from simulation.run import ENGINES
+from simulation.weather import WeatherEffect
+
+CAR_COUNTS = (10, 1_000, 100_000)
+WEATHER_RATES = (5, 50, 500)  # Particles emitted per reference tick
+WARM_TICKS = 120  # Let particle pools fill before timing
+
+
+def report_rate(benchmark, name, per_call=1):
+    # Rate from the mean call time; stats are missing under --benchmark-disable
+    stats = getattr(benchmark, "stats", None)
+    if stats is not None and stats.stats.mean > 0:
+        benchmark.extra_info[name] = per_call / stats.stats.mean
+
+
+def run(benchmark, function, slow=False):
+    # Very slow cases get a fixed, small number of rounds
+    if slow:
+        return benchmark.pedantic(function, rounds=5, iterations=1, warmup_rounds=1)
+    return benchmark(function)
+
+
+@pytest.mark.parametrize("cars", CAR_COUNTS)
+@pytest.mark.parametrize("engine", sorted(ENGINES))
+def test_traffic_update(benchmark, engine, cars):
+    traffic = ENGINES[engine](rng=np.random.default_rng(0))
+    traffic.add_traffic_cars(cars)
+    benchmark.group = f"traffic-{cars}"
+    benchmark.extra_info["cars"] = cars
+    run(benchmark, traffic.update, slow=engine == "dict" and cars >= 100_000)
+    report_rate(benchmark, "ticks_per_second")
+
+
+@pytest.mark.parametrize("rate", WEATHER_RATES)
+@pytest.mark.parametrize("weather", ["Clear", "Rain", "Snow"])
+def test_weather_update(benchmark, weather, rate):
+    effect = WeatherEffect(rng=np.random.default_rng(0), emission_rate=rate)
+    effect.is_raining = weather == "Rain"
+    effect.is_snowing = weather == "Snow"
+    for _ in range(WARM_TICKS):
+        effect.update()
+    benchmark.group = f"weather-{rate}"
+    benchmark.extra_info["particles"] = len(effect.particles)
+    run(benchmark, effect.update)
+    report_rate(benchmark, "ticks_per_second")
+
+
+@pytest.mark.parametrize("cars", CAR_COUNTS)
+def test_simulation_step(benchmark, cars):
+    sim = Simulation(seed=0, traffic_engine=ENGINES["vectorized"])
+    sim.traffic.add_traffic_cars(cars)
+    sim.change_weather("Rain")
+    sim.is_running = True
+    sim.set_speed(60)
+    benchmark.group = f"step-{cars}"
+    benchmark.extra_info["cars"] = cars
+    run(benchmark, sim.step)
+    report_rate(benchmark, "ticks_per_second")
+
+
+@pytest.mark.parametrize("beams", (100, 360, 1_000))
+@pytest.mark.parametrize("weather", ["Clear", "Fog"])
+def test_sensor_scan(benchmark, weather, beams):
+    sim = Simulation(seed=0, traffic_engine=ENGINES["vectorized"])
+    sim.enable_world()
+    sim.enable_sensors(beams=beams)
+    sim.change_weather(weather)
+    sim.set_speed(60)
+    for _ in range(WARM_TICKS):
+        sim.step()
+    benchmark.group = f"sensors-{beams}"
+    benchmark.extra_info["radar_objects"] = len(sim.sensors.objects)
+    run(benchmark, lambda: sim.sensors.scan(sim))
+    report_rate(benchmark, "scans_per_second")
+
+
+@pytest.mark.parametrize("cars", CAR_COUNTS)
+@pytest.mark.parametrize("policy", sorted(POLICIES))
+def test_traffic_policy(benchmark, policy, cars):
+    # Observe every traffic car and run the policy on all of them in one call
+    sim = Simulation(seed=0, traffic_engine=ENGINES["vectorized"])
+    sim.traffic.add_traffic_cars(cars)
+    sim.controller = Controller(traffic_policy=POLICIES[policy]())
+    benchmark.group = f"policy-{cars}"
+    benchmark.extra_info["cars"] = cars
+    run(benchmark, lambda: sim.controller.traffic_acceleration(sim))
+    report_rate(benchmark, "vehicles_per_second", per_call=len(sim.traffic.car_x))
+
+
+def paint_scenario(weather, cars):
+    sim = Simulation(seed=0, traffic_engine=ENGINES["vectorized"])
+    sim.traffic.add_traffic_cars(cars)
+    sim.change_weather(weather)
+    sim.change_time("Night")
+    sim.weather.set_density(50)
+    for _ in range(WARM_TICKS):
+        sim.step()
+    return sim
+
+
+@pytest.mark.parametrize("batched", [True, False], ids=["batched", "immediate"])
+@pytest.mark.parametrize("weather", ["Clear", "Rain", "Snow"])
+@pytest.mark.parametrize("cars", (10, 1_000))
+def test_paint(benchmark, qapp, weather, cars, batched):
+    from PyQt6.QtGui import QImage
+
+    from simulation.full_sim import SimulationView
+
+    sim = paint_scenario(weather, cars)
+    view = SimulationView(sim)
+    view.batched = batched
+    view.resize(800, 600)
+    image = QImage(800, 600, QImage.Format.Format_ARGB32_Premultiplied)
+
+    benchmark.group = f"paint-{weather}-{cars}"
+    benchmark.extra_info["particles"] = len(sim.weather.particles)
+    run(benchmark, lambda: view.render(image))
+    report_rate(benchmark, "frames_per_second")
+
+
+@pytest.mark.parametrize("weather", ["Clear", "Rain", "Snow"])
+@pytest.mark.parametrize("cars", (10, 1_000))
+def test_paint_opengl(benchmark, qapp, weather, cars):
+    # Same scenes and groups as test_paint; needs a 3.3 context (llvmpipe is fine)
+    pytest.importorskip("OpenGL")
+    from OpenGL import GL
+    from PyQt6.QtGui import QOffscreenSurface, QOpenGLContext
+    from PyQt6.QtOpenGL import QOpenGLFramebufferObject
+
+    from simulation.gl_view import GLSceneRenderer, SceneBatch, build_scene, surface_format
+    from simulation.render import StarField
+
+    context = QOpenGLContext()
+    context.setFormat(surface_format())
+    surface = QOffscreenSurface()
+    surface.setFormat(surface_format())
+    surface.create()
+    if not (context.create() and context.makeCurrent(surface)):
+        pytest.skip("no OpenGL 3.3 context on this platform")
+
+    sim = paint_scenario(weather, cars)
+    target = QOpenGLFramebufferObject(800, 600)
+    target.bind()
+    GL.glViewport(0, 0, 800, 600)
+    renderer = GLSceneRenderer()
+    renderer.initialize()
+    scene = SceneBatch()
+    stars = StarField(seed=0)
+
+    def paint():
+        build_scene(scene, sim, 800, 600, 1.0, stars)
+        renderer.draw(scene.array(), 800, 600)
+        GL.glFinish()
+
+    benchmark.group = f"paint-{weather}-{cars}"
+    benchmark.extra_info["particles"] = len(sim.weather.particles)
+    run(benchmark, paint)
+    report_rate(benchmark, "frames_per_second")
+    target.release()
+    context.doneCurrent()
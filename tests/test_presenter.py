@@ -0,0 +1,40 @@
+from simulation.presenter import StatsPresenter
+
+
+class Label:
+    def __init__(self):
+        self.calls = []
+
+    def setText(self, text):
+        self.calls.append(text)
+
+    def setValue(self, value):
+        self.calls.append(value)
+
+
+def test_pushes_only_changes_and_throttles():
+    now = [0.0]
+    presenter = StatsPresenter(refresh_rate=10, clock=lambda: now[0])
+    label, bar = Label(), Label()
+
+    for text in ("Speed: 10", "Speed: 10", "Speed: 20", "Speed: 20"):
+        presenter.set_text(label, text)
+    presenter.set_value(bar, 50)
+    presenter.set_value(bar, 50)
+    assert label.calls == ["Speed: 10", "Speed: 20"]
+    assert bar.calls == [50]
+    assert (presenter.pushes, presenter.skipped) == (3, 3)
+
+    # Forgetting a widget pushes its content again, leaving the others cached
+    presenter.forget(label)
+    presenter.set_text(label, "Speed: 20")
+    presenter.set_value(bar, 50)
+    assert label.calls[-1] == "Speed: 20" and len(label.calls) == 3
+    assert bar.calls == [50]
+
+    # At most refresh_rate refreshes per second of the injected clock
+    assert presenter.due()
+    now[0] = 0.05
+    assert not presenter.due()
+    now[0] = 0.1
+    assert presenter.due()
@@ -0,0 +1,73 @@
+import json
+import time
+
+import numpy as np
+import pytest
+
+from simulation.profiler import NULL_SCOPE, FrameProfiler
+
+
+def run_frames(profiler, monkeypatch, frames):
+    # One frame per (frame_ms, {stage: ms}), on a fake clock
+    now = [0.0]
+    monkeypatch.setattr(time, 'perf_counter', lambda: now[0])
+    profiler.end_frame()  # Starts the first frame
+    for frame_ms, stages in frames:
+        for name, ms in stages.items():
+            profiler.record(name, ms)
+        now[0] += frame_ms / 1000
+        profiler.end_frame()
+
+
+def test_ring_buffer_keeps_the_latest_frames(monkeypatch):
+    profiler = FrameProfiler(capacity=4, enabled=True)
+    run_frames(profiler, monkeypatch, [(float(ms), {'traffic': ms / 10}) for ms in range(1, 7)])
+    frame_ms, stage_ms = profiler.trace()
+    assert profiler.frames == 6
+    np.testing.assert_allclose(frame_ms, [3, 4, 5, 6])  # Oldest first, the first two overwritten
+    np.testing.assert_allclose(stage_ms[:, 0], [0.3, 0.4, 0.5, 0.6])
+
+
+def test_disabled_profiler_records_nothing(monkeypatch):
+    profiler = FrameProfiler(capacity=4)
+    assert profiler.scope('traffic') is NULL_SCOPE
+    with profiler.scope('traffic'):
+        pass
+    run_frames(profiler, monkeypatch, [(16.0, {'traffic': 1.0})] * 3)
+    assert profiler.frames == 0 and profiler.stages == []
+    assert profiler.summary() == {'frames': 0, 'fps': 0.0, 'p50_ms': 0.0, 'p99_ms': 0.0, 'stages': {}}
+
+    # Turning it on doesn't count the time it was off as a frame
+    profiler.set_enabled(True)
+    with profiler.scope('traffic'):
+        pass
+    assert profiler.stages == ['traffic']
+    run_frames(profiler, monkeypatch, [(10.0, {})])
+    assert profiler.frames == 1
+
+
+def test_summary_statistics(monkeypatch):
+    profiler = FrameProfiler(enabled=True)
+    frames = [(10.0, {'traffic': 2.0, 'paint': 4.0})] * 99 + [(30.0, {'traffic': 102.0, 'paint': 4.0})]
+    run_frames(profiler, monkeypatch, frames)
+    summary = profiler.summary()
+    assert summary['frames'] == 100
+    assert summary['fps'] == pytest.approx(1000 / 10.2)
+    assert summary['p50_ms'] == pytest.approx(10.0)
+    assert 10.0 < summary['p99_ms'] <= 30.0
+    assert summary['stages'] == pytest.approx({'traffic': 3.0, 'paint': 4.0})
+    assert profiler.overlay_lines()[0] == f"FPS {1000 / 10.2:5.1f}"
+
+
+def test_json_export_loads_back(monkeypatch, tmp_path):
+    profiler = FrameProfiler(enabled=True)
+    run_frames(profiler, monkeypatch, [(16.0, {'traffic': 1.0}), (20.0, {'traffic': 2.0, 'paint': 3.0})])
+    path = tmp_path / "frame_profile.json"
+    profiler.export(path)
+    with open(path) as f:
+        trace = json.load(f)
+    assert trace['stages'] == ['traffic', 'paint']
+    assert trace['frame_ms'] == pytest.approx([16.0, 20.0])
+    assert trace['stage_ms'] == [[1.0, 0.0], [2.0, 3.0]]
+    assert trace['summary']['frames'] == 2
+    assert trace['summary']['stages'] == pytest.approx({'traffic': 1.5, 'paint': 1.5})
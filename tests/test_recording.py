@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+
+from simulation.core import Simulation
+from simulation.recording import Recording, ReplaySimulation, TrajectoryRecorder
+from simulation.scheduler import FIXED_DT
+
+
+def test_record_reopen_seek(tmp_path):
+    sim = Simulation(seed=4)
+    sim.traffic.add_traffic_cars(5)
+    sim.is_running = True
+    sim.set_speed(70)
+    seen = {}
+    with TrajectoryRecorder(tmp_path / "run", chunk_ticks=100) as recorder:
+        for tick in range(450):
+            sim.step()
+            recorder.record(sim)
+            if tick in (0, 99, 100, 449):
+                seen[tick] = (sim.car_x, sim.current_speed, sim.traffic.car_arrays()[0].copy())
+
+    recording = Recording(tmp_path / "run")
+    assert len(recording) == 450
+    replay = ReplaySimulation(recording)
+    for tick in (449, 0, 100, 99):
+        replay.seek(tick)
+        car_x, speed, traffic_x = seen[tick]
+        assert replay.position == tick
+        assert replay.car_x == pytest.approx(car_x, rel=1e-6)
+        assert replay.current_speed == pytest.approx(speed, rel=1e-6)
+        np.testing.assert_allclose(replay.traffic.car_arrays()[0], traffic_x, rtol=1e-6)
+
+    # Stepping plays the next tick; it stops at the end
+    replay.seek(448)
+    replay.step()
+    replay.step()
+    assert replay.position == 449
+
+
+def test_replay_keeps_fractional_speeds_and_scales_boost_by_dt(tmp_path):
+    sim = Simulation(seed=0)
+    sim.is_running = True
+    sim.boost_mode = True
+    sim.drive(1.0, 0.0, ticks=2.5)  # A controller leaves the target between whole km/h
+    with TrajectoryRecorder(tmp_path / "run") as recorder:
+        for _ in range(5):
+            sim.step()
+            recorder.record(sim)
+    assert sim.speed % 1
+
+    replay = ReplaySimulation(Recording(tmp_path / "run"))
+    assert replay.speed == pytest.approx(sim.speed)
+    assert replay.target_speed == replay.speed
+
+    # Half a step moves and fades the boost trail half as far
+    replay.current_speed = 10
+    replay.step(FIXED_DT)
+    particles = replay.boost_particles
+    x, life = particles.x[particles.live()].copy(), particles.life[particles.live()].copy()
+    replay.step(FIXED_DT / 2)
+    live = particles.live()[:x.size]
+    np.testing.assert_allclose(particles.x[live], x - 2.5)
+    np.testing.assert_allclose(particles.life[live], life - 0.05, rtol=1e-6)
+
+
+def test_writer_failure_surfaces_at_close(tmp_path):
+    sim = Simulation(seed=0)
+    recorder = TrajectoryRecorder(tmp_path / "run", chunk_ticks=1, queue_chunks=1)
+
+    def fail(chunk):
+        raise RuntimeError("disk on fire")
+
+    recorder.write_chunk = fail
+    for _ in range(20):
+        sim.step()
+        recorder.record(sim)
+    with pytest.raises(RuntimeError, match="disk on fire"):
+        recorder.close()
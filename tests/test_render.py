@@ -0,0 +1,72 @@
+import pytest
+
+pytest.importorskip("PyQt6.QtGui")
+
+import numpy as np  # noqa: E402
+
+from simulation.render import STAR_DENSITY, LayerCache, StarField  # noqa: E402
+
+
+def test_layer_cache_reuses_pixmaps_by_key(qapp):
+    painted = []
+    cache = LayerCache(lambda painter, width, height, time_of_day: painted.append((width, height, time_of_day)),
+                       entries=3)
+
+    first = cache.get(800, 600, "day")
+    assert cache.get(800, 600, "day") is first
+    assert painted == [(800, 600, "day")]
+    assert cache.stats() == {'hits': 1, 'misses': 1, 'cached': 1}
+
+    # A new size or time of day paints again
+    cache.get(1024, 600, "day")
+    cache.get(800, 600, "night")
+    assert painted[1:] == [(1024, 600, "day"), (800, 600, "night")]
+    assert cache.stats() == {'hits': 1, 'misses': 3, 'cached': 3}
+
+    # Past the cap the least recently used pixmap goes; the one just used stays
+    cache.get(800, 600, "day")
+    cache.get(640, 480, "sunset")
+    assert cache.stats() == {'hits': 2, 'misses': 4, 'cached': 3}
+    assert list(cache.pixmaps) == [(800, 600, 1.0, "night"), (800, 600, 1.0, "day"), (640, 480, 1.0, "sunset")]
+    cache.get(1024, 600, "day")
+    assert cache.stats()['misses'] == 5
+
+    cache.invalidate()
+    assert cache.stats()['cached'] == 0
+
+
+def test_star_field_is_stable_for_a_seed_and_size():
+    stars, again = StarField(seed=7), StarField(seed=7)
+    stars.generate(800, 400)
+    again.generate(800, 400)
+    for name in ('x', 'y', 'size', 'phase', 'rate'):
+        np.testing.assert_array_equal(getattr(stars, name), getattr(again, name))
+
+    # Later frames at the same size keep the same stars without drawing new ones
+    x = stars.x
+    stars.generate(800, 400)
+    assert stars.x is x
+
+    other = StarField(seed=8)
+    other.generate(800, 400)
+    assert not np.array_equal(other.x, stars.x)
+
+
+def test_star_count_scales_with_sky_area():
+    stars = StarField(seed=0)
+    for width, sky_height in ((800, 400), (1600, 400), (1600, 800)):
+        stars.generate(width, sky_height)
+        assert len(stars) == round(STAR_DENSITY * width * sky_height)
+    assert len(StarField(seed=0)) == 0  # Nothing until a size is known
+    stars.generate(800, -10)
+    assert len(stars) == 0
+
+
+def test_resizing_regenerates_stars_once_per_size(monkeypatch):
+    stars = StarField(seed=0)
+    generated = []
+    rng = np.random.default_rng
+    monkeypatch.setattr(np.random, 'default_rng', lambda seed: generated.append(seed) or rng(seed))
+    for width in (800, 800, 1024, 1024, 1024, 800):
+        stars.generate(width, 400)
+    assert len(generated) == 3
@@ -0,0 +1,28 @@
+import pytest
+
+from simulation.scheduler import FIXED_DT, FixedStepScheduler
+
+
+def test_steps_whole_dts_and_drops_a_stall():
+    steps = []
+    scheduler = FixedStepScheduler(steps.append, max_steps_per_frame=5)
+
+    # Less than a step: nothing runs, the remainder is the interpolation alpha
+    assert scheduler.advance(0.5 * FIXED_DT) == 0
+    assert scheduler.alpha == pytest.approx(0.5)
+
+    # Whole steps fit in the accumulated time, at the fixed dt
+    assert scheduler.advance(2.0 * FIXED_DT) == 2
+    assert steps == [FIXED_DT, FIXED_DT]
+    assert scheduler.alpha == pytest.approx(0.5)
+    assert scheduler.skipped_frames == 1
+
+    # A one second stall runs at most five steps and drops the rest, keeping the partial step
+    assert scheduler.advance(1.0) == 5
+    assert 0 <= scheduler.alpha < 1
+    left = scheduler.dropped_time + scheduler.alpha * FIXED_DT
+    assert left == pytest.approx(1.0 + 0.5 * FIXED_DT - 5 * FIXED_DT)
+    assert (scheduler.frames, scheduler.steps) == (3, 7)
+
+    # Negative elapsed time (a clock going backwards) is ignored
+    assert scheduler.advance(-1.0) == 0
@@ -0,0 +1,106 @@
+import numpy as np
+import pytest
+
+from simulation.core import Simulation
+from simulation.scheduler import FIXED_DT
+from simulation.sensors import CAR, LIDAR_NOISE, NONE, obstacles, raycast
+from simulation.signals import SignalController
+from simulation.traffic import VectorizedTrafficSystem
+
+
+def empty_road(cars_x=(), speed=0.0):
+    # Ego car at x = 50 with only the given lane 0 cars: no pedestrians or lights
+    traffic = VectorizedTrafficSystem(rng=np.random.default_rng(0))
+    traffic.keep_cars(np.zeros(len(traffic.car_x), dtype=bool))
+    traffic.keep_pedestrians(np.zeros(len(traffic.ped_x), dtype=bool))
+    traffic.signals = SignalController(traffic.road_length)
+    traffic.insert_cars(list(cars_x), [0] * len(cars_x), [speed] * len(cars_x))
+    return Simulation(traffic=traffic, seed=0)
+
+
+def test_raycast_hits_the_nearest_face_of_a_box():
+    angles = np.array([0.0, np.pi / 4, np.pi / 2, np.pi])
+    x0, y0, x1, y1 = (np.array(values, dtype=float) for values in
+                      ([100, 50, -5, 900], [-10, 50, -5, -10], [140, 60, 5, 950], [10, 60, 5, 10]))
+    ranges, hit = raycast(0.0, 0.0, angles, x0, y0, x1, y1, 500.0)
+
+    # Straight ahead through the near face; the diagonal through a corner of the second box
+    assert ranges[0] == pytest.approx(100)
+    assert ranges[1] == pytest.approx(50 * np.sqrt(2))
+    np.testing.assert_array_equal(hit, [0, 1, -1, -1])
+    # The box the rays start in is ignored; misses and hits past max range read max range
+    np.testing.assert_array_equal(ranges[2:], 500.0)
+
+
+def test_lidar_reports_nothing_past_its_range():
+    sim = empty_road([600])
+    sim.enable_sensors(lidar_range=300, radar_range=300)
+    sim.sensors.scan(sim)
+    assert np.all(sim.sensors.kinds == NONE)
+    np.testing.assert_array_equal(sim.sensors.ranges, 300.0)
+    assert sim.sensors.objects.size == 0
+
+    # Within range, the car's nearest corner is 220 px ahead and 15 px up
+    sim = empty_road([300])
+    sim.enable_sensors(lidar_range=300, radar_range=300)
+    sim.sensors.scan(sim)
+    seen = sim.sensors.kinds == CAR
+    assert seen.any()
+    assert sim.sensors.ranges[seen].min() == pytest.approx(np.hypot(220, 15), abs=2)
+    np.testing.assert_array_equal(sim.sensors.ranges[~seen], 300.0)
+
+
+def test_obstacles_are_culled_to_the_window():
+    sim = empty_road([100, 390, 500, 700])
+    kind, index, x0, y0, x1, y1, vx = obstacles(sim, 400, 600)
+    # The car at 390 overlaps the window's start; the one at 700 is past its end
+    np.testing.assert_array_equal(np.sort(index), [1, 2])
+    assert np.all(kind == CAR)
+    np.testing.assert_array_equal(x1 - x0, 40)
+
+
+@pytest.mark.parametrize("weather, reach, noise", [('is_foggy', 0.4, 2.0), ('is_raining', 0.7, 3.0)])
+def test_weather_shortens_lidar_range_and_adds_noise(weather, reach, noise):
+    distance = np.hypot(220, 15)  # To the car's nearest corner
+    for lidar_range, spread in ((1000, LIDAR_NOISE), (0.9 * distance / reach, None)):
+        for bad_weather in (False, True):
+            sim = empty_road([300])
+            sim.enable_sensors(lidar_range=lidar_range)
+            setattr(sim.weather, weather, bad_weather)
+            scans = []
+            for _ in range(200):
+                sim.sensors.scan(sim)
+                scans.append(sim.sensors.ranges.copy())
+            seen = sim.sensors.kinds == CAR
+            if spread is None:
+                # Just out of the weather's reach: only clear weather sees the car
+                assert seen.any() != bad_weather
+            else:
+                expected = spread * (noise if bad_weather else 1)
+                assert np.array(scans)[:, seen].std(axis=0).mean() == pytest.approx(expected, rel=0.25)
+
+
+def test_radar_measures_how_fast_the_gap_opens():
+    sim = empty_road([300], speed=1.5)
+    sim.current_speed = 10  # 1 px per tick, so the car ahead pulls away at 0.5
+    sim.enable_sensors()
+    sim.sensors.scan(sim)
+    objects = sim.sensors.objects
+    assert objects.size == 1
+    ahead = objects[0]
+    assert ahead['kind'] == CAR
+    assert ahead['range'] == pytest.approx(np.hypot(220, 15), abs=10)
+    assert ahead['range_rate'] == pytest.approx(0.5 * 220 / np.hypot(220, 15), abs=0.2)
+
+
+def test_scans_come_at_the_sensor_rate():
+    sim = empty_road()
+    sim.enable_sensors(rate=10)
+    scanned = []
+    for _ in range(60):
+        sim.clock += FIXED_DT
+        scanned.append(sim.sensors.update(sim, FIXED_DT))
+    # The first step scans, then one every tenth of a simulated second
+    np.testing.assert_array_equal(np.flatnonzero(scanned) + 1, [1, 6, 12, 18, 24, 30, 36, 42, 48, 54, 60])
+    assert sim.sensors.scans == 11
+    assert sim.sensors.timestamp == sim.clock
@@ -0,0 +1,21 @@
+import numpy as np
+
+from simulation.sweep import RESULT_COLUMNS, build_grid, run_sweep, write_results
+
+
+def test_sweep_writes_one_row_per_episode(tmp_path):
+    grid = build_grid(seeds=range(2), traffic=(0, 5), engine='vectorized', ticks=60)
+    results = list(run_sweep(grid, workers=2))
+    path = tmp_path / "sweep.npz"
+    write_results(results, path)
+
+    with np.load(path) as data:
+        assert sorted(data.files) == sorted(RESULT_COLUMNS)
+        assert all(data[name].shape == (len(grid),) for name in RESULT_COLUMNS)
+        assert sorted(zip(data['seed'].tolist(), data['traffic_cars'].tolist())) == [(0, 0), (0, 5), (1, 0), (1, 5)]
+        assert np.all(data['ticks'] == 60)
+        assert np.all(data['distance'] > 0)
+
+    # Episodes are reproducible whichever worker runs them
+    again = {(r['seed'], r['traffic_cars']): r['distance'] for r in run_sweep(grid, workers=2)}
+    assert all(again[(r['seed'], r['traffic_cars'])] == r['distance'] for r in results)
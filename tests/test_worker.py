@@ -0,0 +1,80 @@
+import threading
+import time
+
+import pytest
+
+from simulation.core import Simulation
+from simulation.profiler import FrameProfiler
+from simulation.worker import SimulationWorker
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.perf_counter() + timeout
+    while not condition() and time.perf_counter() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_step_error_surfaces_on_the_next_read():
+    sim = Simulation(seed=0)
+
+    def step(dt):
+        if sim.ticks >= 3:
+            raise RuntimeError("physics blew up")
+        sim.step(dt)
+
+    worker = SimulationWorker(sim, step)
+    worker.start()
+    assert wait_for(lambda: worker.error is not None)
+    with pytest.raises(RuntimeError, match="physics blew up"):
+        worker.frames.latest()
+    with pytest.raises(RuntimeError, match="physics blew up"):
+        worker.stop()
+
+
+def test_worker_stage_times_merge_through_frames():
+    sim = Simulation(seed=0)
+    sim.is_running = True
+    worker = SimulationWorker(sim)
+    worker.submit(sim.profiler.set_enabled, True)
+    gui = FrameProfiler(enabled=True)
+    worker.start()
+    try:
+        assert wait_for(lambda: worker.frames.latest().stage_totals.get('traffic', 0) > 0)
+        frame = worker.frames.latest()
+        gui.merge(frame.stage_totals)
+        gui.merge(frame.stage_totals)  # The same frame again adds nothing
+    finally:
+        worker.stop()
+    assert gui.current[gui.stages.index('traffic')] == pytest.approx(frame.stage_totals['traffic'])
+
+
+def test_view_resize_runs_on_the_worker(qapp):
+    from simulation.full_sim import SimulationView
+
+    sim = Simulation(seed=0)
+    sim.is_running = True
+    resized = []
+    resize = sim.resize
+
+    def record(width, height):
+        resized.append((threading.current_thread().name, width, height))
+        resize(width, height)
+
+    sim.resize = record
+    view = SimulationView(sim)
+    worker = SimulationWorker(sim)
+    view.frames, view.worker = worker.frames, worker
+    worker.start()
+    try:
+        # A resize while the worker steps is queued to it, never applied from the GUI thread
+        view.resize(1000, 700)
+        view.show()
+        qapp.processEvents()
+        assert wait_for(lambda: sim.width == 1000)
+    finally:
+        view.close()
+        worker.stop()
+    assert ('simulation-worker', 1000, 700) in resized
+    assert all(thread == 'simulation-worker' for thread, *_ in resized)
+    assert (sim.camera.width, sim.weather.height) == (1000, 700)
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from simulation.core import Simulation
+from simulation.ctm import CellTransmissionModel
+from simulation.traffic import MIN_GAP, TrafficSystem, VectorizedTrafficSystem
+
+
+def test_ctm_conserves_cars():
+    rng = np.random.default_rng(0)
+    ctm = CellTransmissionModel(40)
+    ctm.count[:] = rng.uniform(0, ctm.jam_count, size=40)
+    start = ctm.total()
+    inflow = 0.0
+    for _ in range(5000):
+        arriving = min(ctm.receiving(), 0.02)
+        ctm.update(1.0, arriving)
+        inflow += arriving
+    assert ctm.outflow > 0
+    assert np.all(ctm.count >= 0)
+    assert ctm.total() + ctm.outflow == pytest.approx(start + inflow)
+
+
+@pytest.mark.parametrize("engine", [TrafficSystem, VectorizedTrafficSystem])
+def test_world_accounts_for_every_car(engine):
+    sim = Simulation(seed=6, traffic_engine=engine)
+    sim.enable_world(cars_per_segment=6)
+    sim.is_running = True
+    sim.set_speed(100)
+    for _ in range(4000):
+        sim.step()
+    world = sim.world
+    assert world.first > 3
+    assert world.to_macro > 0 and world.to_micro > 0
+    assert world.unaccounted() == pytest.approx(0, abs=1e-6)
+
+
+def test_world_accounts_for_cars_added_from_outside():
+    # As run.py does with --world --cars N: extra cars after the world is enabled
+    sim = Simulation(seed=2, traffic_engine=VectorizedTrafficSystem)
+    sim.enable_world(cars_per_segment=6)
+    sim.traffic.add_traffic_cars(5)
+    assert sim.world.unaccounted() == pytest.approx(0, abs=1e-6)
+    sim.is_running = True
+    sim.set_speed(100)
+    for tick in range(3000):
+        sim.step()
+        if tick == 1000:
+            sim.traffic.add_traffic_cars(3)
+    assert sim.world.cars_added == 8
+    assert sim.world.unaccounted() == pytest.approx(0, abs=1e-6)
+
+
+def test_held_cars_queue_behind_the_boundary():
+    sim = Simulation(seed=0, traffic_engine=VectorizedTrafficSystem)
+    sim.enable_world()
+    world, traffic = sim.world, sim.traffic
+    traffic.insert_cars(world.near_end + np.array([5.0, 60.0, 30.0]), [0, 0, 1], [2.0, 2.0, 2.0])
+    world.macro.count[0] = world.macro.jam_count  # The first cell takes nobody
+    world.update(camera_x=0)
+    x, lane, width = traffic.car_arrays()
+    queued = np.sort(x[-3:][lane[-3:] == 0])
+    assert queued.tolist() == [world.near_end - width[-1] - MIN_GAP, world.near_end]
+    assert x[-1] == world.near_end
+    assert np.all(traffic.car_speeds()[-3:] == 0)